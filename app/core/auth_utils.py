@@ -3,12 +3,18 @@ import json
 import time
 import jwt
 import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Iterator, List
 
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
+
+from app.core import passwords
+from app.core.file_lock import exclusive_lock
 
 logger = logging.getLogger("makwande-auto-apply")
 
@@ -18,15 +24,33 @@ logger = logging.getLogger("makwande-auto-apply")
 SECRET_KEY = os.getenv("SECRET_KEY", "makwande-secret-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "120"))
+# Verified tokens kept in memory (LRU). Entries expire with the token and are re-checked
+# against the user store every TOKEN_CACHE_REVALIDATE_S, which bounds how long another
+# worker's deactivation/password change takes to reach this process.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_REVALIDATE_S = float(os.getenv("TOKEN_CACHE_REVALIDATE_S", "30"))
 
 # Swagger Authorize uses this tokenUrl
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-
-# ✅ IMPORTANT: avoids bcrypt 72-byte limitation
-pwd_context = CryptContext(schemes=["bcrypt_sha256"], deprecated="auto")
+# Same, for routes that also serve anonymous callers
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
 USERS_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "users.json"))
 LOCK_FILE = USERS_FILE + ".lock"
+# Writes append one JSON line here; the log is folded back into users.json (the snapshot)
+# once it holds USERS_LOG_COMPACT_AT records.
+USERS_LOG = os.path.splitext(USERS_FILE)[0] + ".log.jsonl"
+USERS_LOG_COMPACT_AT = int(os.getenv("USERS_LOG_COMPACT_AT", "1000"))
+
+# In-memory index: lowercase email -> user record, built from snapshot + log.
+# The snapshot is re-read only when its (mtime_ns, inode, size) changes; the log is
+# read incrementally from the last offset, so other workers' appends are picked up cheaply.
+_user_index: Dict[str, Dict[str, Any]] = {}
+_snapshot_sig: Optional[tuple] = None
+_log_ino: Optional[int] = None
+_log_offset = 0
+_log_records = 0
+_user_index_lock = threading.Lock()
 
 
 # -------------------------
@@ -40,24 +64,12 @@ def _ensure_users_file() -> None:
             json.dump([], f)
 
 
-def _acquire_lock(timeout_sec: float = 5.0, poll_sec: float = 0.05) -> None:
-    start = time.time()
-    while True:
-        try:
-            fd = os.open(LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
-            os.close(fd)
-            return
-        except FileExistsError:
-            if time.time() - start > timeout_sec:
-                raise RuntimeError("Could not acquire users.json lock (timeout).")
-            time.sleep(poll_sec)
-
-
-def _release_lock() -> None:
-    try:
-        os.remove(LOCK_FILE)
-    except FileNotFoundError:
-        pass
+@contextmanager
+def _users_lock() -> Iterator[None]:
+    """Exclusive lock for users-file writers, across threads and processes."""
+    _ensure_users_file()
+    with exclusive_lock(LOCK_FILE):
+        yield
 
 
 def _read_users() -> List[Dict[str, Any]]:
@@ -78,30 +90,137 @@ def _atomic_write_users(users: List[Dict[str, Any]]) -> None:
     _ensure_users_file()
     tmp_path = USERS_FILE + ".tmp"
     with open(tmp_path, "w", encoding="utf-8") as f:
-        json.dump(users, f, ensure_ascii=False, indent=2)
+        json.dump(users, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
     os.replace(tmp_path, USERS_FILE)
 
 
-def _write_users(users: List[Dict[str, Any]]) -> None:
-    _acquire_lock()
+def _append_log(records: List[Dict[str, Any]]) -> None:
+    """Append records durably (caller holds _users_lock). A torn tail from a crash is cut first."""
+    data = b"".join(json.dumps(r, ensure_ascii=False).encode("utf-8") + b"\n" for r in records)
+    with open(USERS_LOG, "a+b") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size:
+            f.seek(size - 1)
+            if f.read(1) != b"\n":
+                f.seek(0)
+                keep = f.read().rfind(b"\n") + 1
+                f.truncate(keep)
+                logger.warning(f"⚠️ users log: dropped {size - keep} bytes of a torn record")
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _compact() -> None:
+    """Fold the log into users.json (caller holds _users_lock). Safe to crash midway:
+    replaying a log over a snapshot that already contains it gives the same users."""
+    users = list(_users_index().values())
+    _atomic_write_users(users)
+    with open(USERS_LOG, "a+b") as f:
+        f.truncate(0)
+        os.fsync(f.fileno())
+    _users_index()
+
+
+# -------------------------
+# User index
+# -------------------------
+def _file_sig(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
+def _apply_log_line(index: Dict[str, Dict[str, Any]], line: bytes) -> bool:
     try:
-        _atomic_write_users(users)
-    finally:
-        _release_lock()
+        rec = json.loads(line)
+        user = rec["user"]
+        email = str(user.get("email", "")).lower()
+    except Exception:
+        logger.warning("⚠️ users log: skipped unreadable record")
+        return False
+    if email:
+        index[email] = user  # later records win: updates are appended, not rewritten
+    return True
+
+
+def _users_index() -> Dict[str, Dict[str, Any]]:
+    """Current index: two stat() calls per lookup; re-reads only what changed."""
+    global _user_index, _snapshot_sig, _log_ino, _log_offset, _log_records
+    with _user_index_lock:
+        snap_sig = _file_sig(USERS_FILE)
+        log_sig = _file_sig(USERS_LOG)
+        log_ino, log_size = (log_sig[1], log_sig[2]) if log_sig else (None, 0)
+
+        if snap_sig is None or snap_sig != _snapshot_sig or log_ino != _log_ino or log_size < _log_offset:
+            # Stat before reading: if the snapshot changes mid-read, the stale sig forces another reload
+            index: Dict[str, Dict[str, Any]] = {}
+            for u in _read_users():
+                email = str(u.get("email", "")).lower()
+                if email:
+                    index.setdefault(email, u)
+            _user_index, _snapshot_sig = index, snap_sig
+            _log_ino, _log_offset, _log_records = log_ino, 0, 0
+
+        if log_size > _log_offset:
+            with open(USERS_LOG, "rb") as f:
+                f.seek(_log_offset)
+                chunk = f.read(log_size - _log_offset)
+            end = chunk.rfind(b"\n") + 1  # only complete lines; a partial one is still being written
+            index = dict(_user_index)
+            for line in chunk[:end].splitlines():
+                if line.strip() and _apply_log_line(index, line):
+                    _log_records += 1
+            _user_index = index
+            _log_offset += end
+        return _user_index
+
+
+def _save_user(user: Dict[str, Any]) -> None:
+    """Upsert one user record (caller holds _users_lock)."""
+    _append_log([{"op": "put", "user": user}])
+    _users_index()
+    if _log_records >= USERS_LOG_COMPACT_AT:
+        _compact()
 
 
 # -------------------------
-# Password helpers
+# Password helpers (hashing runs in the app.core.passwords process pool)
 # -------------------------
-def get_password_hash(password: str) -> str:
+def _check_password(password: str) -> None:
     if not isinstance(password, str) or not password.strip():
         raise HTTPException(status_code=422, detail="Password is required.")
-    return pwd_context.hash(password)
+
+
+def _queue_full(e: passwords.PasswordQueueFull) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
+def get_password_hash(password: str) -> str:
+    _check_password(password)
+    try:
+        return passwords.hash_password_sync(password)
+    except passwords.PasswordQueueFull as e:
+        raise _queue_full(e)
+
+
+async def get_password_hash_async(password: str) -> str:
+    _check_password(password)
+    try:
+        return await passwords.hash_password(password)
+    except passwords.PasswordQueueFull as e:
+        raise _queue_full(e)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     try:
-        return pwd_context.verify(plain_password, hashed_password)
+        return passwords.verify_and_update_sync(plain_password, hashed_password)[0]
+    except passwords.PasswordQueueFull as e:
+        raise _queue_full(e)
     except Exception:
         logger.exception("Password verify failed")
         return False
@@ -111,44 +230,125 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 # User helpers
 # -------------------------
 def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
-    users = _read_users()
-    for u in users:
-        if u.get("email", "").lower() == str(email).lower():
-            return u
-    return None
-
-
-def create_user(email: str, password: str, full_name: str = "") -> Dict[str, Any]:
-    email = str(email).strip().lower()
-
-    if get_user_by_email(email):
-        raise HTTPException(status_code=409, detail="User already exists")
+    user = _users_index().get(str(email).strip().lower())
+    return dict(user) if user is not None else None
 
-    users = _read_users()
 
-    user = {
+def _new_user(email: str, full_name: str, password_hash: str) -> Dict[str, Any]:
+    return {
         "email": email,
         "full_name": full_name or "",
         "is_active": True,
-        "password_hash": get_password_hash(password),
+        "password_hash": password_hash,
         "created_at": datetime.utcnow().isoformat(),
     }
 
-    users.append(user)
-    _write_users(users)
+
+def _insert_user(user: Dict[str, Any]) -> Dict[str, Any]:
+    with _users_lock():
+        if user["email"] in _users_index():
+            raise HTTPException(status_code=409, detail="User already exists")
+        _save_user(user)
 
     # never return hash
     return {"email": user["email"], "full_name": user["full_name"], "is_active": user["is_active"]}
 
 
+def create_user(email: str, password: str, full_name: str = "") -> Dict[str, Any]:
+    email = str(email).strip().lower()
+
+    if get_user_by_email(email):
+        raise HTTPException(status_code=409, detail="User already exists")
+
+    # Hash outside the lock so concurrent signups only serialize on the append
+    return _insert_user(_new_user(email, full_name, get_password_hash(password)))
+
+
+async def create_user_async(email: str, password: str, full_name: str = "") -> Dict[str, Any]:
+    """
+    create_user for async routes: hashing awaits the pool; the users-file lookup and append
+    run in threads (the append re-checks under the lock, the lookup only skips a wasted hash).
+    """
+    email = str(email).strip().lower()
+
+    if await run_in_threadpool(get_user_by_email, email):
+        raise HTTPException(status_code=409, detail="User already exists")
+
+    user = _new_user(email, full_name, await get_password_hash_async(password))
+    return await run_in_threadpool(_insert_user, user)
+
+
+def update_user(email: str, **changes: Any) -> Dict[str, Any]:
+    """
+    Change a user's record (e.g. full_name, is_active, password). A password change or
+    deactivation bumps credentials_version, which revokes every token issued before it.
+    """
+    email = str(email).strip().lower()
+    if "password" in changes:
+        changes["password_hash"] = get_password_hash(changes.pop("password"))
+    changes.pop("email", None)
+
+    with _users_lock():
+        current = _users_index().get(email)
+        if current is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        user = {**current, **changes}
+        if "password_hash" in changes or (current.get("is_active", True) and not user.get("is_active", True)):
+            user["credentials_version"] = int(current.get("credentials_version", 0)) + 1
+        user["updated_at"] = datetime.utcnow().isoformat()
+        _save_user(user)
+
+    invalidate_user_tokens(email)
+    return {"email": user["email"], "full_name": user.get("full_name", ""), "is_active": user.get("is_active", True)}
+
+
+def _upgrade_hash(email: str, old_hash: str, new_hash: str) -> None:
+    """
+    Store a re-hash made at login with the current cost settings. Same password, so
+    credentials_version is left alone and issued tokens stay valid.
+    """
+    try:
+        with _users_lock():
+            current = _users_index().get(email)
+            # Skip if the password changed while we were verifying
+            if current is None or current.get("password_hash") != old_hash:
+                return
+            _save_user({**current, "password_hash": new_hash})
+    except Exception as e:
+        logger.warning(f"⚠️ Password hash upgrade skipped for {email}: {e}")
+
+
 def authenticate_user(email: str, password: str) -> Optional[Dict[str, Any]]:
     user = get_user_by_email(email)
     if not user:
         return None
     if not user.get("is_active", True):
         return None
-    if not verify_password(password, user.get("password_hash", "")):
+    try:
+        ok, new_hash = passwords.verify_and_update_sync(password, user.get("password_hash", ""))
+    except passwords.PasswordQueueFull as e:
+        raise _queue_full(e)
+    if not ok:
+        return None
+    if new_hash:
+        _upgrade_hash(user["email"], user.get("password_hash", ""), new_hash)
+    return user
+
+
+async def authenticate_user_async(email: str, password: str) -> Optional[Dict[str, Any]]:
+    user = await run_in_threadpool(get_user_by_email, email)
+    if not user:
+        return None
+    if not user.get("is_active", True):
+        return None
+    try:
+        ok, new_hash = await passwords.verify_and_update(password, user.get("password_hash", ""))
+    except passwords.PasswordQueueFull as e:
+        raise _queue_full(e)
+    if not ok:
         return None
+    if new_hash:
+        await run_in_threadpool(_upgrade_hash, user["email"], user.get("password_hash", ""), new_hash)
     return user
 
 
@@ -171,14 +371,96 @@ def decode_token(token: str) -> Dict[str, Any]:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
+# -------------------------
+# Verified-token cache
+# -------------------------
+# token -> (principal, exp, email, credentials_version, checked_at)
+_token_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_tokens_by_email: Dict[str, set] = {}
+_token_lock = threading.Lock()
+
+
+def _principal(user: Dict[str, Any]) -> Dict[str, Any]:
+    return {"email": user["email"], "full_name": user.get("full_name", ""), "is_active": user.get("is_active", True)}
+
+
+def _drop_token(token: str) -> None:
+    entry = _token_cache.pop(token, None)
+    if entry is not None:
+        tokens = _tokens_by_email.get(entry[2])
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del _tokens_by_email[entry[2]]
+
+
+def _cache_token(token: str, principal: Dict[str, Any], exp: float, version: int) -> None:
+    if TOKEN_CACHE_SIZE <= 0:
+        return
+    # Keyed like invalidate_user_tokens() looks it up, whatever case the record was stored in
+    email = str(principal["email"]).lower()
+    with _token_lock:
+        _drop_token(token)
+        _token_cache[token] = (principal, exp, email, version, time.time())
+        _tokens_by_email.setdefault(email, set()).add(token)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _drop_token(next(iter(_token_cache)))
+
+
+def invalidate_user_tokens(email: str) -> None:
+    with _token_lock:
+        for token in list(_tokens_by_email.get(str(email).lower(), ())):
+            _drop_token(token)
+
+
+def _check_user(user: Optional[Dict[str, Any]], version: int) -> Dict[str, Any]:
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    if not user.get("is_active", True):
+        raise HTTPException(status_code=401, detail="User is deactivated")
+    if int(user.get("credentials_version", 0)) != version:
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return user
+
+
 def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
+    now = time.time()
+    with _token_lock:
+        entry = _token_cache.get(token)
+        if entry is not None:
+            if entry[1] <= now:
+                _drop_token(token)
+                entry = None
+            else:
+                _token_cache.move_to_end(token)
+    if entry is not None:
+        principal, exp, email, version, checked_at = entry
+        if now - checked_at < TOKEN_CACHE_REVALIDATE_S:
+            return dict(principal)
+        try:
+            user = _check_user(get_user_by_email(email), version)
+        except HTTPException:
+            invalidate_user_tokens(email)
+            raise
+        _cache_token(token, _principal(user), exp, version)
+        return _principal(user)
+
     payload = decode_token(token)
     email = payload.get("sub")
     if not email:
         raise HTTPException(status_code=401, detail="Invalid token payload")
 
-    user = get_user_by_email(email)
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
+    version = int(payload.get("cv", 0))
+    user = _check_user(get_user_by_email(email), version)
+    principal = _principal(user)
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        _cache_token(token, principal, float(exp), version)
+    return dict(principal)
 
-    return {"email": user["email"], "full_name": user.get("full_name", ""), "is_active": user.get("is_active", True)}
+
+def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[Dict[str, Any]]:
+    """get_current_user for routes open to anonymous callers: None without a token, 401 for a bad one."""
+    if not token:
+        return None
+    return get_current_user(token)
@@ -0,0 +1,210 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from app.services.llm_metrics import Histogram
+
+logger = logging.getLogger("makwande-auto-apply")
+
+# bcrypt is CPU-bound by design: hash/verify in separate processes so a login spike
+# can't take threadpool slots (or the GIL) from every other endpoint.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Reject new logins/signups (503) once this many hashes are queued or running.
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+# bcrypt cost (log2 rounds). Raising it upgrades existing hashes as users log in.
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "12"))
+
+HASH_LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+# ✅ IMPORTANT: avoids bcrypt 72-byte limitation
+pwd_context = CryptContext(
+    schemes=["bcrypt_sha256"],
+    deprecated="auto",
+    bcrypt_sha256__rounds=PASSWORD_HASH_ROUNDS,
+)
+
+
+class PasswordQueueFull(RuntimeError):
+    pass
+
+
+# -------------------------
+# Worker-side functions (run in the pool; must stay module-level to pickle)
+# -------------------------
+def _timed_hash(password: str) -> Tuple[str, float]:
+    t0 = time.perf_counter()
+    return pwd_context.hash(password), time.perf_counter() - t0
+
+
+def _timed_verify_and_update(password: str, password_hash: str) -> Tuple[Tuple[bool, Optional[str]], float]:
+    t0 = time.perf_counter()
+    try:
+        result = pwd_context.verify_and_update(password, password_hash)
+    except (ValueError, TypeError):
+        result = (False, None)  # unknown/corrupt hash: a failed login, not a crash
+    return result, time.perf_counter() - t0
+
+
+def _noop() -> None:
+    return None
+
+
+# -------------------------
+# Pool
+# -------------------------
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_pending = 0
+_max_pending = 0
+_submitted = 0
+_completed = 0
+_rejected = 0
+_errors = 0
+_run_ms = Histogram(HASH_LATENCY_BUCKETS_MS)
+_wait_ms = Histogram(HASH_LATENCY_BUCKETS_MS)
+
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    """The hashing pool, or None when PASSWORD_HASH_WORKERS=0 (hash in the calling thread)."""
+    global _pool
+    if PASSWORD_HASH_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+            logger.info(f"✅ Password hash pool started ({PASSWORD_HASH_WORKERS} workers, rounds={PASSWORD_HASH_ROUNDS})")
+        return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def warm_up() -> None:
+    """Start the worker processes now rather than on the first login."""
+    pool = get_pool()
+    if pool is not None:
+        for f in [pool.submit(_noop) for _ in range(PASSWORD_HASH_WORKERS)]:
+            f.result()
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _admit() -> None:
+    global _pending, _max_pending, _submitted, _rejected
+    with _stats_lock:
+        if _pending >= PASSWORD_HASH_MAX_PENDING:
+            _rejected += 1
+            raise PasswordQueueFull("Too many sign-ins in progress, try again shortly")
+        _pending += 1
+        _submitted += 1
+        _max_pending = max(_max_pending, _pending)
+
+
+def _finish(started: float, run_s: Optional[float]) -> None:
+    global _pending, _completed, _errors
+    total_ms = (time.perf_counter() - started) * 1000.0
+    with _stats_lock:
+        _pending -= 1
+        if run_s is None:
+            _errors += 1
+            return
+        _completed += 1
+        _run_ms.observe(run_s * 1000.0)
+        _wait_ms.observe(max(0.0, total_ms - run_s * 1000.0))
+
+
+def _submit(fn: Callable[..., Tuple[Any, float]], *args: Any) -> Future:
+    pool = get_pool()
+    try:
+        return pool.submit(fn, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed): replace the pool once, then give up
+        logger.warning("⚠️ Password hash pool broken — restarting")
+        _reset_pool(pool)
+        return get_pool().submit(fn, *args)
+
+
+def _run_sync(fn: Callable[..., Tuple[Any, float]], *args: Any) -> Any:
+    _admit()
+    started = time.perf_counter()
+    run_s = None
+    try:
+        if get_pool() is None:
+            result, run_s = fn(*args)
+        else:
+            result, run_s = _submit(fn, *args).result()
+        return result
+    finally:
+        _finish(started, run_s)
+
+
+async def _run_async(fn: Callable[..., Tuple[Any, float]], *args: Any) -> Any:
+    _admit()
+    started = time.perf_counter()
+    run_s = None
+    try:
+        if get_pool() is None:
+            # No process pool: still keep bcrypt off the event loop
+            result, run_s = await asyncio.to_thread(fn, *args)
+        else:
+            result, run_s = await asyncio.wrap_future(_submit(fn, *args))
+        return result
+    finally:
+        _finish(started, run_s)
+
+
+# -------------------------
+# Public API
+# -------------------------
+def hash_password_sync(password: str) -> str:
+    return _run_sync(_timed_hash, password)
+
+
+def verify_and_update_sync(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    """(ok, new_hash): new_hash is set when the stored hash uses outdated cost parameters."""
+    return _run_sync(_timed_verify_and_update, password, password_hash)
+
+
+async def hash_password(password: str) -> str:
+    return await _run_async(_timed_hash, password)
+
+
+async def verify_and_update(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    return await _run_async(_timed_verify_and_update, password, password_hash)
+
+
+def stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return {
+            "workers": PASSWORD_HASH_WORKERS,
+            "rounds": PASSWORD_HASH_ROUNDS,
+            "max_pending": PASSWORD_HASH_MAX_PENDING,
+            "pending": _pending,
+            "peak_pending": _max_pending,
+            "submitted": _submitted,
+            "completed": _completed,
+            "rejected": _rejected,
+            "errors": _errors,
+            "queue_wait_ms": _wait_ms.to_dict(),
+            "hash_ms": _run_ms.to_dict(),
+        }
@@ -0,0 +1,44 @@
+import sqlite3
+import logging
+from typing import List, Sequence, Tuple
+
+logger = logging.getLogger("makwande-auto-apply")
+
+# (version, description, statements). Versions start at 1 and increase by one; the
+# database's current version is kept in PRAGMA user_version (0 = tables only).
+# Append only: never edit a migration that has shipped, add a new one instead.
+Migration = Tuple[int, str, Sequence[str]]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("PRAGMA user_version").fetchone()[0])
+
+
+def migrate(conn: sqlite3.Connection, migrations: List[Migration]) -> int:
+    """
+    Apply pending migrations, each in its own write transaction. Safe to run from several
+    workers at once: the version is re-read under the write lock. Returns the new version.
+    """
+    versions = [m[0] for m in migrations]
+    if versions != list(range(1, len(migrations) + 1)):
+        raise ValueError(f"Migration versions must be 1..{len(migrations)} in order, got {versions}")
+
+    for version, description, statements in migrations:
+        if schema_version(conn) >= version:
+            continue
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if schema_version(conn) >= version:  # another worker got here first
+                conn.execute("COMMIT")
+                continue
+            for sql in statements:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        logger.info(f"✅ Schema migrated to v{version}: {description}")
+    return schema_version(conn)
@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger("makwande-auto-apply")
+
+# Idle connections kept per database, per process (busy ones aren't capped: a burst
+# opens extra connections and closes them on return).
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+# Wait this long for a lock held by another connection/process before "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# NORMAL is durable across app crashes in WAL mode; only an OS crash can lose the last commits
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+# Prepared statements kept per connection (sqlite3's LRU; default is 128)
+SQLITE_CACHED_STATEMENTS = int(os.getenv("SQLITE_CACHED_STATEMENTS", "256"))
+
+
+def configure(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """
+    Per-connection PRAGMAs. WAL lets readers run alongside a writer instead of queueing
+    behind it; journal_mode is stored in the file, the rest must be set on every connection.
+    """
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.OperationalError as e:
+        # Another connection is mid-transaction on a not-yet-WAL file; the next open retries
+        logger.warning(f"⚠️ SQLite WAL not enabled yet: {e}")
+    conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size={-SQLITE_CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    A connection owned by a SQLitePool: close() hands it back instead of closing it.
+    `with conn:` is sqlite3's transaction scope (commit/rollback, connection stays usable);
+    lease one with `with pool.connection() as conn:` to have it handed back.
+    """
+
+    _owner: Optional["SQLitePool"] = None
+
+    def close(self) -> None:
+        owner, self._owner = self._owner, None
+        if owner is not None:
+            owner.release(self)
+
+
+class SQLitePool:
+    """
+    Per-process pool of configured connections to one database file. `init` runs once,
+    on the first connection (schema setup); connections are never shared across a fork.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        size: int = SQLITE_POOL_SIZE,
+        isolation_level: Optional[str] = "",
+        row_factory: Any = sqlite3.Row,
+        init: Optional[Callable[[sqlite3.Connection], None]] = None,
+    ):
+        self.path = path
+        self.size = size
+        self.isolation_level = isolation_level
+        self.row_factory = row_factory
+        self._init = init
+        self._initialized = False
+        self._idle: List[PooledConnection] = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.opened = 0
+        self.reused = 0
+
+    def _open(self) -> PooledConnection:
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = sqlite3.connect(
+            self.path,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000.0,
+            isolation_level=self.isolation_level,
+            check_same_thread=False,  # handed between threads, but used by one at a time
+            cached_statements=SQLITE_CACHED_STATEMENTS,
+            factory=PooledConnection,
+        )
+        try:
+            conn.row_factory = self.row_factory
+            configure(conn)
+            if not self._initialized:
+                with self._lock:
+                    if not self._initialized and self._init is not None:
+                        self._init(conn)
+                        if conn.in_transaction:
+                            conn.commit()
+                    self._initialized = True
+        except Exception:
+            sqlite3.Connection.close(conn)
+            raise
+        self.opened += 1
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        conn = None
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked: the parent's handles aren't ours to use (or close)
+                self._idle, self._pid = [], os.getpid()
+            if self._idle:
+                conn = self._idle.pop()
+                self.reused += 1
+        if conn is None:
+            conn = self._open()
+        conn._owner = self
+        return conn
+
+    def release(self, conn: PooledConnection) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()  # never hand out a connection mid-transaction
+        except sqlite3.Error:
+            sqlite3.Connection.close(conn)
+            return
+        with self._lock:
+            if self._pid == os.getpid() and len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        sqlite3.Connection.close(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[PooledConnection]:
+        """Borrow a connection; commits on success, rolls back on error, then returns it."""
+        conn = self.acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            sqlite3.Connection.close(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"path": self.path, "idle": len(self._idle), "opened": self.opened, "reused": self.reused}
@@ -1,22 +1,33 @@
 import os
-import sqlite3
 from contextlib import contextmanager
 from datetime import datetime
 
+from app.core.sqlite_migrations import migrate
+from app.core.sqlite_pool import SQLitePool
+
 DB_PATH = os.getenv("DB_PATH", "app.db")
+_pool = SQLitePool(DB_PATH)
 
 def utc_now_iso() -> str:
     return datetime.utcnow().isoformat(timespec="seconds") + "Z"
 
 @contextmanager
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
+    # Pooled (WAL, tuned PRAGMAs): readers no longer queue behind webhook writes
+    with _pool.connection() as conn:
         yield conn
-        conn.commit()
-    finally:
-        conn.close()
+
+# Schema changes after the base tables below (see app.core.sqlite_migrations).
+# History pages filter by user (or run) and sort by time: one composite index each,
+# so those queries seek + walk the index instead of scanning and sorting the table.
+MIGRATIONS = [
+    (1, "history indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_documents_user_created ON documents(user_email, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_saved_jobs_user_created ON saved_jobs(user_email, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_autoapply_runs_user_started ON autoapply_runs(user_email, started_at)",
+        "CREATE INDEX IF NOT EXISTS idx_autoapply_run_items_run_created ON autoapply_run_items(run_id, created_at)",
+    ]),
+]
 
 def init_db():
     with get_db() as db:
@@ -131,3 +142,5 @@ def init_db():
           created_at TEXT NOT NULL
         )
         """)
+
+        migrate(db, MIGRATIONS)
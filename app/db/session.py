@@ -1,22 +1,39 @@
 # app/db/session.py
 
-import sqlite3
 import os
+from contextlib import contextmanager
+
+from app.core.sqlite_migrations import migrate
+from app.core.sqlite_pool import SQLitePool
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 DB_PATH = os.path.join(BASE_DIR, "data", "database.db")
 
+_pool = SQLitePool(DB_PATH)
+
+# Schema changes after the base tables (see app.core.sqlite_migrations)
+MIGRATIONS = [
+    (1, "per-user history indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_applications_user_created ON applications(user_email, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_saved_jobs_user_created ON saved_jobs(user_email, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_documents_user_created ON documents(user_email, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_auto_apply_logs_user_created ON auto_apply_logs(user_email, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_subscriptions_user ON subscriptions(user_email)",
+    ]),
+]
+
 
+@contextmanager
 def get_db():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # Pooled connection: commits (or rolls back) and is handed back when the block ends
+    with _pool.connection() as conn:
+        yield conn
 
 
 def init_db():
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
-    conn = get_db()
+    conn = _pool.acquire()  # close() hands it back
     cursor = conn.cursor()
 
     # USERS
@@ -89,6 +106,7 @@ def init_db():
     """)
 
     conn.commit()
+    migrate(conn, MIGRATIONS)
     conn.close()
 
     print("✅ Database initialized successfully")
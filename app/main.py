@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+import asyncio
 import importlib
 import logging
 import os
 from typing import Optional
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+
+from app.services.resilience import DeadlineExceeded, DeadlineMiddleware
 
 # -------------------------------------------------
 # Logging
@@ -41,6 +45,9 @@ if origins_env in ("", "*"):
 else:
     allowed_origins = [o.strip() for o in origins_env.split(",") if o.strip()]
 
+# One end-to-end deadline per request; upstream retries stop when it runs out
+app.add_middleware(DeadlineMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
@@ -49,6 +56,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"detail": "Request timed out"})
+
 # -------------------------------------------------
 # Helpers: safe router include
 # -------------------------------------------------
@@ -139,6 +150,7 @@ safe_include("app.routes.jobs")      # /api/jobs + /api/match_jobs
 safe_include("app.routes.cv")        # /cv/upload /cv/revamp /cv/cover-letter (if you have)
 safe_include("app.routes.ai")        # /api/ai/cv/revamp + /api/ai/cover-letter (OpenAI)
 safe_include("app.routes.billing")   # /billing/paystack/... (Paystack)
+safe_include("app.routes.tasks")     # /tasks/... (background AI work)
 
 # -------------------------------------------------
 # Startup: init DB + log readiness
@@ -153,8 +165,66 @@ async def startup_event():
     except Exception as e:
         logger.warning(f"⚠️ Jobs DB init skipped: {e}")
 
+    # Billing DB: schema + migrations once, not on every payment write
+    try:
+        from app.services.payments import init_db as init_payments_db
+        init_payments_db()
+        logger.info("✅ Payments DB initialized")
+    except Exception as e:
+        logger.warning(f"⚠️ Payments DB init skipped: {e}")
+
+    # Shared OpenAI async client (one connection pool for the whole process)
+    try:
+        from app.services.ai_client import init_ai_client
+        init_ai_client()
+    except Exception as e:
+        logger.warning(f"⚠️ OpenAI client init skipped: {e}")
+
+    # Password hash pool: spawn the workers before the first login needs them
+    try:
+        from app.core.passwords import warm_up
+        await asyncio.to_thread(warm_up)
+    except Exception as e:
+        logger.warning(f"⚠️ Password hash pool warm-up skipped: {e}")
+
+    # Background task workers (queued revamps / cover letters)
+    try:
+        from app.services import ai_tasks  # noqa: F401  (registers task kinds)
+        from app.services.task_queue import workers
+        workers.start()
+    except Exception as e:
+        logger.warning(f"⚠️ Task workers not started: {e}")
+
     logger.info("=" * 60)
     logger.info(" Makwande Auto Apply Platform Started 🚀")
     logger.info(f" ENV: {APP_ENV}")
     logger.info(" Docs: /docs")
     logger.info("=" * 60)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Stop workers first: in-flight tasks are handed back to the queue
+    try:
+        from app.services.task_queue import workers
+        await workers.stop()
+    except Exception as e:
+        logger.warning(f"⚠️ Task workers stop skipped: {e}")
+
+    try:
+        from app.services.ai_client import close_ai_client
+        await close_ai_client()
+    except Exception as e:
+        logger.warning(f"⚠️ OpenAI client close skipped: {e}")
+
+    try:
+        from app.services.cv_jobs import shutdown_pool
+        shutdown_pool()
+    except Exception as e:
+        logger.warning(f"⚠️ CV parse pool shutdown skipped: {e}")
+
+    try:
+        from app.core.passwords import shutdown_pool as shutdown_hash_pool
+        shutdown_hash_pool()
+    except Exception as e:
+        logger.warning(f"⚠️ Password hash pool shutdown skipped: {e}")
@@ -3,10 +3,18 @@ import os
 import logging
 from typing import Optional, Dict, Any
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field, EmailStr
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel, Field, EmailStr, ValidationError
 
-import openai
+from app.core.auth_utils import get_optional_user
+from app.services import llm_metrics
+from app.services.ai_client import complete, stream
+from app.services.ai_scheduler import scheduler
+from app.services.singleflight import ai_flight
+from app.services.json_repair import loads_lenient
+from app.services.resilience import DeadlineExceeded
+from app.services.sse import sse_response
+from app.services.prompt_compact import REVAMP_CV_TOKEN_BUDGET, compact_cv, compact_text
 
 
 router = APIRouter(prefix="/api/ai", tags=["AI (OpenAI)"])
@@ -17,9 +25,13 @@ log = logging.getLogger("makwande-auto-apply.ai")
 # OpenAI Config
 # -----------------------------
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+# Required (X-Metrics-Token) to see per-user LLM usage on /metrics
+LLM_METRICS_TOKEN = os.getenv("LLM_METRICS_TOKEN", "")
 
-if OPENAI_API_KEY:
-    openai.api_key = OPENAI_API_KEY
+
+def _account_to(user: Optional[Dict[str, Any]]) -> None:
+    # Usage goes to the authenticated caller; the body's email is unverified, never trusted
+    llm_metrics.set_user(user["email"] if user else "anonymous")
 
 
 def _require_openai():
@@ -66,23 +78,32 @@ class CoverLetterResponse(BaseModel):
 # -----------------------------
 # OpenAI Helper
 # -----------------------------
-def _ask_openai(system_prompt: str, user_prompt: str, temperature: float = 0.4) -> str:
+async def _ask_openai(
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float = 0.4,
+    route: str = "ai",
+    **params: Any,
+) -> str:
     _require_openai()
+    params.setdefault("max_tokens", 1800)
 
     try:
-        resp = openai.ChatCompletion.create(
-            model="gpt-4o-mini",  # fast + cheap + good quality
-            messages=[
+        return await complete(
+            [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
             ],
+            route=route,
+            model="gpt-4o-mini",  # fast + cheap + good quality
             temperature=temperature,
-            max_tokens=1800,
+            **params,
         )
 
-        return resp["choices"][0]["message"]["content"]
-
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail="AI request timed out")
     except Exception as e:
+        # Transient errors were already retried within the request deadline
         log.error("OpenAI error: %s", e)
         raise HTTPException(status_code=502, detail="AI processing failed")
 
@@ -91,11 +112,41 @@ def _ask_openai(system_prompt: str, user_prompt: str, temperature: float = 0.4)
 # Routes
 # -----------------------------
 
+# Structured output: one call returns the revamped CV and its analysis together.
+REVAMP_SCHEMA = {
+    "name": "cv_revamp",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "improved_cv": {"type": "string"},
+            "ats_score": {"type": "integer"},
+            "strengths": {"type": "array", "items": {"type": "string"}},
+            "improvements": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": ["improved_cv", "ats_score", "strengths", "improvements"],
+        "additionalProperties": False,
+    },
+}
+
+
+def _parse_revamp(raw: str) -> CVRevampResponse:
+    try:
+        data = loads_lenient(raw)
+        resp = CVRevampResponse.model_validate(data)
+    except (ValueError, ValidationError) as e:
+        log.error("Revamp output failed validation: %s", e)
+        raise HTTPException(status_code=502, detail="AI returned an invalid revamp")
+    resp.ats_score = max(0, min(100, resp.ats_score))
+    return resp
+
+
 @router.post("/cv/revamp", response_model=CVRevampResponse)
-def revamp_cv(req: CVRevampRequest):
+async def revamp_cv(req: CVRevampRequest, user=Depends(get_optional_user)):  # noqa: F821
     """
     Improve CV for ATS + recruiter readability.
     """
+    _account_to(user)
 
     system = """
 You are an expert recruitment consultant and ATS specialist.
@@ -106,11 +157,11 @@ You optimize CVs for:
 - Professional formatting
 - South African job market
 
-Always return:
-1) Improved CV
-2) ATS score (0-100)
-3) Strengths
-4) Improvements
+Return JSON with:
+- improved_cv: the full rewritten CV
+- ats_score: ATS score of the improved CV (0-100)
+- strengths: 3-5 strengths
+- improvements: 3-5 further improvements
 """
 
     user = f"""
@@ -121,62 +172,24 @@ Target Role: {req.target_role}
 Years Experience: {req.years_experience}
 
 CURRENT CV:
-{req.current_cv}
+{compact_cv(req.current_cv, target=req.target_role, budget=REVAMP_CV_TOKEN_BUDGET)}
 
 TASK:
-Rewrite this CV into a professional, ATS-optimized format.
+Rewrite this CV into a professional, ATS-optimized format and assess it.
 """
 
-    ai_text = _ask_openai(system, user, temperature=0.3)
-
-    # Ask AI to structure feedback
-    format_prompt = f"""
-From the CV below, extract:
-
-1) ATS Score (0-100)
-2) 3-5 Strengths
-3) 3-5 Improvements
-
-Return in JSON.
-
-CV:
-{ai_text}
-"""
-
-    analysis = _ask_openai(
-        "You analyze CV quality and return structured JSON.",
-        format_prompt,
-        temperature=0.1,
-    )
-
-    # Safe parsing fallback
-    ats_score = 75
-    strengths = ["Strong technical background"]
-    improvements = ["Add quantified achievements"]
-
-    try:
-        import json
-        parsed = json.loads(analysis)
-        ats_score = int(parsed.get("ats_score", ats_score))
-        strengths = parsed.get("strengths", strengths)
-        improvements = parsed.get("improvements", improvements)
-    except Exception:
-        pass
-
-    return CVRevampResponse(
-        improved_cv=ai_text,
-        ats_score=ats_score,
-        strengths=strengths,
-        improvements=improvements,
+    raw = await _ask_openai(
+        system,
+        user,
+        temperature=0.3,
+        route="ai.revamp",
+        response_format={"type": "json_schema", "json_schema": REVAMP_SCHEMA},
+        max_tokens=3000,
     )
+    return _parse_revamp(raw)
 
 
-@router.post("/cover-letter", response_model=CoverLetterResponse)
-def generate_cover_letter(req: CoverLetterRequest):
-    """
-    Generate a personalized cover letter for a job.
-    """
-
+def _cover_letter_prompts(req: CoverLetterRequest) -> tuple[str, str]:
     system = """
 You are a professional career coach.
 You write persuasive, formal cover letters for African job markets.
@@ -192,7 +205,7 @@ Job Title: {req.job_title}
 Company: {req.company}
 
 Job Description:
-{req.job_description}
+{compact_text(req.job_description)}
 
 Experience Summary:
 {req.experience_summary}
@@ -200,12 +213,64 @@ Experience Summary:
 TASK:
 Write a 1-page professional cover letter.
 """
+    return system, user
+
+
+@router.post("/cover-letter", response_model=CoverLetterResponse)
+async def generate_cover_letter(req: CoverLetterRequest, user=Depends(get_optional_user)):  # noqa: F821
+    """
+    Generate a personalized cover letter for a job.
+    """
+    _account_to(user)
+    system, user = _cover_letter_prompts(req)
 
-    letter = _ask_openai(system, user, temperature=0.4)
+    letter = await _ask_openai(system, user, temperature=0.4, route="ai.cover_letter")
 
     return CoverLetterResponse(cover_letter=letter)
 
 
+@router.post("/cover-letter/stream")
+async def stream_cover_letter(req: CoverLetterRequest, user=Depends(get_optional_user)):  # noqa: F821
+    """
+    Same as /cover-letter, streamed as SSE: "token" events, then a "result" event
+    with {"cover_letter": "..."}.
+    """
+    _require_openai()
+    _account_to(user)
+    system, user = _cover_letter_prompts(req)
+
+    async def events():
+        parts = []
+        async for delta in stream(
+            [
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            route="ai.cover_letter",
+            model="gpt-4o-mini",
+            temperature=0.4,
+            max_tokens=1800,
+        ):
+            parts.append(delta)
+            yield "token", {"text": delta}
+        yield "result", {"cover_letter": "".join(parts)}
+
+    return sse_response(events())
+
+
+@router.get("/metrics")
+def ai_metrics(x_metrics_token: Optional[str] = Header(default=None)):
+    """
+    LLM latency/token/cost histograms per route (and per user with a valid X-Metrics-Token),
+    plus scheduler and in-flight coalescing counters.
+    """
+    include_users = bool(LLM_METRICS_TOKEN) and x_metrics_token == LLM_METRICS_TOKEN
+    data = llm_metrics.snapshot(include_users=include_users)
+    data["scheduler"] = scheduler.stats()
+    data["singleflight"] = ai_flight.stats()
+    return data
+
+
 @router.get("/health")
 def ai_health():
     return {
@@ -4,14 +4,18 @@ import logging
 from typing import Optional
 
 from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel, EmailStr
 
+from app.core import passwords
 from app.core.auth_utils import (
-    create_user,
-    authenticate_user,
+    create_user_async,
+    authenticate_user_async,
     create_access_token,
     get_current_user,
+    get_password_hash_async,
+    update_user,
 )
 
 logger = logging.getLogger("makwande-auto-apply")
@@ -27,8 +31,22 @@ class SignupRequest(BaseModel):
     full_name: Optional[str] = ""
 
 
+class ChangePasswordRequest(BaseModel):
+    current_password: str
+    new_password: str
+
+
+class DeactivateRequest(BaseModel):
+    password: str
+
+
+async def _confirm_password(current_user: dict, password: str) -> None:
+    if not await authenticate_user_async(current_user["email"], password):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+
+
 @router.post("/signup", operation_id="auth_signup")
-def signup(payload: SignupRequest):
+async def signup(payload: SignupRequest):
     """
     JSON signup:
     {
@@ -38,7 +56,7 @@ def signup(payload: SignupRequest):
     }
     """
     try:
-        user = create_user(
+        user = await create_user_async(
             email=str(payload.email),
             password=payload.password,
             full_name=payload.full_name or "",
@@ -54,18 +72,19 @@ def signup(payload: SignupRequest):
 
 
 @router.post("/login", operation_id="auth_login")
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     """
     Swagger "Authorize" uses x-www-form-urlencoded:
     - username (we treat as email)
     - password
     """
     try:
-        user = authenticate_user(form_data.username, form_data.password)
+        user = await authenticate_user_async(form_data.username, form_data.password)
         if not user:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-        token = create_access_token({"sub": user["email"]})
+        # cv: credentials version; a password change or deactivation revokes older tokens
+        token = create_access_token({"sub": user["email"], "cv": int(user.get("credentials_version", 0))})
         return {"access_token": token, "token_type": "bearer"}
 
     except HTTPException:
@@ -76,9 +95,39 @@ def login(form_data: OAuth2PasswordRequestForm = Depends()):
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@router.get("/hash-stats", operation_id="auth_hash_stats")
+def hash_stats():
+    """
+    Password hash pool: queue depth, rejections and hash/queue-wait latency.
+    """
+    return passwords.stats()
+
+
 @router.get("/me", operation_id="auth_me")
 def me(current_user=Depends(get_current_user)):
     """
     Returns the currently logged-in user.
     """
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+@router.post("/change-password", operation_id="auth_change_password")
+async def change_password(payload: ChangePasswordRequest, current_user=Depends(get_current_user)):
+    """
+    Change the logged-in user's password. Every token issued before the change
+    (on any device) stops working; log in again with the new password.
+    """
+    await _confirm_password(current_user, payload.current_password)
+    password_hash = await get_password_hash_async(payload.new_password)
+    await run_in_threadpool(update_user, current_user["email"], password_hash=password_hash)
+    return {"ok": True, "detail": "Password changed, please log in again"}
+
+
+@router.post("/deactivate", operation_id="auth_deactivate")
+async def deactivate(payload: DeactivateRequest, current_user=Depends(get_current_user)):
+    """
+    Deactivate the logged-in account. Its tokens are revoked and login is refused.
+    """
+    await _confirm_password(current_user, payload.password)
+    await run_in_threadpool(update_user, current_user["email"], is_active=False)
+    return {"ok": True, "detail": "Account deactivated"}
@@ -3,91 +3,22 @@ import os
 import json
 import hmac
 import hashlib
-import sqlite3
-from datetime import datetime, timezone
 from typing import Optional, Dict, Any
 
 import requests
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr, Field
 
+from app.services import payments
+from app.services.resilience import DeadlineExceeded, retry_call
+
 router = APIRouter(prefix="/billing", tags=["Billing (Paystack)"])
 
 PAYSTACK_SECRET_KEY = os.getenv("PAYSTACK_SECRET_KEY", "")
 PAYSTACK_PUBLIC_KEY = os.getenv("PAYSTACK_PUBLIC_KEY", "")
 PAYSTACK_BASE_URL = os.getenv("PAYSTACK_BASE_URL", "https://api.paystack.co")
-
-DB_PATH = os.getenv("SQLITE_DB_PATH", "data/app.db")
-
-
-# -----------------------------
-# DB helpers (no SQLAlchemy)
-# -----------------------------
-def _utc_now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
-
-def _connect():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True) if os.path.dirname(DB_PATH) else None
-    return sqlite3.connect(DB_PATH)
-
-def _init_db():
-    with _connect() as conn:
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS payments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            reference TEXT UNIQUE NOT NULL,
-            email TEXT NOT NULL,
-            amount_kobo INTEGER NOT NULL,
-            currency TEXT NOT NULL DEFAULT 'ZAR',
-            status TEXT NOT NULL DEFAULT 'initialized',
-            channel TEXT,
-            paid_at TEXT,
-            plan_code TEXT,
-            metadata_json TEXT,
-            raw_json TEXT,
-            created_at TEXT NOT NULL,
-            updated_at TEXT NOT NULL
-        );
-        """)
-        conn.commit()
-
-def _upsert_payment(reference: str, email: str, amount_kobo: int, currency: str = "ZAR",
-                    status: str = "initialized", plan_code: Optional[str] = None,
-                    metadata: Optional[Dict[str, Any]] = None,
-                    raw: Optional[Dict[str, Any]] = None,
-                    channel: Optional[str] = None,
-                    paid_at: Optional[str] = None):
-    _init_db()
-    now = _utc_now_iso()
-    metadata_json = json.dumps(metadata or {}, ensure_ascii=False)
-    raw_json = json.dumps(raw or {}, ensure_ascii=False)
-
-    with _connect() as conn:
-        conn.execute("""
-        INSERT INTO payments (reference, email, amount_kobo, currency, status, channel, paid_at, plan_code,
-                             metadata_json, raw_json, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(reference) DO UPDATE SET
-            email=excluded.email,
-            amount_kobo=excluded.amount_kobo,
-            currency=excluded.currency,
-            status=excluded.status,
-            channel=COALESCE(excluded.channel, payments.channel),
-            paid_at=COALESCE(excluded.paid_at, payments.paid_at),
-            plan_code=COALESCE(excluded.plan_code, payments.plan_code),
-            metadata_json=excluded.metadata_json,
-            raw_json=excluded.raw_json,
-            updated_at=excluded.updated_at;
-        """, (reference, email, amount_kobo, currency, status, channel, paid_at, plan_code,
-              metadata_json, raw_json, now, now))
-        conn.commit()
-
-def _get_payment(reference: str) -> Optional[Dict[str, Any]]:
-    _init_db()
-    with _connect() as conn:
-        conn.row_factory = sqlite3.Row
-        row = conn.execute("SELECT * FROM payments WHERE reference = ?", (reference,)).fetchone()
-        return dict(row) if row else None
+PAYSTACK_TIMEOUT_S = float(os.getenv("PAYSTACK_TIMEOUT_S", "15"))
 
 
 # -----------------------------
@@ -136,10 +67,41 @@ def _rands_to_kobo(amount_rands: int) -> int:
         raise HTTPException(status_code=400, detail="Amount must be greater than 0")
     return amount_rands * 100
 
-def _paystack_post(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+# urllib3 errors raised before a connection exists (requests wraps them in ConnectionError)
+_CONNECT_FAILURES = {"NewConnectionError", "NameResolutionError", "ConnectTimeoutError"}
+
+def _not_sent(err: BaseException) -> bool:
+    """True when Paystack certainly did not process the request, so a POST may be retried."""
+    if isinstance(err, requests.HTTPError):
+        return err.response is not None and err.response.status_code == 429
+    if isinstance(err, requests.ConnectTimeout):
+        return True
+    if isinstance(err, requests.ConnectionError):
+        reason = err.args[0] if err.args else None
+        reason = getattr(reason, "reason", reason)  # MaxRetryError wraps the cause
+        return type(reason).__name__ in _CONNECT_FAILURES
+    return False
+
+def _paystack_request(method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     _require_secret_key()
     url = f"{PAYSTACK_BASE_URL.rstrip('/')}/{path.lstrip('/')}"
-    resp = requests.post(url, headers=_headers(), json=payload, timeout=30)
+
+    def attempt(timeout: float) -> requests.Response:
+        resp = requests.request(method, url, headers=_headers(), json=payload, timeout=timeout)
+        if resp.status_code == 429 or resp.status_code >= 500:
+            resp.raise_for_status()  # transient: let retry_call back off and try again
+        return resp
+
+    # A POST that may have reached Paystack (5xx, read errors) is never repeated
+    retry_if = None if method == "GET" else _not_sent
+    try:
+        resp = retry_call(attempt, per_try_s=PAYSTACK_TIMEOUT_S, what=f"Paystack {method} {path}", retry_if=retry_if)
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail="Paystack request timed out")
+    except requests.HTTPError as e:
+        resp = e.response  # still 429/5xx after retries: report Paystack's message below
+    except requests.RequestException as e:
+        raise HTTPException(status_code=502, detail=f"Paystack unreachable: {type(e).__name__}")
     try:
         data = resp.json()
     except Exception:
@@ -149,17 +111,11 @@ def _paystack_post(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         raise HTTPException(status_code=502, detail=f"Paystack error: {data.get('message', 'unknown')}")
     return data
 
+def _paystack_post(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    return _paystack_request("POST", path, payload)
+
 def _paystack_get(path: str) -> Dict[str, Any]:
-    _require_secret_key()
-    url = f"{PAYSTACK_BASE_URL.rstrip('/')}/{path.lstrip('/')}"
-    resp = requests.get(url, headers=_headers(), timeout=30)
-    try:
-        data = resp.json()
-    except Exception:
-        raise HTTPException(status_code=502, detail="Paystack returned non-JSON response")
-    if not resp.ok or not data.get("status"):
-        raise HTTPException(status_code=502, detail=f"Paystack error: {data.get('message', 'unknown')}")
-    return data
+    return _paystack_request("GET", path)
 
 def _verify_webhook_signature(raw_body: bytes, signature: Optional[str]) -> bool:
     if not signature or not PAYSTACK_SECRET_KEY:
@@ -189,7 +145,7 @@ def paystack_config():
 
 
 @router.post("/paystack/init", response_model=PaystackInitResponse)
-def init_payment(req: PaystackInitRequest):
+def init_payment(req: PaystackInitRequest, background: BackgroundTasks):
     """
     Start a Paystack transaction and return an authorization_url.
     """
@@ -211,7 +167,7 @@ def init_payment(req: PaystackInitRequest):
     d = data["data"]
 
     reference = d["reference"]
-    _upsert_payment(
+    payments.upsert_payment(
         reference=reference,
         email=req.email,
         amount_kobo=amount_kobo,
@@ -219,8 +175,8 @@ def init_payment(req: PaystackInitRequest):
         status="initialized",
         plan_code=req.plan_code,
         metadata=req.metadata,
-        raw=data,
     )
+    background.add_task(payments.record_event, reference, "init", None, data)
 
     return PaystackInitResponse(
         reference=reference,
@@ -230,7 +186,7 @@ def init_payment(req: PaystackInitRequest):
 
 
 @router.get("/paystack/verify/{reference}", response_model=VerifyResponse)
-def verify_payment(reference: str):
+def verify_payment(reference: str, background: BackgroundTasks):
     """
     Verify a Paystack transaction by reference.
     """
@@ -245,17 +201,18 @@ def verify_payment(reference: str):
     currency = d.get("currency") or "ZAR"
     paid_at = d.get("paid_at")
 
-    _upsert_payment(
+    # An empty email keeps the stored one (no read needed)
+    payments.upsert_payment(
         reference=reference,
-        email=email or (_get_payment(reference) or {}).get("email", "unknown@example.com"),
+        email=email,
         amount_kobo=amount_kobo,
         currency=currency,
         status="success" if paid else status or "failed",
         channel=d.get("channel"),
         paid_at=paid_at,
         metadata=d.get("metadata") or {},
-        raw=data,
     )
+    background.add_task(payments.record_event, reference, "verify", None, data)
 
     return VerifyResponse(
         reference=reference,
@@ -269,12 +226,12 @@ def verify_payment(reference: str):
 
 
 @router.post("/paystack/webhook")
-async def paystack_webhook(request: Request):
+async def paystack_webhook(request: Request, background: BackgroundTasks):
     """
     Paystack webhook endpoint.
 
     ✅ Verifies x-paystack-signature using HMAC SHA512.
-    ✅ Updates SQLite payment status.
+    ✅ Updates SQLite payment status (one upsert; the raw event is stored after responding).
     """
     raw_body = await request.body()
     signature = request.headers.get("x-paystack-signature")
@@ -303,17 +260,19 @@ async def paystack_webhook(request: Request):
         # Map webhook events to a clean status
         normalized_status = "success" if status == "success" else (status or "unknown")
 
-        _upsert_payment(
+        # Missing email/amount keep the stored values inside the upsert itself
+        await run_in_threadpool(
+            payments.upsert_payment,
             reference=reference,
-            email=email or (_get_payment(reference) or {}).get("email", "unknown@example.com"),
-            amount_kobo=amount_kobo or int((_get_payment(reference) or {}).get("amount_kobo", 0) or 0),
+            email=email,
+            amount_kobo=amount_kobo,
             currency=currency,
             status=normalized_status,
             channel=channel,
             paid_at=paid_at,
             metadata=data.get("metadata") or {},
-            raw=event,
         )
+        background.add_task(payments.record_event, reference, "webhook", event_type, raw_body.decode("utf-8"))
 
     # Always return 200 so Paystack considers it received
     return {"received": True, "event": event_type}
@@ -1,25 +1,41 @@
 import os
-import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from pydantic import BaseModel
 from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
 
 from app.core.auth_utils import get_current_user
-from app.services.cv_text import extract_cv_text
-from app.services.revamp_engine import revamp_cv
-from app.services.cover_letter_engine import generate_cover_letter
+from app.services.cv_cache import get_cached_document, get_cached_failure
+from app.services.cv_document import CVDocument, CVSpan
+from app.services.cv_jobs import ParseQueueFull, get_status, pending_job, register_done, submit_parse
+from app.services.cv_store import (
+    UPLOAD_DIR,
+    EmptyUpload,
+    StoredUpload,
+    UploadTooLarge,
+    add_user_ref,
+    resolve_upload,
+    save_upload,
+    sha256_of,
+)
+from app.services.revamp_engine import revamp_cv, stream_revamp_cv
+from app.services.cover_letter_engine import generate_cover_letter, stream_cover_letter, stream_cover_letters_batch
+from app.services.sse import sse_response
+from app.services import llm_metrics
 from fastapi import (
     APIRouter,
     UploadFile,
     File,
     HTTPException,
-    Depends   # ✅ ADD THIS
+    Depends,   # ✅ ADD THIS
+    Header,
 )
 
 
 router = APIRouter(prefix="/cv", tags=["CV"])
 
-UPLOAD_DIR = os.path.join("data", "uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
@@ -29,6 +45,7 @@ class RevampRequest(BaseModel):
     target_role: str | None = ""
     country: str | None = "South Africa"
     cv_text: str | None = None
+    regenerate: bool = False  # skip the LLM response cache (same as Cache-Control: no-cache)
 
 
 class CoverLetterRequest(BaseModel):
@@ -37,6 +54,98 @@ class CoverLetterRequest(BaseModel):
     job_title: str
     company: str
     job_description: str | None = ""
+    include_raw_cv: bool = False
+    regenerate: bool = False
+
+
+class BatchJob(BaseModel):
+    job_title: str
+    company: str
+    job_description: str | None = ""
+
+
+class CoverLetterBatchRequest(BaseModel):
+    stored_as: str | None = None
+    cv_text: str | None = None
+    jobs: list[BatchJob]
+    include_raw_cv: bool = False
+    regenerate: bool = False
+
+
+MAX_BATCH_JOBS = int(os.getenv("CV_MAX_BATCH_JOBS", "100"))
+
+
+def _stored_cv_document(stored_as: str, user_email: str) -> CVDocument:
+    """
+    An uploaded CV's parsed document, from the parse cache only. On a miss (e.g. after a
+    PARSER_VERSION bump) it is queued on the background parser rather than parsed here;
+    409 means a parse is pending, 400 that a recent one failed or found no text.
+    """
+    p = resolve_upload(stored_as, user_email)
+    if not p:
+        raise HTTPException(status_code=404, detail="Stored CV not found")
+    sha256 = sha256_of(stored_as)
+    doc = get_cached_document(p, sha256)
+    if doc is not None:
+        return doc
+    document_id = pending_job(stored_as, user_email)
+    if document_id is None:
+        error = get_cached_failure(p, sha256)
+        if error is not None:
+            raise HTTPException(status_code=400, detail=error)
+        try:
+            document_id = submit_parse(p, stored_as, stored_as, user_email, sha256)
+        except ParseQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+    raise HTTPException(status_code=409, detail={
+        "error": "CV is still being processed, retry once it is done",
+        "document_id": document_id,
+        "status_url": f"/cv/status/{document_id}",
+    })
+
+
+def _use_cache(regenerate: bool, cache_control: str | None) -> bool:
+    """False when the client asks for a fresh generation: regenerate=true or Cache-Control: no-cache."""
+    directives = {d.strip().lower() for d in (cache_control or "").split(",")}
+    return not (regenerate or "no-cache" in directives or "no-store" in directives)
+
+
+async def _request_cv(
+    cv_text: str | None, stored_as: str | None, user_email: str
+) -> Tuple[str, Optional[List[CVSpan]]]:
+    """(cv_text, sections): sections come from the cached document of a stored upload."""
+    # LLM calls made for this request are accounted to the user
+    llm_metrics.set_user(user_email)
+
+    # You can pass raw cv_text OR a stored file reference
+    cv_text = (cv_text or "").strip()
+    sections = None
+
+    if not cv_text and stored_as:
+        # Cache reads are file IO, so keep them off the event loop
+        doc = await run_in_threadpool(_stored_cv_document, stored_as, user_email)
+        cv_text, sections = doc.text, doc.sections
+
+    if not cv_text:
+        raise HTTPException(status_code=400, detail="No CV text provided or extractable")
+    return cv_text, sections
+
+
+def _register_upload(stored: StoredUpload, filename: str, user_email: str) -> Dict[str, Any]:
+    """Record the user's ref and start (or skip) parsing; returns the job status."""
+    add_user_ref(user_email, stored, filename)
+
+    # Re-upload of a file we've already parsed: no parsing at all.
+    doc = get_cached_document(stored.path, stored.sha256)
+    if doc is not None:
+        document_id = register_done(stored.stored_as, filename, user_email, doc)
+    else:
+        # Parsing runs in the background pool; poll /cv/status/{document_id} for the text.
+        try:
+            document_id = submit_parse(stored.path, stored.stored_as, filename, user_email, stored.sha256)
+        except ParseQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+    return get_status(document_id) or {"document_id": document_id}
 
 
 @router.post("/upload")
@@ -49,43 +158,56 @@ async def upload(file: UploadFile = File(...), user=Depends(get_current_user)):
         raise HTTPException(status_code=400, detail="Upload PDF or DOCX only")
 
     ext = os.path.splitext(file.filename)[1].lower()
-    saved_name = f"{uuid.uuid4().hex}{ext}"
-    saved_path = os.path.join(UPLOAD_DIR, saved_name)
 
-    content = await file.read()
-    if not content:
+    # Streamed to disk in chunks with a hard size cap; stored once per SHA-256.
+    try:
+        stored = await save_upload(file, ext)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except EmptyUpload:
         raise HTTPException(status_code=400, detail="Empty file")
 
-    with open(saved_path, "wb") as f:
-        f.write(content)
-
-    cv_text = extract_cv_text(saved_path)
+    # Refs lock, cache read and job bookkeeping are blocking: keep them off the event loop
+    job = await run_in_threadpool(_register_upload, stored, file.filename, user["email"])
+    document_id = job["document_id"]
 
     return {
         "message": "CV uploaded ✅",
         "filename": file.filename,
-        "stored_as": saved_name,
-        "path": saved_path,
-        "text_preview": cv_text[:600] if cv_text else "",
+        "stored_as": stored.stored_as,
+        "size": stored.size,
+        "deduplicated": stored.deduplicated,
+        "document_id": document_id,
+        "status": job.get("status", "queued"),
+        "status_url": f"/cv/status/{document_id}",
+        "text_preview": job.get("text_preview", ""),
         "user": user,
     }
 
 
-@router.post("/revamp")
-def revamp(req: RevampRequest, user=Depends(get_current_user)):  # noqa: F821
-    # You can pass raw cv_text OR a stored file reference
-    cv_text = (req.cv_text or "").strip()
+@router.get("/status/{document_id}")
+def parse_status(document_id: str, user=Depends(get_current_user)):  # noqa: F821
+    job = get_status(document_id)
+    if not job or job.get("user_email") != user["email"]:
+        raise HTTPException(status_code=404, detail="Document not found")
+    job.pop("user_email", None)
+    return job
 
-    if not cv_text and req.stored_as:
-        p = os.path.join(UPLOAD_DIR, req.stored_as)
-        if not os.path.exists(p):
-            raise HTTPException(status_code=404, detail="Stored CV not found")
-        cv_text = extract_cv_text(p)
-
-    if not cv_text:
-        raise HTTPException(status_code=400, detail="No CV text provided or extractable")
 
-    res = revamp_cv(cv_text=cv_text, target_role=req.target_role or "", country=req.country or "South Africa")
+@router.post("/revamp")
+async def revamp(
+    req: RevampRequest,
+    user=Depends(get_current_user),  # noqa: F821
+    cache_control: str | None = Header(default=None),
+):
+    cv_text, sections = await _request_cv(req.cv_text, req.stored_as, user["email"])
+    res = await revamp_cv(
+        cv_text=cv_text,
+        target_role=req.target_role or "",
+        country=req.country or "South Africa",
+        cv_sections=sections,
+        use_cache=_use_cache(req.regenerate, cache_control),
+    )
     if not res["ok"]:
         raise HTTPException(status_code=500, detail=res.get("error", "Revamp failed"))
 
@@ -93,26 +215,80 @@ def revamp(req: RevampRequest, user=Depends(get_current_user)):  # noqa: F821
 
 
 @router.post("/cover-letter")
-def cover_letter(req: CoverLetterRequest, user=Depends(get_current_user)):  # noqa: F821
-    cv_text = (req.cv_text or "").strip()
-
-    if not cv_text and req.stored_as:
-        p = os.path.join(UPLOAD_DIR, req.stored_as)
-        if not os.path.exists(p):
-            raise HTTPException(status_code=404, detail="Stored CV not found")
-        cv_text = extract_cv_text(p)
-
-    if not cv_text:
-        raise HTTPException(status_code=400, detail="No CV text provided or extractable")
-
-    res = generate_cover_letter(
+async def cover_letter(
+    req: CoverLetterRequest,
+    user=Depends(get_current_user),  # noqa: F821
+    cache_control: str | None = Header(default=None),
+):
+    cv_text, sections = await _request_cv(req.cv_text, req.stored_as, user["email"])
+    res = await generate_cover_letter(
         cv_text=cv_text,
         job_title=req.job_title,
         company=req.company,
         job_description=req.job_description or "",
+        include_raw_cv=req.include_raw_cv,
+        cv_sections=sections,
+        use_cache=_use_cache(req.regenerate, cache_control),
     )
 
     if not res["ok"]:
         raise HTTPException(status_code=500, detail=res.get("error", "Cover letter failed"))
 
     return {"ok": True, "user": user, "cover_letter": res["result"]}
+
+
+@router.post("/revamp/stream")
+async def revamp_stream(
+    req: RevampRequest,
+    user=Depends(get_current_user),  # noqa: F821
+    cache_control: str | None = Header(default=None),
+):
+    """SSE: "token" events while generating, then one "result" event with the parsed revamp."""
+    cv_text, sections = await _request_cv(req.cv_text, req.stored_as, user["email"])
+    return sse_response(stream_revamp_cv(
+        cv_text=cv_text,
+        target_role=req.target_role or "",
+        country=req.country or "South Africa",
+        cv_sections=sections,
+        use_cache=_use_cache(req.regenerate, cache_control),
+    ))
+
+
+@router.post("/cover-letter/stream")
+async def cover_letter_stream(
+    req: CoverLetterRequest,
+    user=Depends(get_current_user),  # noqa: F821
+    cache_control: str | None = Header(default=None),
+):
+    """SSE: "token" events while generating, then one "result" event with the parsed cover letter."""
+    cv_text, sections = await _request_cv(req.cv_text, req.stored_as, user["email"])
+    return sse_response(stream_cover_letter(
+        cv_text=cv_text,
+        job_title=req.job_title,
+        company=req.company,
+        job_description=req.job_description or "",
+        include_raw_cv=req.include_raw_cv,
+        cv_sections=sections,
+        use_cache=_use_cache(req.regenerate, cache_control),
+    ))
+
+
+@router.post("/cover-letter/batch")
+async def cover_letter_batch(
+    req: CoverLetterBatchRequest,
+    user=Depends(get_current_user),  # noqa: F821
+    cache_control: str | None = Header(default=None),
+):
+    """SSE: one "progress" event per finished letter (with the letter), then a "result" summary."""
+    if not req.jobs:
+        raise HTTPException(status_code=400, detail="No jobs provided")
+    if len(req.jobs) > MAX_BATCH_JOBS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_JOBS} jobs per batch")
+    cv_text, sections = await _request_cv(req.cv_text, req.stored_as, user["email"])
+    return sse_response(stream_cover_letters_batch(
+        cv_text=cv_text,
+        jobs=[j.model_dump() for j in req.jobs],
+        include_raw_cv=req.include_raw_cv,
+        cv_sections=sections,
+        use_cache=_use_cache(req.regenerate, cache_control),
+    ))
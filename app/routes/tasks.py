@@ -0,0 +1,108 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.auth_utils import get_current_user
+from app.routes.cv import (
+    MAX_BATCH_JOBS,
+    CoverLetterBatchRequest,
+    CoverLetterRequest,
+    RevampRequest,
+    _request_cv,
+    _use_cache,
+)
+from app.services import ai_tasks  # noqa: F401  (registers the task kinds)
+from app.services import task_queue
+
+router = APIRouter(prefix="/tasks", tags=["Tasks"])
+
+
+async def _submit(kind: str, payload: dict, user: dict, priority: int, idempotency_key: Optional[str]):
+    task = await run_in_threadpool(
+        task_queue.submit, kind, payload, user["email"], priority, idempotency_key,
+    )
+    out = task_queue.public_view(task)
+    out["status_url"] = f"/tasks/{task['id']}"
+    return out
+
+
+@router.post("/cv/revamp", status_code=202)
+async def submit_revamp(
+    req: RevampRequest,
+    user=Depends(get_current_user),  # noqa: F821
+    idempotency_key: Optional[str] = Header(default=None),
+    cache_control: Optional[str] = Header(default=None),
+):
+    """Queue a CV revamp; poll status_url for the result."""
+    cv_text, _ = await _request_cv(req.cv_text, req.stored_as, user["email"])
+    payload = {
+        "cv_text": cv_text,
+        "target_role": req.target_role or "",
+        "country": req.country or "South Africa",
+        "use_cache": _use_cache(req.regenerate, cache_control),
+    }
+    return await _submit("cv.revamp", payload, user, task_queue.PRIORITY_INTERACTIVE, idempotency_key)
+
+
+@router.post("/cv/cover-letter", status_code=202)
+async def submit_cover_letter(
+    req: CoverLetterRequest,
+    user=Depends(get_current_user),  # noqa: F821
+    idempotency_key: Optional[str] = Header(default=None),
+    cache_control: Optional[str] = Header(default=None),
+):
+    """Queue a cover letter; poll status_url for the result."""
+    cv_text, _ = await _request_cv(req.cv_text, req.stored_as, user["email"])
+    payload = {
+        "cv_text": cv_text,
+        "job_title": req.job_title,
+        "company": req.company,
+        "job_description": req.job_description or "",
+        "include_raw_cv": req.include_raw_cv,
+        "use_cache": _use_cache(req.regenerate, cache_control),
+    }
+    return await _submit("cv.cover_letter", payload, user, task_queue.PRIORITY_INTERACTIVE, idempotency_key)
+
+
+@router.post("/cv/cover-letter/batch", status_code=202)
+async def submit_cover_letter_batch(
+    req: CoverLetterBatchRequest,
+    user=Depends(get_current_user),  # noqa: F821
+    idempotency_key: Optional[str] = Header(default=None),
+    cache_control: Optional[str] = Header(default=None),
+):
+    """Queue one letter per job as a single batch-priority task."""
+    if not req.jobs:
+        raise HTTPException(status_code=400, detail="No jobs provided")
+    if len(req.jobs) > MAX_BATCH_JOBS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_JOBS} jobs per batch")
+    cv_text, _ = await _request_cv(req.cv_text, req.stored_as, user["email"])
+    payload = {
+        "cv_text": cv_text,
+        "jobs": [j.model_dump() for j in req.jobs],
+        "include_raw_cv": req.include_raw_cv,
+        "use_cache": _use_cache(req.regenerate, cache_control),
+    }
+    return await _submit("cv.cover_letter_batch", payload, user, task_queue.PRIORITY_BATCH, idempotency_key)
+
+
+@router.get("")
+def list_tasks(limit: int = 50, user=Depends(get_current_user)):  # noqa: F821
+    tasks = task_queue.list_for_user(user["email"], limit=max(1, min(limit, 200)))
+    return {"tasks": [task_queue.public_view(t) for t in tasks]}
+
+
+@router.get("/{task_id}")
+def task_status(task_id: str, user=Depends(get_current_user)):  # noqa: F821
+    task = task_queue.get(task_id)
+    if not task or task["user_email"] != user["email"]:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return task_queue.public_view(task)
+
+
+@router.delete("/{task_id}")
+def cancel_task(task_id: str, user=Depends(get_current_user)):  # noqa: F821
+    if not task_queue.cancel(task_id, user["email"]):
+        raise HTTPException(status_code=409, detail="Task not found or already started")
+    return {"ok": True, "task_id": task_id, "status": task_queue.CANCELLED}
@@ -1,27 +1,270 @@
 import os
-from openai import OpenAI
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-def get_client():
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from app.services import llm_cache, llm_metrics
+from app.services.ai_scheduler import OPENAI_MAX_CONCURRENCY, is_rate_limited, retry_after_s, scheduler
+from app.services.prompt_compact import count_tokens
+from app.services.resilience import DeadlineExceeded, no_deadline, retry_async, within_deadline
+from app.services.singleflight import ai_flight
+
+logger = logging.getLogger("makwande-auto-apply")
+
+OPENAI_TIMEOUT_S = float(os.getenv("OPENAI_TIMEOUT_S", "60"))
+# Completion size assumed for TPM accounting when a call sets no max_tokens
+OPENAI_DEFAULT_OUTPUT_TOKENS = int(os.getenv("OPENAI_DEFAULT_OUTPUT_TOKENS", "1000"))
+
+_async_client: Optional[AsyncOpenAI] = None
+
+
+class AIUnavailable(RuntimeError):
+    pass
+
+
+def default_model() -> str:
+    # choose a safe default model you already use
+    return os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], params: Dict[str, Any]) -> int:
+    """Prompt + max completion tokens, charged against the TPM bucket up front."""
+    prompt = sum(count_tokens(str(m.get("content") or "")) + 4 for m in messages)
+    return prompt + int(params.get("max_tokens") or OPENAI_DEFAULT_OUTPUT_TOKENS)
+
+
+# -----------------------------
+# Shared clients
+# -----------------------------
+def init_ai_client() -> Optional[AsyncOpenAI]:
+    """
+    Create the process-wide async client + connection pool (called at app startup).
+    OPENAI_BASE_URL points it at another endpoint, e.g. scripts/mock_llm_server.py.
+    """
+    global _async_client
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         return None
-    return OpenAI(api_key=api_key)
+    if _async_client is None:
+        _async_client = AsyncOpenAI(
+            api_key=api_key,
+            timeout=OPENAI_TIMEOUT_S,
+            max_retries=0,  # retries are deadline-aware, see resilience.retry_async
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONCURRENCY * 2,
+                    max_keepalive_connections=OPENAI_MAX_CONCURRENCY,
+                ),
+            ),
+        )
+        logger.info(f"✅ OpenAI async client ready (max {OPENAI_MAX_CONCURRENCY} concurrent)")
+    return _async_client
 
-def chat_json(system: str, user: str):
-    client = get_client()
-    if not client:
-        return {"ok": False, "error": "OPENAI_API_KEY not set"}
 
-    # choose a safe default model you already use
-    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-
-    resp = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
+async def close_ai_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+    _async_client = None
+
+
+def get_async_client() -> Optional[AsyncOpenAI]:
+    return _async_client or init_ai_client()
+
+
+# -----------------------------
+# Completions
+# -----------------------------
+async def complete(
+    messages: List[Dict[str, Any]],
+    route: str,
+    model: Optional[str] = None,
+    use_cache: bool = True,
+    **params: Any,
+) -> str:
+    """
+    One chat completion through the shared async client, admitted by the rate-limit
+    scheduler at the caller's priority and served from the LLM response cache when
+    possible. Identical calls already in flight are joined instead of repeated.
+    Raises AIUnavailable without a key.
+    """
+    client = get_async_client()
+    if client is None:
+        raise AIUnavailable("OPENAI_API_KEY not set")
+    model = model or default_model()
+
+    called: Dict[str, Any] = {}
+
+    async def attempt(timeout: float):
+        return await scheduler.run(
+            lambda: client.chat.completions.create(model=model, messages=messages, timeout=timeout, **params),
+            est_tokens=estimate_tokens(messages, params),
+            usage=lambda r: getattr(getattr(r, "usage", None), "total_tokens", None),
+        )
+
+    async def call() -> str:
+        # scheduler.run owns 429s (pause + retry); this layer only retries other transient errors
+        resp = await retry_async(
+            attempt, per_try_s=OPENAI_TIMEOUT_S, what=f"OpenAI {route}",
+            retry_if=lambda e: not is_rate_limited(e),
+        )
+        called["usage"] = getattr(resp, "usage", None)
+        return resp.choices[0].message.content or ""
+
+    async def shared_call() -> str:
+        # Runs in the flight's own task: callers that join it may have longer deadlines
+        # than the one that started it, so the call is bounded by its retries only.
+        with no_deadline():
+            return await llm_cache.acached_completion(route, model, messages, params, call, use_cache=use_cache)
+
+    key = _flight_key(llm_cache.make_key(model, messages, params), use_cache)
+    shared = ai_flight.in_flight(key) is not None
+    started = time.perf_counter()
+    try:
+        # Each caller stops waiting at its own deadline; the shared call carries on
+        text = await within_deadline(ai_flight.do(key, shared_call))
+    except Exception as e:
+        llm_metrics.record(route, model, time.perf_counter() - started, error=type(e).__name__)
+        raise
+    cache = "shared" if shared else ("miss" if called else "hit")
+    llm_metrics.record(route, model, time.perf_counter() - started, cache=cache, usage=called.get("usage"))
+    return text
+
+
+def _flight_key(key: str, use_cache: bool) -> str:
+    """Single-flight key: a use_cache=False caller must not join a call that may be a cache hit."""
+    return key if use_cache else f"{key}:fresh"
+
+
+async def stream(
+    messages: List[Dict[str, Any]],
+    route: str,
+    model: Optional[str] = None,
+    use_cache: bool = True,
+    **params: Any,
+) -> AsyncIterator[str]:
+    """
+    Streaming complete(): yields text deltas as they arrive. Shares cache entries with
+    complete() (a hit is yielded as a single chunk) and stores the full text afterwards.
+    Identical streams in flight share one upstream call, which runs in its own task:
+    every subscriber gets the deltas live, and a disconnect only ends that subscriber.
+    """
+    client = get_async_client()
+    if client is None:
+        raise AIUnavailable("OPENAI_API_KEY not set")
+    model = model or default_model()
+
+    key = llm_cache.make_key(model, messages, params)
+    cache_on = use_cache and llm_cache.is_enabled(route)
+
+    async def produce() -> AsyncIterator[str]:
+        # The producer task is shared by every subscriber, so no one request's deadline applies
+        with no_deadline():
+            async for delta in _produce():
+                yield delta
+
+    async def _produce() -> AsyncIterator[str]:
+        started = time.perf_counter()
+        try:
+            if cache_on:
+                try:
+                    hit = await asyncio.to_thread(llm_cache.get, key)
+                except Exception as e:
+                    logger.warning(f"⚠️ LLM cache read failed: {e}")
+                    hit = None
+                if hit is not None:
+                    llm_metrics.record(route, model, time.perf_counter() - started, cache="hit")
+                    yield hit
+                    return
+
+            async def open_stream(timeout: float):
+                try:
+                    return await client.chat.completions.create(
+                        model=model, messages=messages, stream=True, timeout=timeout,
+                        stream_options={"include_usage": True}, **params,
+                    )
+                except Exception as e:
+                    # A 429 slows everyone else down too
+                    if is_rate_limited(e):
+                        await scheduler.penalize(retry_after_s(e))
+                    raise
+
+            parts: List[str] = []
+            usage = None
+            async with scheduler.slot(estimate_tokens(messages, params)):
+                # Only opening the stream is retried; once tokens flow, a failure is final
+                resp = await retry_async(open_stream, per_try_s=OPENAI_TIMEOUT_S, what=f"OpenAI {route} stream")
+                async for chunk in resp:
+                    # with include_usage the last chunk has no choices, only usage
+                    usage = getattr(chunk, "usage", None) or usage
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+        except Exception as e:
+            llm_metrics.record(route, model, time.perf_counter() - started, error=type(e).__name__)
+            raise
+        llm_metrics.record(route, model, time.perf_counter() - started, usage=usage)
+
+        text = "".join(parts)
+        if cache_on and text:
+            try:
+                await asyncio.to_thread(llm_cache.put, key, route, model, text)
+            except Exception as e:
+                logger.warning(f"⚠️ LLM cache write failed: {e}")
+
+    started = time.perf_counter()
+    joined, chunks = ai_flight.stream(_flight_key(key, use_cache), produce)
+    try:
+        async for delta in chunks:
+            yield delta
+    except Exception as e:
+        if joined:
+            llm_metrics.record(route, model, time.perf_counter() - started, error=type(e).__name__)
+        raise
+    if joined:
+        # The upstream call is accounted once, by its producer
+        llm_metrics.record(route, model, time.perf_counter() - started, cache="shared")
+
+
+def _json_messages(system: str, user: str) -> List[Dict[str, Any]]:
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+
+
+async def stream_chat_json(system: str, user: str, route: str = "chat_json", use_cache: bool = True) -> AsyncIterator[str]:
+    async for delta in stream(
+        _json_messages(system, user),
+        route=route,
+        use_cache=use_cache,
         response_format={"type": "json_object"},
         temperature=0.2,
-    )
-    return {"ok": True, "data": resp.choices[0].message.content}
+    ):
+        yield delta
+
+
+async def chat_json_async(system: str, user: str, route: str = "chat_json", use_cache: bool = True):
+    try:
+        data = await complete(
+            _json_messages(system, user),
+            route=route,
+            use_cache=use_cache,
+            response_format={"type": "json_object"},
+            temperature=0.2,
+        )
+    except AIUnavailable as e:
+        return {"ok": False, "error": str(e)}
+    except DeadlineExceeded:
+        return {"ok": False, "error": "AI request timed out"}
+    except Exception as e:
+        logger.warning(f"⚠️ OpenAI {route} failed: {e}")
+        return {"ok": False, "error": "AI processing failed"}
+    return {"ok": True, "data": data}
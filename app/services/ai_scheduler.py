@@ -0,0 +1,225 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+import contextvars
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger("makwande-auto-apply")
+
+T = TypeVar("T")
+
+# Lower runs first. Interactive (HTTP request) work always goes ahead of batch work.
+INTERACTIVE = 0
+BATCH = 10
+
+# Quota of the OpenAI org/project; set these to your tier's limits.
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "500"))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "200000"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+# Slots batch work may never take, so interactive users always get through.
+OPENAI_INTERACTIVE_RESERVE = int(os.getenv("OPENAI_INTERACTIVE_RESERVE", "4"))
+OPENAI_RATE_LIMIT_RETRIES = int(os.getenv("OPENAI_RATE_LIMIT_RETRIES", "3"))
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("ai_priority", default=INTERACTIVE)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+@asynccontextmanager
+async def priority(level: int) -> AsyncIterator[None]:
+    """Run AI calls made inside this block at the given priority (e.g. BATCH)."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, per_minute: int):
+        self.capacity = float(max(1, per_minute))
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, n: float) -> float:
+        self._refill()
+        n = min(n, self.capacity)
+        return 0.0 if self.tokens >= n else (n - self.tokens) / self.rate
+
+    def take(self, n: float) -> None:
+        self._refill()
+        self.tokens -= min(n, self.capacity)
+
+    def refund(self, n: float) -> None:
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + n)
+
+    def drain(self) -> None:
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+def retry_after_s(err: Exception) -> Optional[float]:
+    """Seconds from a 429's Retry-After / retry-after-ms header, if any."""
+    headers = getattr(getattr(err, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def is_rate_limited(err: Exception) -> bool:
+    return getattr(err, "status_code", None) == 429 or type(err).__name__ == "RateLimitError"
+
+
+class AIScheduler:
+    """
+    Admission control for LLM calls: requests/min and tokens/min token buckets,
+    a concurrency cap with slots reserved for interactive work, strict priority
+    ordering, and a shared pause when the API answers 429.
+    """
+
+    def __init__(
+        self,
+        rpm: int = OPENAI_RPM_LIMIT,
+        tpm: int = OPENAI_TPM_LIMIT,
+        max_concurrency: int = OPENAI_MAX_CONCURRENCY,
+        interactive_reserve: int = OPENAI_INTERACTIVE_RESERVE,
+    ):
+        self.rpm = TokenBucket(rpm)
+        self.tpm = TokenBucket(tpm)
+        self.max_concurrency = max(1, max_concurrency)
+        self.batch_limit = max(1, self.max_concurrency - max(0, interactive_reserve))
+        self.inflight = 0
+        self.batch_inflight = 0
+        self.paused_until = 0.0
+        self.rate_limited = 0
+        self._waiters: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._cond: Optional[asyncio.Condition] = None
+
+    def _condition(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def _delay(self, prio: int, est_tokens: int) -> Optional[float]:
+        """0 if the call may start now, seconds to wait for quota, or None to wait for a release."""
+        if self.inflight >= self.max_concurrency:
+            return None
+        if prio >= BATCH and self.batch_inflight >= self.batch_limit:
+            return None
+        pause = self.paused_until - time.monotonic()
+        return max(pause, self.rpm.wait_time(1), self.tpm.wait_time(est_tokens), 0.0)
+
+    async def acquire(self, prio: int, est_tokens: int) -> None:
+        cond = self._condition()
+        me = (prio, next(self._seq))
+        async with cond:
+            heapq.heappush(self._waiters, me)
+            try:
+                while True:
+                    delay = self._delay(prio, est_tokens) if self._waiters[0] == me else None
+                    if delay == 0.0:
+                        break
+                    try:
+                        await asyncio.wait_for(cond.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self._waiters.remove(me)
+                heapq.heapify(self._waiters)
+                cond.notify_all()
+            self.rpm.take(1)
+            self.tpm.take(est_tokens)
+            self.inflight += 1
+            if prio >= BATCH:
+                self.batch_inflight += 1
+
+    async def release(self, prio: int, est_tokens: int, used_tokens: Optional[int] = None) -> None:
+        cond = self._condition()
+        async with cond:
+            self.inflight -= 1
+            if prio >= BATCH:
+                self.batch_inflight -= 1
+            if used_tokens is not None and used_tokens < est_tokens:
+                self.tpm.refund(est_tokens - used_tokens)
+            cond.notify_all()
+
+    async def penalize(self, retry_after_s: Optional[float]) -> None:
+        """API said 429: stop everyone until Retry-After (or a short default) has passed."""
+        cond = self._condition()
+        async with cond:
+            self.rate_limited += 1
+            wait = retry_after_s if retry_after_s is not None else 2.0
+            self.paused_until = max(self.paused_until, time.monotonic() + wait)
+            self.rpm.drain()
+            cond.notify_all()
+        logger.warning(f"⚠️ OpenAI rate limited; pausing AI calls for {wait:.1f}s")
+
+    @asynccontextmanager
+    async def slot(self, est_tokens: int, prio: Optional[int] = None) -> AsyncIterator[None]:
+        prio = current_priority() if prio is None else prio
+        await self.acquire(prio, est_tokens)
+        try:
+            yield
+        finally:
+            await self.release(prio, est_tokens)
+
+    async def run(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        est_tokens: int,
+        prio: Optional[int] = None,
+        usage: Optional[Callable[[T], Optional[int]]] = None,
+    ) -> T:
+        """
+        Run one LLM call under the limits. 429s pause the scheduler and are retried
+        (up to OPENAI_RATE_LIMIT_RETRIES); `usage(result)` refunds unused TPM estimate.
+        """
+        prio = current_priority() if prio is None else prio
+        attempt = 0
+        while True:
+            await self.acquire(prio, est_tokens)
+            used = None
+            try:
+                result = await fn()
+                used = usage(result) if usage else None
+                return result
+            except Exception as e:
+                if not is_rate_limited(e) or attempt >= OPENAI_RATE_LIMIT_RETRIES:
+                    raise
+                attempt += 1
+                await self.penalize(retry_after_s(e))
+            finally:
+                await self.release(prio, est_tokens, used)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inflight": self.inflight,
+            "batch_inflight": self.batch_inflight,
+            "waiting": len(self._waiters),
+            "rpm_available": round(self.rpm.tokens, 1),
+            "tpm_available": round(self.tpm.tokens),
+            "paused_for_s": round(max(0.0, self.paused_until - time.monotonic()), 2),
+            "rate_limited_total": self.rate_limited,
+        }
+
+
+scheduler = AIScheduler()
@@ -0,0 +1,62 @@
+from typing import Any, Dict
+
+from app.services.cv_digest import get_cv_digest
+from app.services.cover_letter_engine import generate_cover_letter, generate_cover_letters_batch
+from app.services.revamp_engine import revamp_cv
+from app.services.task_queue import TaskFailed, register
+
+# Task kinds for the background queue. Payloads carry the CV text itself, so a task
+# doesn't depend on the submitting request (or process) still being around.
+
+
+def _unwrap(res: Dict[str, Any]) -> Any:
+    if res["ok"]:
+        return res["result"]
+    error = res.get("error") or "AI call failed"
+    # A missing key won't fix itself on retry; bad JSON or timeouts might
+    raise TaskFailed(error, retry="OPENAI_API_KEY" not in error)
+
+
+@register("cv.revamp")
+async def run_revamp(payload: Dict[str, Any]) -> Any:
+    return _unwrap(await revamp_cv(
+        cv_text=payload["cv_text"],
+        target_role=payload.get("target_role") or "",
+        country=payload.get("country") or "South Africa",
+        use_cache=payload.get("use_cache", True),
+    ))
+
+
+@register("cv.cover_letter")
+async def run_cover_letter(payload: Dict[str, Any]) -> Any:
+    return _unwrap(await generate_cover_letter(
+        cv_text=payload["cv_text"],
+        job_title=payload["job_title"],
+        company=payload["company"],
+        job_description=payload.get("job_description") or "",
+        include_raw_cv=bool(payload.get("include_raw_cv")),
+        use_cache=payload.get("use_cache", True),
+    ))
+
+
+@register("cv.cover_letter_batch")
+async def run_cover_letter_batch(payload: Dict[str, Any]) -> Any:
+    results = await generate_cover_letters_batch(
+        cv_text=payload["cv_text"],
+        jobs=payload["jobs"],
+        use_cache=payload.get("use_cache", True),
+        include_raw_cv=bool(payload.get("include_raw_cv")),
+    )
+    return {
+        "total": len(results),
+        "done": sum(1 for r in results if r["ok"]),
+        "results": results,
+    }
+
+
+@register("cv.digest")
+async def run_cv_digest(payload: Dict[str, Any]) -> Any:
+    # Queued by cv_digest.request_cv_digest() so interactive requests never build it
+    if await get_cv_digest(payload["cv_text"]) is None:
+        raise TaskFailed("CV digest could not be generated")
+    return {"ok": True}
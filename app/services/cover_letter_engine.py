@@ -1,7 +1,17 @@
 import json
-from app.services.ai_client import chat_json
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.services.ai_client import AIUnavailable, chat_json_async, stream_chat_json
+from app.services.ai_scheduler import BATCH, priority
+from app.services.cv_digest import cached_cv_digest, get_cv_digest
+from app.services.cv_document import CVSpan
+from app.services.json_repair import loads_lenient
+from app.services.prompt_compact import compact_cv, compact_text
 
 SYSTEM = """You write professional cover letters.
+The candidate is described by cv_digest (a factual summary of their CV) and/or cv_text.
+Use only facts found there.
 Return STRICT JSON with:
 - subject
 - cover_letter (string)
@@ -9,19 +19,136 @@ Return STRICT JSON with:
 No extra keys.
 """
 
-def generate_cover_letter(cv_text: str, job_title: str, company: str, job_description: str = ""):
+def _user_prompt(
+    cv_text: str, job_title: str, company: str, job_description: str,
+    cv_digest: Optional[str] = None, include_raw_cv: bool = False, cv_sections: Optional[List[CVSpan]] = None,
+) -> str:
+    jd = compact_text(job_description or "")
     user = {
         "job_title": job_title,
         "company": company,
-        "job_description": job_description[:15000],
-        "cv_text": cv_text[:15000]
+        "job_description": jd,
     }
-    res = chat_json(SYSTEM, json.dumps(user, ensure_ascii=False))
-    if not res["ok"]:
-        return res
+    if cv_digest:
+        user["cv_digest"] = cv_digest
+    # Raw CV only when asked for, or when no digest could be made
+    if include_raw_cv or not cv_digest:
+        user["cv_text"] = compact_cv(cv_text, target=f"{job_title} {company} {jd}", sections=cv_sections)
+    return json.dumps(user, ensure_ascii=False)
 
+def _parse(raw: str) -> Dict[str, Any]:
     try:
-        data = json.loads(res["data"])
+        data = loads_lenient(raw)
         return {"ok": True, "result": data}
     except Exception:
         return {"ok": False, "error": "AI returned invalid JSON"}
+
+async def generate_cover_letter(
+    cv_text: str, job_title: str, company: str, job_description: str = "", use_cache: bool = True,
+    include_raw_cv: bool = False, cv_digest: Optional[str] = None, cv_sections: Optional[List[CVSpan]] = None,
+):
+    """
+    Pass cv_digest when generating many letters for one CV. Otherwise only a stored digest
+    is used (see cv_digest.cached_cv_digest); a miss falls back to the compacted CV.
+    cv_sections (a stored CV's cached sections) spares compaction from re-segmenting it.
+    """
+    if include_raw_cv:
+        cv_digest = None
+    elif cv_digest is None:
+        cv_digest = await cached_cv_digest(cv_text)
+    user = _user_prompt(cv_text, job_title, company, job_description, cv_digest, include_raw_cv, cv_sections)
+    res = await chat_json_async(SYSTEM, user, route="cv.cover_letter", use_cache=use_cache)
+    if not res["ok"]:
+        return res
+    return _parse(res["data"])
+
+async def stream_cover_letter(
+    cv_text: str, job_title: str, company: str, job_description: str = "", use_cache: bool = True,
+    include_raw_cv: bool = False, cv_sections: Optional[List[CVSpan]] = None,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """Yields ("token", {"text": ...}) while generating, then ("result", data) or ("error", {...})."""
+    cv_digest = None if include_raw_cv else await cached_cv_digest(cv_text)
+    user = _user_prompt(cv_text, job_title, company, job_description, cv_digest, include_raw_cv, cv_sections)
+    parts = []
+    try:
+        async for delta in stream_chat_json(SYSTEM, user, route="cv.cover_letter", use_cache=use_cache):
+            parts.append(delta)
+            yield "token", {"text": delta}
+    except AIUnavailable as e:
+        yield "error", {"error": str(e)}
+        return
+
+    res = _parse("".join(parts))
+    if res["ok"]:
+        yield "result", res["result"]
+    else:
+        yield "error", {"error": res["error"]}
+
+async def stream_cover_letters_batch(
+    cv_text: str, jobs: List[Dict[str, Any]], use_cache: bool = True, include_raw_cv: bool = False,
+    cv_sections: Optional[List[CVSpan]] = None,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Generate one letter per job ({"job_title", "company", "job_description"}) concurrently at
+    batch priority; the AI scheduler paces them to the RPM/TPM quota behind interactive calls.
+    The CV digest is fetched (built if needed) once up front and shared by every letter.
+    Yields ("progress", {...}) as each finishes (in completion order), then ("result", summary).
+    """
+    cv_digest = None
+    if not include_raw_cv:
+        async with priority(BATCH):
+            cv_digest = await get_cv_digest(cv_text)
+
+    async def one(index: int, job: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        async with priority(BATCH):
+            try:
+                res = await generate_cover_letter(
+                    cv_text,
+                    job_title=job.get("job_title") or job.get("title") or "",
+                    company=job.get("company") or "",
+                    job_description=job.get("job_description") or job.get("description") or "",
+                    use_cache=use_cache,
+                    include_raw_cv=include_raw_cv,
+                    cv_digest=cv_digest,
+                    cv_sections=cv_sections,
+                )
+            except Exception as e:
+                res = {"ok": False, "error": str(e)}
+        return index, res
+
+    tasks = [asyncio.create_task(one(i, job)) for i, job in enumerate(jobs)]
+    done = failed = 0
+    try:
+        for fut in asyncio.as_completed(tasks):
+            index, res = await fut
+            if res["ok"]:
+                done += 1
+            else:
+                failed += 1
+            yield "progress", {
+                "index": index,
+                "ok": res["ok"],
+                "cover_letter": res.get("result"),
+                "error": res.get("error"),
+                "completed": done + failed,
+                "total": len(tasks),
+            }
+    finally:
+        # Client went away or the consumer stopped early: don't keep spending quota
+        for t in tasks:
+            t.cancel()
+
+    yield "result", {"total": len(tasks), "done": done, "failed": failed}
+
+
+async def generate_cover_letters_batch(
+    cv_text: str, jobs: List[Dict[str, Any]], use_cache: bool = True, include_raw_cv: bool = False
+) -> List[Dict[str, Any]]:
+    """Non-streaming batch: results in job order, each {"ok", "result"|"error"}."""
+    results: List[Dict[str, Any]] = [{"ok": False, "error": "not run"} for _ in jobs]
+    async for event, data in stream_cover_letters_batch(cv_text, jobs, use_cache=use_cache, include_raw_cv=include_raw_cv):
+        if event == "progress":
+            results[data["index"]] = (
+                {"ok": True, "result": data["cover_letter"]} if data["ok"] else {"ok": False, "error": data["error"]}
+            )
+    return results
@@ -0,0 +1,120 @@
+import os
+import time
+import hashlib
+import threading
+from datetime import datetime
+import logging
+from typing import Dict, Optional, Tuple
+
+from app.services.cv_document import PARSER_VERSION, CVDocument, build_cv_document
+from app.services.storage_json import read_json, write_json
+
+logger = logging.getLogger("makwande-auto-apply")
+
+# Cache lives next to the uploads: data/uploads/.cache/<sha256>.v<PARSER_VERSION>.json
+CACHE_DIRNAME = ".cache"
+# Failed / textless parses are remembered this long (<sha256>.v<PARSER_VERSION>.failed.json),
+# so requests get the error instead of queueing the same parse again; then it is retried.
+CV_PARSE_FAILURE_TTL_S = float(os.getenv("CV_PARSE_FAILURE_TTL_S", str(6 * 3600)))
+
+NO_TEXT_ERROR = "No CV text provided or extractable"
+
+# (path, mtime_ns, size) -> sha256, so repeat requests don't re-hash the file
+_sha_memo: Dict[Tuple[str, int, int], str] = {}
+_sha_lock = threading.Lock()
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with _sha_lock:
+        cached = _sha_memo.get(key)
+    if cached:
+        return cached
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+
+    with _sha_lock:
+        _sha_memo[key] = digest
+    return digest
+
+
+def cache_path(upload_path: str, sha256: str) -> str:
+    folder = os.path.join(os.path.dirname(os.path.abspath(upload_path)), CACHE_DIRNAME)
+    return os.path.join(folder, f"{sha256}.v{PARSER_VERSION}.json")
+
+
+def get_cached_document(upload_path: str, sha256: Optional[str] = None) -> Optional[CVDocument]:
+    sha256 = sha256 or file_sha256(upload_path)
+    entry = read_json(cache_path(upload_path, sha256), None)
+    if not isinstance(entry, dict) or entry.get("parser_version") != PARSER_VERSION:
+        return None
+    try:
+        return CVDocument.from_dict(entry["document"])
+    except Exception:
+        return None
+
+
+def put_cached_document(upload_path: str, sha256: str, doc: CVDocument) -> None:
+    write_json(cache_path(upload_path, sha256), {
+        "sha256": sha256,
+        "parser_version": PARSER_VERSION,
+        "document": doc.to_dict(),
+        "created_at": datetime.utcnow().isoformat(),
+    })
+
+
+def _failure_path(upload_path: str, sha256: str) -> str:
+    return cache_path(upload_path, sha256)[:-len(".json")] + ".failed.json"
+
+
+def get_cached_failure(upload_path: str, sha256: Optional[str] = None) -> Optional[str]:
+    """Error message of a recent failed or textless parse of this file, if any."""
+    sha256 = sha256 or file_sha256(upload_path)
+    entry = read_json(_failure_path(upload_path, sha256), None)
+    if not isinstance(entry, dict) or entry.get("parser_version") != PARSER_VERSION:
+        return None
+    if time.time() - float(entry.get("failed_at") or 0) > CV_PARSE_FAILURE_TTL_S:
+        return None
+    return str(entry.get("error") or NO_TEXT_ERROR)
+
+
+def put_cached_failure(upload_path: str, sha256: str, error: str) -> None:
+    write_json(_failure_path(upload_path, sha256), {
+        "sha256": sha256,
+        "parser_version": PARSER_VERSION,
+        "error": error,
+        "failed_at": time.time(),
+    })
+
+
+def cached_cv_document(upload_path: str, sha256: Optional[str] = None) -> CVDocument:
+    """
+    build_cv_document() with a content-addressed cache keyed by SHA-256 + parser version.
+    Identical files share one entry; bumping PARSER_VERSION invalidates old entries.
+    Pass sha256 when it is already known (content-addressed uploads) to skip hashing.
+    Raises ValueError for unsupported formats. Failures and empty results are not cached
+    as documents, only noted for a while (see get_cached_failure).
+    """
+    sha256 = sha256 or file_sha256(upload_path)
+    doc = get_cached_document(upload_path, sha256)
+    if doc is not None:
+        return doc
+
+    try:
+        doc = build_cv_document(upload_path)
+    except ValueError as e:
+        put_cached_failure(upload_path, sha256, str(e))
+        raise
+    except Exception:
+        put_cached_failure(upload_path, sha256, "Could not extract text from this file")
+        raise
+    if doc.text:
+        put_cached_document(upload_path, sha256, doc)
+    else:
+        put_cached_failure(upload_path, sha256, NO_TEXT_ERROR)
+    return doc
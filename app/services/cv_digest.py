@@ -0,0 +1,190 @@
+import os
+import json
+import asyncio
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.services import llm_metrics
+from app.services.ai_client import chat_json_async
+from app.services.json_repair import loads_lenient
+from app.services.prompt_compact import REVAMP_CV_TOKEN_BUDGET, compact_cv, normalize_text
+from app.services.storage_json import read_json, write_json
+from app.services.task_queue import PRIORITY_BATCH, submit
+
+logger = logging.getLogger("makwande-auto-apply")
+
+# Bump when the digest prompt or shape changes; old files are then ignored.
+DIGEST_VERSION = "1"
+CV_DIGEST_DIR = os.getenv("CV_DIGEST_DIR", os.path.join("data", "cv_digests"))
+CV_DIGEST_ENABLED = os.getenv("CV_DIGEST_ENABLED", "1").lower() not in ("0", "false", "no")
+
+SYSTEM = """You condense CVs into a factual digest used to write many cover letters.
+Return STRICT JSON with:
+- name (string)
+- headline (string, current title / professional identity)
+- years_experience (number or null)
+- location (string)
+- core_skills (array of strings, max 20)
+- experience (array of {title, company, period, highlights: array of max 3 short strings}, newest first, max 6)
+- education (array of strings)
+- certifications (array of strings)
+- achievements (array of max 5 short strings, with numbers where the CV has them)
+Use only facts stated in the CV. No extra keys.
+"""
+
+
+def cv_hash(cv_text: str) -> str:
+    """Digest key: whitespace/boilerplate differences between extractions don't matter."""
+    return hashlib.sha256(normalize_text(cv_text).encode("utf-8")).hexdigest()
+
+
+def _path(sha256: str) -> str:
+    return os.path.join(CV_DIGEST_DIR, f"{sha256}.v{DIGEST_VERSION}.json")
+
+
+def load_digest(sha256: str) -> Optional[Dict[str, Any]]:
+    entry = read_json(_path(sha256), None)
+    if not isinstance(entry, dict) or entry.get("version") != DIGEST_VERSION:
+        return None
+    digest = entry.get("digest")
+    return digest if isinstance(digest, dict) else None
+
+
+def save_digest(sha256: str, digest: Dict[str, Any]) -> None:
+    write_json(_path(sha256), {
+        "sha256": sha256,
+        "version": DIGEST_VERSION,
+        "digest": digest,
+        "created_at": datetime.utcnow().isoformat(),
+    })
+
+
+def _strings(value: Any, limit: int) -> List[str]:
+    if not isinstance(value, list):
+        return []
+    return [str(v).strip() for v in value if str(v).strip()][:limit]
+
+
+def _clean(data: Any) -> Dict[str, Any]:
+    if not isinstance(data, dict):
+        raise ValueError("Digest is not a JSON object")
+    experience = []
+    for e in data.get("experience") or []:
+        if isinstance(e, dict):
+            experience.append({
+                "title": str(e.get("title") or "").strip(),
+                "company": str(e.get("company") or "").strip(),
+                "period": str(e.get("period") or "").strip(),
+                "highlights": _strings(e.get("highlights"), 3),
+            })
+    digest = {
+        "name": str(data.get("name") or "").strip(),
+        "headline": str(data.get("headline") or "").strip(),
+        "years_experience": data.get("years_experience") if isinstance(data.get("years_experience"), (int, float)) else None,
+        "location": str(data.get("location") or "").strip(),
+        "core_skills": _strings(data.get("core_skills"), 20),
+        "experience": experience[:6],
+        "education": _strings(data.get("education"), 4),
+        "certifications": _strings(data.get("certifications"), 6),
+        "achievements": _strings(data.get("achievements"), 5),
+    }
+    if not (digest["experience"] or digest["core_skills"] or digest["headline"]):
+        raise ValueError("Digest is empty")
+    return digest
+
+
+def render_digest(digest: Dict[str, Any]) -> str:
+    """Compact plain-text form for prompts (~250-500 tokens)."""
+    lines = []
+    head = " | ".join(v for v in (digest.get("name"), digest.get("headline"), digest.get("location")) if v)
+    if head:
+        lines.append(head)
+    if digest.get("years_experience") is not None:
+        lines.append(f"Experience: {digest['years_experience']} years")
+    if digest.get("core_skills"):
+        lines.append("Skills: " + ", ".join(digest["core_skills"]))
+    for e in digest.get("experience") or []:
+        role = " - ".join(v for v in (e["title"], e["company"]) if v)
+        lines.append(f"* {role} ({e['period']})" if e["period"] else f"* {role}")
+        lines.extend(f"  - {h}" for h in e["highlights"])
+    for label, key in (("Education", "education"), ("Certifications", "certifications"), ("Achievements", "achievements")):
+        if digest.get(key):
+            lines.append(f"{label}: " + "; ".join(digest[key]))
+    return "\n".join(lines)
+
+
+def _user_prompt(cv_text: str) -> str:
+    return json.dumps({"cv_text": compact_cv(cv_text, budget=REVAMP_CV_TOKEN_BUDGET)}, ensure_ascii=False)
+
+
+def _from_response(res: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not res.get("ok"):
+        logger.warning(f"⚠️ CV digest failed: {res.get('error')}")
+        return None
+    try:
+        return _clean(loads_lenient(res["data"]))
+    except Exception as e:
+        logger.warning(f"⚠️ CV digest unusable: {e}")
+        return None
+
+
+async def get_cv_digest(cv_text: str) -> Optional[str]:
+    """
+    Rendered digest for this CV: read from data/cv_digests/<sha256>.v<DIGEST_VERSION>.json,
+    or generated once with the model and stored. None when disabled or generation fails,
+    in which case callers fall back to the (compacted) raw CV.
+    """
+    if not CV_DIGEST_ENABLED or not (cv_text or "").strip():
+        return None
+    sha = cv_hash(cv_text)
+    digest = await asyncio.to_thread(load_digest, sha)
+    if digest is None:
+        try:
+            res = await chat_json_async(SYSTEM, _user_prompt(cv_text), route="cv.digest")
+        except Exception as e:
+            res = {"ok": False, "error": str(e)}
+        digest = _from_response(res)
+        if digest is None:
+            return None
+        await asyncio.to_thread(save_digest, sha, digest)
+    return render_digest(digest)
+
+
+def cached_cv_digest_sync(cv_text: str, user_email: str = "") -> Optional[str]:
+    """
+    Stored digest only, never a model call: interactive requests use this and fall back
+    to the compacted CV on a miss. A miss queues the digest to be built in the background.
+    """
+    if not CV_DIGEST_ENABLED or not (cv_text or "").strip():
+        return None
+    digest = load_digest(cv_hash(cv_text))
+    if digest is None:
+        request_cv_digest(cv_text, user_email)
+        return None
+    return render_digest(digest)
+
+
+async def cached_cv_digest(cv_text: str) -> Optional[str]:
+    return await asyncio.to_thread(cached_cv_digest_sync, cv_text, llm_metrics.current_user())
+
+
+def request_cv_digest(cv_text: str, user_email: str = "") -> None:
+    """
+    Queue a background build of this CV's digest (task kind "cv.digest", batch priority).
+    Called on the first cover letter that finds no digest; safe to repeat, one task per
+    CV and user, and a task that failed (e.g. during an OpenAI outage) is queued again.
+    """
+    if not CV_DIGEST_ENABLED or not (cv_text or "").strip():
+        return
+    sha = cv_hash(cv_text)
+    if os.path.exists(_path(sha)):
+        return
+    try:
+        submit(
+            "cv.digest", {"cv_text": cv_text}, user_email or "anonymous",
+            priority=PRIORITY_BATCH, idempotency_key=f"cv.digest:{sha}.v{DIGEST_VERSION}", requeue_failed=True,
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ CV digest not queued: {e}")
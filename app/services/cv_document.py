@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import re
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.utils import tokenize
+from app.services.cv_parse import extract_docx_text, extract_pdf_text, extract_txt_text, sniff_format
+
+# Bump when extraction or segmentation output changes so cached documents are invalidated.
+PARSER_VERSION = "3"
+
+# heading text (lowercase, no trailing colon) -> section kind
+SECTION_HEADINGS: Dict[str, List[str]] = {
+    "summary": ["summary", "profile", "professional summary", "career summary", "career objective",
+                "objective", "about me", "personal statement", "professional profile"],
+    "skills": ["skills", "core skills", "key skills", "technical skills", "skills summary",
+               "competencies", "core competencies", "key competencies"],
+    "experience": ["experience", "work experience", "professional experience", "employment history",
+                   "work history", "career history", "employment", "relevant experience"],
+    "education": ["education", "qualifications", "academic qualifications", "education and training",
+                  "academic background", "education & qualifications"],
+    "certifications": ["certifications", "certificates", "licenses", "courses", "training"],
+    "projects": ["projects", "key projects"],
+    "achievements": ["achievements", "awards", "accomplishments", "key achievements"],
+    "languages": ["languages"],
+    "interests": ["interests", "hobbies", "hobbies and interests"],
+    "references": ["references", "referees"],
+    "contact": ["contact", "contact details", "personal details", "personal information"],
+}
+_HEADING_KIND = {h: kind for kind, names in SECTION_HEADINGS.items() for h in names}
+
+_INLINE_HEADING_RE = re.compile(r"^\s*([A-Za-z &]{3,40}?)\s*:\s*(\S.*)$")
+_SKILL_SPLIT_RE = re.compile(r"[,;|•·\n]|\s-\s")
+
+MAX_SKILLS = 100
+
+
+@dataclass
+class CVSpan:
+    kind: str       # "header" | "summary" | "skills" | "experience" | "education" | ...
+    heading: str
+    start: int      # character offsets into CVDocument.text
+    end: int
+
+
+@dataclass
+class CVDocument:
+    text: str
+    format: str
+    sections: List[CVSpan] = field(default_factory=list)
+    skills: List[str] = field(default_factory=list)
+    tokens: List[str] = field(default_factory=list)
+    partial: bool = False
+    partial_reason: str = ""
+    pages_total: Optional[int] = None
+    pages_read: Optional[int] = None
+    parser_version: str = PARSER_VERSION
+
+    @property
+    def experience(self) -> List[CVSpan]:
+        return [s for s in self.sections if s.kind == "experience"]
+
+    @property
+    def education(self) -> List[CVSpan]:
+        return [s for s in self.sections if s.kind == "education"]
+
+    def section_text(self, span: CVSpan) -> str:
+        return self.text[span.start:span.end].strip()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CVDocument":
+        data = dict(data)
+        data["sections"] = [CVSpan(**s) for s in data.get("sections") or []]
+        return cls(**data)
+
+    def summary(self) -> Dict[str, Any]:
+        """Structured view for API responses (no full text)."""
+        return {
+            "format": self.format,
+            "sections": [{"kind": s.kind, "heading": s.heading} for s in self.sections],
+            "skills": self.skills,
+            "experience": [self.section_text(s)[:300] for s in self.experience],
+            "education": [self.section_text(s)[:300] for s in self.education],
+            "partial": self.partial,
+            "partial_reason": self.partial_reason,
+            "pages_total": self.pages_total,
+            "pages_read": self.pages_read,
+        }
+
+
+# -----------------------------
+# Segmentation
+# -----------------------------
+def _heading_kind(line: str) -> Optional[str]:
+    key = line.strip().strip("#*-•:").strip().lower()
+    if not key or len(key) > 40:
+        return None
+    return _HEADING_KIND.get(key)
+
+
+def segment_sections(text: str) -> List[CVSpan]:
+    """Split CV text into spans at recognised heading lines. Text before the first heading is "header"."""
+    spans: List[CVSpan] = []
+    cur_kind, cur_heading, cur_start = "header", "", 0
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        kind = _heading_kind(line)
+        if kind:
+            if offset > cur_start and text[cur_start:offset].strip():
+                spans.append(CVSpan(cur_kind, cur_heading, cur_start, offset))
+            cur_kind, cur_heading, cur_start = kind, line.strip().rstrip(":").strip(), offset + len(line)
+        offset += len(line)
+    if text[cur_start:].strip():
+        spans.append(CVSpan(cur_kind, cur_heading, cur_start, len(text)))
+    return spans
+
+
+def extract_skills(text: str, sections: List[CVSpan]) -> List[str]:
+    chunks = [text[s.start:s.end] for s in sections if s.kind == "skills"]
+    # Inline "Skills: a, b, c" lines anywhere in the CV
+    for line in text.splitlines():
+        m = _INLINE_HEADING_RE.match(line)
+        if m and _HEADING_KIND.get(m.group(1).strip().lower()) == "skills":
+            chunks.append(m.group(2))
+
+    seen = set()
+    out: List[str] = []
+    for chunk in chunks:
+        for raw in _SKILL_SPLIT_RE.split(chunk):
+            skill = raw.strip(" \t*-–.").strip()
+            if not skill or len(skill) > 60 or skill.lower() in seen:
+                continue
+            seen.add(skill.lower())
+            out.append(skill)
+            if len(out) >= MAX_SKILLS:
+                return out
+    return out
+
+
+# -----------------------------
+# Pipeline
+# -----------------------------
+def build_cv_document(path: Path | str) -> CVDocument:
+    """
+    The single CV extraction pipeline: detect format by magic bytes, extract text,
+    segment into sections and pull out skills/experience/education spans.
+    Raises ValueError for unsupported formats.
+    """
+    fmt = sniff_format(path)
+    partial, reason, pages_total, pages_read = False, "", None, None
+
+    if fmt == "pdf":
+        res = extract_pdf_text(path)
+        text = res.text
+        partial, reason, pages_total, pages_read = res.partial, res.reason, res.pages_total, res.pages_read
+    elif fmt == "docx":
+        text = extract_docx_text(path)
+    elif fmt == "txt":
+        text = extract_txt_text(path).strip()
+    elif fmt == "doc":
+        raise ValueError("Legacy .doc files are not supported. Save as .docx or PDF.")
+    else:
+        raise ValueError("Unsupported CV format. Use .txt, .pdf, or .docx")
+
+    sections = segment_sections(text)
+    return CVDocument(
+        text=text,
+        format=fmt,
+        sections=sections,
+        skills=extract_skills(text, sections),
+        tokens=sorted(tokenize(text)),
+        partial=partial,
+        partial_reason=reason,
+        pages_total=pages_total,
+        pages_read=pages_read,
+    )
@@ -0,0 +1,193 @@
+import os
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.services.cv_cache import cached_cv_document
+from app.services.cv_document import CVDocument
+
+logger = logging.getLogger("makwande-auto-apply")
+
+# pypdf / python-docx are CPU-bound: parse in separate processes, never in the event loop.
+CV_PARSE_WORKERS = int(os.getenv("CV_PARSE_WORKERS", "2"))
+# Reject new uploads (503) once this many parses are queued or running.
+CV_PARSE_MAX_PENDING = int(os.getenv("CV_PARSE_MAX_PENDING", "32"))
+# Finished jobs kept in memory for the status endpoint.
+CV_PARSE_KEEP = int(os.getenv("CV_PARSE_KEEP", "500"))
+
+PREVIEW_CHARS = 600
+
+
+class ParseQueueFull(RuntimeError):
+    pass
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# document_id -> job record (insertion ordered, oldest evicted first)
+_jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_futures: Dict[str, Future] = {}
+_jobs_lock = threading.Lock()
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max(1, CV_PARSE_WORKERS))
+            logger.info(f"✅ CV parse pool started ({CV_PARSE_WORKERS} workers)")
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def pending_count() -> int:
+    with _jobs_lock:
+        return len(_futures)
+
+
+def _evict_finished() -> None:
+    # caller holds _jobs_lock
+    while len(_jobs) > CV_PARSE_KEEP:
+        oldest = next((k for k in _jobs if k not in _futures), None)
+        if oldest is None:
+            return
+        _jobs.pop(oldest, None)
+
+
+def _on_done(document_id: str, fut: Future) -> None:
+    with _jobs_lock:
+        _futures.pop(document_id, None)
+        job = _jobs.get(document_id)
+        if job is None:
+            return
+        job["updated_at"] = _now()
+        if fut.cancelled():
+            job.update(status="failed", error="Parsing cancelled")
+            return
+        err = fut.exception()
+        if err is not None:
+            logger.warning(f"⚠️ CV parse failed for {job['stored_as']}: {err}")
+            msg = str(err) if isinstance(err, ValueError) else "Could not extract text from this file"
+            job.update(status="failed", error=msg)
+            return
+        job.update(status="done", document=fut.result())
+
+
+def _new_job(document_id: str, stored_as: str, filename: str, user_email: str) -> Dict[str, Any]:
+    return {
+        "document_id": document_id,
+        "user_email": user_email,
+        "filename": filename,
+        "stored_as": stored_as,
+        "status": "queued",
+        "document": None,
+        "error": None,
+        "created_at": _now(),
+        "updated_at": _now(),
+    }
+
+
+def register_done(stored_as: str, filename: str, user_email: str, doc: CVDocument) -> str:
+    """Record an already-extracted document (e.g. a deduplicated re-upload) without parsing."""
+    document_id = uuid.uuid4().hex
+    with _jobs_lock:
+        job = _new_job(document_id, stored_as, filename, user_email)
+        job.update(status="done", document=doc)
+        _jobs[document_id] = job
+        _evict_finished()
+    return document_id
+
+
+def submit_parse(
+    upload_path: str,
+    stored_as: str,
+    filename: str,
+    user_email: str,
+    sha256: Optional[str] = None,
+) -> str:
+    """
+    Queue a CV for background text extraction. Returns a document id for get_status().
+    Raises ParseQueueFull when too much work is already pending.
+    """
+    document_id = uuid.uuid4().hex
+    with _jobs_lock:
+        # Same file already being parsed (e.g. double upload): share that future.
+        inflight = next(
+            (f for k, f in _futures.items() if _jobs.get(k, {}).get("stored_as") == stored_as),
+            None,
+        )
+        if inflight is None and len(_futures) >= CV_PARSE_MAX_PENDING:
+            raise ParseQueueFull("CV parsing queue is full, try again shortly")
+        _jobs[document_id] = _new_job(document_id, stored_as, filename, user_email)
+        _evict_finished()
+        if inflight is not None:
+            _futures[document_id] = inflight
+
+    if inflight is not None:
+        inflight.add_done_callback(lambda f: _on_done(document_id, f))
+        return document_id
+
+    try:
+        fut = get_pool().submit(cached_cv_document, upload_path, sha256)
+    except Exception:
+        with _jobs_lock:
+            _jobs[document_id].update(status="failed", error="CV parser unavailable", updated_at=_now())
+        raise
+    with _jobs_lock:
+        _futures[document_id] = fut
+    # May run immediately (and in this thread) if the future is already done
+    fut.add_done_callback(lambda f: _on_done(document_id, f))
+    return document_id
+
+
+def pending_job(stored_as: str, user_email: str) -> Optional[str]:
+    """This user's queued or running parse of a stored file, if there is one."""
+    with _jobs_lock:
+        for document_id, fut in _futures.items():
+            job = _jobs.get(document_id, {})
+            if not fut.done() and job.get("stored_as") == stored_as and job.get("user_email") == user_email:
+                return document_id
+    return None
+
+
+def get_status(document_id: str) -> Optional[Dict[str, Any]]:
+    with _jobs_lock:
+        job = _jobs.get(document_id)
+        if job is None:
+            return None
+        job = dict(job)
+        fut = _futures.get(document_id)
+        queued_ahead = 0
+        if fut is not None:
+            job["status"] = "parsing" if fut.running() else "queued"
+            if job["status"] == "queued":
+                for other_id, other in _futures.items():
+                    if other_id == document_id:
+                        break
+                    if not other.running():
+                        queued_ahead += 1
+
+    doc: Optional[CVDocument] = job.pop("document")
+    if job["status"] == "queued":
+        job["queued_ahead"] = queued_ahead
+    if job["status"] == "done" and doc is not None:
+        job["text"] = doc.text
+        job["text_preview"] = doc.text[:PREVIEW_CHARS]
+        job["cv"] = doc.summary()
+    return job
@@ -1,30 +1,260 @@
 from __future__ import annotations
 
+import os
+import time
+import logging
+import zipfile
+import multiprocessing
+from multiprocessing.connection import Connection, wait as connection_wait
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
 
 from pypdf import PdfReader
 import docx
 
+logger = logging.getLogger("makwande-auto-apply")
+
+# Worst-case bounds for a single PDF (malformed / 200-page uploads)
+PDF_MAX_PAGES = int(os.getenv("CV_PDF_MAX_PAGES", "30"))
+PDF_TIME_BUDGET_S = float(os.getenv("CV_PDF_TIME_BUDGET_S", "20"))
+# Matching and prompts never use more than this much text, so stop reading pages once we have it.
+PDF_ENOUGH_CHARS = int(os.getenv("CV_PDF_ENOUGH_CHARS", "40000"))
+# >1 splits page ranges across processes (worth it for long PDFs only)
+PDF_PAGE_WORKERS = int(os.getenv("CV_PDF_PAGE_WORKERS", "1"))
+PDF_PAGES_PER_WORKER_MIN = 4
+# Extra time reader processes get to hand back the page in progress before they are killed
+PDF_DEADLINE_GRACE_S = 0.5
+# Kept between PDF pages so cleanup can tell running headers/footers from body text
+PAGE_BREAK = "\f"
+
+
+@dataclass
+class PdfText:
+    text: str
+    pages_total: int
+    pages_read: int
+    partial: bool = False
+    reason: str = ""  # "page_cap" | "time_budget" | "enough_text" | "error"
+
+
+def _page_count(reader: PdfReader) -> int:
+    # /Count from the page tree root is one lookup; len(reader.pages) walks the whole tree
+    try:
+        return int(reader.trailer["/Root"]["/Pages"]["/Count"])
+    except Exception:
+        return len(reader.pages)
+
+
+def _read_pages(conn: Connection, path: str, start: int, stop: int, enough_chars: int) -> None:
+    """
+    Reader process: sends ("total", n), then ("page", i, text) for pages [start, stop)
+    until `enough_chars` characters are read, then ("done",). The parent owns the
+    deadline and terminates this process, so a page that never finishes can't hang it.
+    """
+    try:
+        reader = PdfReader(path)
+        total = _page_count(reader)
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        conn.close()
+        return
+    conn.send(("total", total))
+    size = 0
+    for i in range(start, min(stop, total)):
+        try:
+            text = reader.pages[i].extract_text() or ""
+        except Exception:
+            text = ""
+        conn.send(("page", i, text))
+        size += len(text)
+        if size >= enough_chars:
+            break
+    conn.send(("done",))
+    conn.close()
+
+
+class _Readers:
+    """Reader processes for one PDF, each streaming a contiguous page range back over a pipe."""
+
+    def __init__(self, path: str, enough_chars: int):
+        self.path = path
+        self.enough_chars = enough_chars
+        self.ctx = multiprocessing.get_context()
+        # parent end of the pipe -> [process, start, stop]
+        self.running: Dict[Connection, List] = {}
+
+    def spawn(self, start: int, stop: int) -> None:
+        parent, child = self.ctx.Pipe(duplex=False)
+        proc = self.ctx.Process(target=_read_pages, args=(child, self.path, start, stop, self.enough_chars))
+        proc.start()
+        child.close()
+        self.running[parent] = [proc, start, stop]
+
+    def finish(self, conn: Connection) -> None:
+        proc = self.running.pop(conn)[0]
+        conn.close()
+        if proc.is_alive():
+            proc.terminate()
+        proc.join(timeout=1)
+
+    def kill_all(self) -> None:
+        for conn in list(self.running):
+            self.finish(conn)
+
+
+def extract_pdf_text(
+    path: Path | str,
+    max_pages: Optional[int] = None,
+    time_budget_s: Optional[float] = None,
+    enough_chars: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> PdfText:
+    """
+    Bounded PDF text extraction: at most `max_pages` pages, within `time_budget_s`
+    seconds, stopping early once `enough_chars` characters are collected.
+    Everything, opening the file included, runs in reader processes that are killed at
+    the deadline, so one pathological page cannot outlive the budget. With workers > 1,
+    contiguous page ranges are read in parallel. Anything short of the full document
+    comes back with partial=True and a reason.
+    """
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    time_budget_s = PDF_TIME_BUDGET_S if time_budget_s is None else time_budget_s
+    enough_chars = PDF_ENOUGH_CHARS if enough_chars is None else enough_chars
+    workers = PDF_PAGE_WORKERS if workers is None else workers
+
+    deadline = time.monotonic() + time_budget_s + PDF_DEADLINE_GRACE_S
+    texts: Dict[int, str] = {}
+    total: Optional[int] = None
+    limit = max_pages
+    reason = ""
+
+    readers = _Readers(str(path), enough_chars)
+    try:
+        # The first reader reports the page count; the rest of the range split waits for it
+        readers.spawn(0, max_pages)
+        while readers.running:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                reason = "time_budget"
+                break
+            for conn in connection_wait(list(readers.running), timeout=left):
+                stop = readers.running[conn][2]
+                try:
+                    msg = conn.recv()
+                except EOFError:
+                    # Reader died mid-range (crash, out of memory)
+                    readers.finish(conn)
+                    reason = reason or "error"
+                    continue
+                if msg[0] == "error":
+                    logger.warning(f"⚠️ PDF open failed for {path}: {msg[1]}")
+                    raise ValueError("Could not read this PDF")
+                if msg[0] == "total":
+                    if total is None:
+                        total = msg[1]
+                        limit = min(total, max_pages)
+                        readers.running[conn][2] = _split_ranges(readers, limit, workers)
+                elif msg[0] == "page" and msg[1] < stop:
+                    texts[msg[1]] = msg[2]
+                    if msg[1] + 1 >= stop:
+                        readers.finish(conn)
+                else:
+                    readers.finish(conn)
+
+            pages = _prefix(texts, limit)
+            if sum(len(t) for t in pages) >= enough_chars and len(pages) < limit:
+                reason = "enough_text"
+                break
+            if total is not None and len(pages) >= limit:
+                break
+    finally:
+        readers.kill_all()
+
+    if total is None:
+        raise ValueError("PDF could not be opened within the time limit")
+    pages = _prefix(texts, limit)
+    if len(pages) < limit:
+        reason = reason or ("enough_text" if sum(len(t) for t in pages) >= enough_chars else "error")
+    elif limit < total:
+        reason = "page_cap"
+    else:
+        reason = ""
+    return PdfText(
+        text=f"\n{PAGE_BREAK}\n".join(pages).strip(),
+        pages_total=total,
+        pages_read=len(pages),
+        partial=bool(reason),
+        reason=reason,
+    )
+
+
+def _split_ranges(readers: _Readers, limit: int, workers: int) -> int:
+    """Start readers for the tail of [0, limit); returns where the first reader should stop."""
+    n_workers = min(max(1, workers), max(1, limit // PDF_PAGES_PER_WORKER_MIN))
+    step = -(-limit // n_workers) if limit else 0  # ceil
+    for start in range(step, limit, step or 1):
+        readers.spawn(start, min(start + step, limit))
+    return step
+
+
+def _prefix(texts: Dict[int, str], limit: int) -> List[str]:
+    """Pages 0..k-1 for the longest run read without a gap."""
+    pages: List[str] = []
+    while len(pages) < limit and len(pages) in texts:
+        pages.append(texts[len(pages)])
+    return pages
+
+
+def sniff_format(path: Path | str) -> str:
+    """Detect the file type from its magic bytes: "pdf" | "docx" | "doc" | "txt" | "unknown"."""
+    with open(path, "rb") as f:
+        head = f.read(8192)
+    if head.startswith(b"%PDF-"):
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(path) as z:
+                if "word/document.xml" in z.namelist():
+                    return "docx"
+        except zipfile.BadZipFile:
+            pass
+        return "unknown"
+    if head.startswith(b"\xd0\xcf\x11\xe0"):
+        return "doc"  # legacy OLE Word file
+    if b"\x00" in head:
+        return "unknown"
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A multi-byte char cut at the 8KB boundary is still text
+        if e.start < len(head) - 4:
+            return "unknown"
+    return "txt"
+
+
+def extract_docx_text(path: Path | str) -> str:
+    d = docx.Document(str(path))
+    return "\n".join([p.text for p in d.paragraphs]).strip()
+
+
+def extract_txt_text(path: Path | str) -> str:
+    return Path(path).read_text(encoding="utf-8", errors="ignore")
+
+
 def parse_cv(path: Path) -> Tuple[str, str]:
-    """Return (text, detected_type). Supports .txt, .pdf, .docx"""
-    suffix = path.suffix.lower()
-    if suffix == ".txt":
-        return path.read_text(encoding="utf-8", errors="ignore"), "txt"
-
-    if suffix == ".pdf":
-        reader = PdfReader(str(path))
-        chunks = []
-        for page in reader.pages:
-            try:
-                chunks.append(page.extract_text() or "")
-            except Exception:
-                continue
-        return "\n".join(chunks).strip(), "pdf"
-
-    if suffix == ".docx":
-        d = docx.Document(str(path))
-        text = "\n".join([p.text for p in d.paragraphs])
-        return text.strip(), "docx"
+    """Return (text, detected_type). Supports txt, pdf and docx, detected by content."""
+    fmt = sniff_format(path)
+    if fmt == "txt":
+        return extract_txt_text(path), "txt"
+
+    if fmt == "pdf":
+        res = extract_pdf_text(path)
+        if res.partial:
+            logger.warning(f"⚠️ Partial PDF text for {Path(path).name}: {res.pages_read}/{res.pages_total} pages ({res.reason})")
+        return res.text, "pdf"
+
+    if fmt == "docx":
+        return extract_docx_text(path), "docx"
 
     raise ValueError("Unsupported CV format. Use .txt, .pdf, or .docx")
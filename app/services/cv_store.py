@@ -0,0 +1,136 @@
+import os
+import re
+import uuid
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import UploadFile
+
+from app.core.file_lock import exclusive_lock
+from app.services.storage_json import read_json, write_json
+
+UPLOAD_DIR = os.path.join("data", "uploads")
+REFS_FILE = os.path.join(UPLOAD_DIR, "refs.json")
+REFS_LOCK_FILE = REFS_FILE + ".lock"
+
+MAX_UPLOAD_BYTES = int(float(os.getenv("CV_MAX_UPLOAD_MB", "10")) * 1024 * 1024)
+CHUNK_SIZE = 256 * 1024
+
+# <sha256><ext> for content-addressed files; 32-hex uuid names are legacy uploads.
+_STORED_AS_RE = re.compile(r"^(?P<digest>[0-9a-f]{64}|[0-9a-f]{32})(?P<ext>\.(pdf|docx|doc))$")
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class EmptyUpload(ValueError):
+    pass
+
+
+@dataclass
+class StoredUpload:
+    sha256: str
+    stored_as: str
+    path: str
+    size: int
+    deduplicated: bool
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+async def save_upload(file: UploadFile, ext: str) -> StoredUpload:
+    """
+    Stream an upload to disk in chunks, hashing as we go.
+    Files are stored once under their SHA-256; identical re-uploads reuse the existing file.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    tmp_path = os.path.join(UPLOAD_DIR, f".tmp-{uuid.uuid4().hex}")
+    h = hashlib.sha256()
+    size = 0
+
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise UploadTooLarge(f"File exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)}MB limit")
+                h.update(chunk)
+                out.write(chunk)
+
+        if size == 0:
+            raise EmptyUpload("Empty file")
+
+        sha256 = h.hexdigest()
+        stored_as = f"{sha256}{ext}"
+        final_path = os.path.join(UPLOAD_DIR, stored_as)
+
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+            return StoredUpload(sha256, stored_as, final_path, size, deduplicated=True)
+
+        os.replace(tmp_path, final_path)
+        return StoredUpload(sha256, stored_as, final_path, size, deduplicated=False)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# -----------------------------
+# Per-user references
+# -----------------------------
+def add_user_ref(user_email: str, stored: StoredUpload, filename: str) -> None:
+    email = str(user_email).lower()
+    # Read-modify-write of the shared file: lock out other threads and worker processes
+    with exclusive_lock(REFS_LOCK_FILE):
+        refs: Dict[str, List[Dict[str, Any]]] = read_json(REFS_FILE, {})
+        items = refs.setdefault(email, [])
+        if any(r.get("stored_as") == stored.stored_as for r in items):
+            return
+        items.append({
+            "stored_as": stored.stored_as,
+            "sha256": stored.sha256,
+            "filename": filename,
+            "size": stored.size,
+            "created_at": _now(),
+        })
+        write_json(REFS_FILE, refs)
+
+
+def list_user_refs(user_email: str) -> List[Dict[str, Any]]:
+    refs = read_json(REFS_FILE, {})
+    return list(refs.get(str(user_email).lower(), []))
+
+
+def resolve_upload(stored_as: str, user_email: str) -> Optional[str]:
+    """
+    Map a stored_as reference to a file path, or None if it is invalid, missing, or not
+    referenced by this user. Legacy uuid names get no exemption: without a ref there is
+    no owner, so they are not served.
+    """
+    m = _STORED_AS_RE.match(stored_as or "")
+    if not m:
+        return None
+
+    path = os.path.join(UPLOAD_DIR, stored_as)
+    if not os.path.exists(path):
+        return None
+
+    if not any(r.get("stored_as") == stored_as for r in list_user_refs(user_email)):
+        return None
+    return path
+
+
+def sha256_of(stored_as: str) -> Optional[str]:
+    m = _STORED_AS_RE.match(stored_as or "")
+    if m and len(m.group("digest")) == 64:
+        return m.group("digest")
+    return None
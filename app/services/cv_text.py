@@ -1,13 +1,14 @@
-import os
+import logging
+
+from app.services.cv_document import PARSER_VERSION, build_cv_document  # noqa: F401
+
+logger = logging.getLogger("makwande-auto-apply")
+
 
 def extract_cv_text(file_path: str) -> str:
-    # Try your existing parser if it exists
     try:
-        from app.services.cv_parse import extract_text  # your existing file
-        text = extract_text(file_path)
-        return text if isinstance(text, str) else ""
-    except Exception:
-        pass
-
-    # Fallback: keep system alive even if parser fails
-    return ""
+        return build_cv_document(file_path).text
+    except Exception as e:
+        # Keep the request alive; callers treat "" as "nothing extractable"
+        logger.warning(f"⚠️ CV text extraction failed for {file_path}: {e}")
+        return ""
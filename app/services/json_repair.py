@@ -0,0 +1,64 @@
+import re
+import json
+from typing import Any
+
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.I)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+
+def _close_open_structures(text: str) -> str:
+    """Append whatever closing quotes/brackets a truncated JSON document is missing."""
+    stack = []
+    in_string = False
+    escaped = False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+
+    if in_string:
+        text += '"'
+    text = text.rstrip().rstrip(",")
+    return text + "".join(reversed(stack))
+
+
+def loads_lenient(raw: str) -> Any:
+    """
+    json.loads() with a cheap local repair pass for near-valid model output:
+    code fences, prose around the object, trailing commas, smart quotes and
+    truncation (unclosed strings/brackets). Raises ValueError if still invalid.
+    """
+    try:
+        return json.loads(raw)
+    except Exception:
+        pass
+
+    text = _FENCE_RE.sub("", raw or "").strip()
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("No JSON object in model output")
+    end = text.rfind("}")
+    candidates = [text[start:end + 1]] if end > start else []
+    candidates.append(text[start:])  # may be truncated
+
+    for cand in candidates:
+        no_commas = _TRAILING_COMMA_RE.sub(r"\1", cand)
+        smart_quotes = no_commas.replace("\u201c", '"').replace("\u201d", '"')
+        for attempt in (cand, no_commas, smart_quotes):
+            for fixed in (attempt, _close_open_structures(attempt)):
+                try:
+                    return json.loads(fixed)
+                except Exception:
+                    continue
+    raise ValueError("Model output is not valid JSON")
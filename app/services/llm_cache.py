@@ -0,0 +1,130 @@
+import os
+import json
+import asyncio
+import time
+import hashlib
+import logging
+import sqlite3
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.sqlite_pool import SQLitePool
+
+logger = logging.getLogger("makwande-auto-apply")
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join("data", "llm_cache.db"))
+LLM_CACHE_TTL_S = int(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+# Routes that must always call the model, e.g. "cover_letter,ai.cover_letter"
+LLM_CACHE_DISABLED_ROUTES = {
+    r.strip() for r in os.getenv("LLM_CACHE_DISABLED_ROUTES", "").split(",") if r.strip()
+}
+
+_pool: Optional[SQLitePool] = None
+
+
+def _init_schema(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS llm_cache (
+        key TEXT PRIMARY KEY,
+        route TEXT NOT NULL,
+        model TEXT NOT NULL,
+        response TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used)")
+
+
+def _connect() -> sqlite3.Connection:
+    """A pooled connection; close() returns it to the pool."""
+    global _pool
+    if _pool is None:
+        _pool = SQLitePool(LLM_CACHE_PATH, row_factory=None, init=_init_schema)
+    return _pool.acquire()
+
+
+def make_key(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    """Content address of a completion request: model + messages + sampling params."""
+    blob = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def is_enabled(route: str) -> bool:
+    return LLM_CACHE_ENABLED and route not in LLM_CACHE_DISABLED_ROUTES
+
+
+def get(key: str) -> Optional[str]:
+    now = time.time()
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        if now - row[1] > LLM_CACHE_TTL_S:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            conn.commit()
+            return None
+        conn.execute("UPDATE llm_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        conn.commit()
+        return row[0]
+    finally:
+        conn.close()
+
+
+def put(key: str, route: str, model: str, response: str) -> None:
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute("""
+        INSERT INTO llm_cache (key, route, model, response, created_at, last_used, hits)
+        VALUES (?, ?, ?, ?, ?, ?, 0)
+        ON CONFLICT(key) DO UPDATE SET
+            response=excluded.response,
+            created_at=excluded.created_at,
+            last_used=excluded.last_used
+        """, (key, route, model, response, now, now))
+        # Size bound: keep the most recently used entries only (LRU)
+        conn.execute("""
+        DELETE FROM llm_cache WHERE key IN (
+            SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+        )
+        """, (LLM_CACHE_MAX_ENTRIES,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+async def acached_completion(
+    route: str,
+    model: str,
+    messages: List[Dict[str, Any]],
+    params: Dict[str, Any],
+    call: Callable[[], Awaitable[str]],
+    use_cache: bool = True,
+) -> str:
+    """
+    Return a cached response for an identical request, or await `call()` and store its result.
+    Cache failures never break the request; they only cost a model call. SQLite work runs
+    in a thread, off the event loop.
+    """
+    if not use_cache or not is_enabled(route):
+        return await call()
+
+    key = make_key(model, messages, params)
+    try:
+        hit = await asyncio.to_thread(get, key)
+        if hit is not None:
+            return hit
+    except Exception as e:
+        logger.warning(f"⚠️ LLM cache read failed: {e}")
+
+    response = await call()
+    if response:
+        try:
+            await asyncio.to_thread(put, key, route, model, response)
+        except Exception as e:
+            logger.warning(f"⚠️ LLM cache write failed: {e}")
+    return response
@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+import contextvars
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("makwande-auto-apply")
+
+# USD per 1M tokens (input, output). Override/extend with LLM_PRICES_JSON='{"model": [in, out]}'.
+_DEFAULT_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+}
+LLM_METRICS_MAX_USERS = int(os.getenv("LLM_METRICS_MAX_USERS", "1000"))
+
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000, 60000]
+TOKEN_BUCKETS = [100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000]
+
+_user: contextvars.ContextVar[str] = contextvars.ContextVar("llm_user", default="")
+
+
+def _load_prices() -> Dict[str, Tuple[float, float]]:
+    prices = dict(_DEFAULT_PRICES)
+    raw = os.getenv("LLM_PRICES_JSON", "").strip()
+    if raw:
+        try:
+            prices.update({k: (float(v[0]), float(v[1])) for k, v in json.loads(raw).items()})
+        except Exception as e:
+            logger.warning(f"⚠️ LLM_PRICES_JSON ignored: {e}")
+    return prices
+
+
+PRICES = _load_prices()
+
+
+def set_user(email: str) -> None:
+    """Attribute LLM calls made while handling this request to a user."""
+    _user.set((email or "").strip().lower())
+
+
+def current_user() -> str:
+    return _user.get()
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """USD for one call, or None for a model without a price. Dated snapshots use the base price."""
+    price = PRICES.get(model)
+    if price is None:
+        base = max((m for m in PRICES if model.startswith(m + "-")), key=len, default=None)
+        price = PRICES.get(base) if base else None
+    if price is None:
+        return None
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+
+class Histogram:
+    def __init__(self, bounds: List[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.n += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None past the last bound)."""
+        if not self.n:
+            return None
+        rank = q * self.n
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else None
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"le_{b}" for b in self.bounds] + ["inf"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.n,
+            "avg": round(self.total / self.n, 1) if self.n else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Series:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.shared = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.unpriced_calls = 0
+        self.models: Dict[str, int] = {}
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.tokens = Histogram(TOKEN_BUCKETS)
+
+    def add(self, rec: Dict[str, Any]) -> None:
+        self.calls += 1
+        self.models[rec["model"]] = self.models.get(rec["model"], 0) + 1
+        self.latency_ms.observe(rec["latency_ms"])
+        if rec["error"]:
+            self.errors += 1
+            return
+        if rec["cache"] == "hit":
+            self.cache_hits += 1
+            return
+        if rec["cache"] == "shared":
+            self.shared += 1
+            return
+        self.prompt_tokens += rec["prompt_tokens"]
+        self.completion_tokens += rec["completion_tokens"]
+        self.tokens.observe(rec["prompt_tokens"] + rec["completion_tokens"])
+        if rec["cost_usd"] is None:
+            self.unpriced_calls += 1
+        else:
+            self.cost_usd += rec["cost_usd"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "cache_hits": self.cache_hits,
+            "shared": self.shared,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "unpriced_calls": self.unpriced_calls,
+            "models": dict(self.models),
+            "latency_ms": self.latency_ms.to_dict(),
+            "tokens_per_call": self.tokens.to_dict(),
+        }
+
+
+_lock = threading.Lock()
+_started = time.time()
+_total = Series()
+_by_route: Dict[str, Series] = {}
+_by_user: Dict[str, Series] = {}
+
+
+def record(
+    route: str,
+    model: str,
+    latency_s: float,
+    cache: str = "miss",
+    usage: Any = None,
+    error: Optional[str] = None,
+    user: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Account one LLM call. cache is "miss" (model called), "hit" (LLM cache) or "shared"
+    (joined an identical in-flight call); `usage` is the SDK's usage object or a dict.
+    """
+    def _u(name: str) -> int:
+        v = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+        return int(v or 0)
+
+    prompt_tokens = _u("prompt_tokens") if usage is not None else 0
+    completion_tokens = _u("completion_tokens") if usage is not None else 0
+    rec = {
+        "route": route or "unknown",
+        "model": model,
+        "latency_ms": latency_s * 1000.0,
+        "cache": cache,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost_usd": estimate_cost(model, prompt_tokens, completion_tokens) if cache == "miss" else 0.0,
+        "error": error,
+    }
+    user = (user if user is not None else current_user()) or "anonymous"
+
+    with _lock:
+        _total.add(rec)
+        _by_route.setdefault(rec["route"], Series()).add(rec)
+        if user not in _by_user and len(_by_user) >= LLM_METRICS_MAX_USERS:
+            user = "other"
+        _by_user.setdefault(user, Series()).add(rec)
+    return rec
+
+
+def snapshot(include_users: bool = False) -> Dict[str, Any]:
+    with _lock:
+        out = {
+            "since": _started,
+            "total": _total.to_dict(),
+            "routes": {k: v.to_dict() for k, v in sorted(_by_route.items())},
+        }
+        if include_users:
+            out["users"] = {k: v.to_dict() for k, v in sorted(_by_user.items())}
+    return out
+
+
+def reset() -> None:
+    global _total, _started
+    with _lock:
+        _total = Series()
+        _by_route.clear()
+        _by_user.clear()
+        _started = time.time()
@@ -1,15 +1,17 @@
 from __future__ import annotations
 
 from dataclasses import asdict
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set
 import pandas as pd
 
 from app.core.utils import tokenize
+from app.services.cv_document import CVDocument
 from app.services.job_sources import Job
 
-def score_job(cv_text: str, job: Job) -> Dict[str, Any]:
+def score_job(cv_text: str, job: Job, cv_tokens: Optional[Set[str]] = None) -> Dict[str, Any]:
     """Simple overlap score. Replace with embeddings later."""
-    cv_tokens = tokenize(cv_text)
+    if cv_tokens is None:
+        cv_tokens = tokenize(cv_text)
     job_text = f"{job.title} {job.company} {job.location}"
     job_tokens = tokenize(job_text)
 
@@ -25,9 +27,15 @@ def score_job(cv_text: str, job: Job) -> Dict[str, Any]:
     row["overlap_keywords"] = ", ".join(sorted(list(overlap))[:25])
     return row
 
-def match_jobs(cv_text: str, jobs: List[Job]) -> pd.DataFrame:
-    rows = [score_job(cv_text, j) for j in jobs]
+def match_jobs(cv_text: str, jobs: List[Job], cv_tokens: Optional[Set[str]] = None) -> pd.DataFrame:
+    if cv_tokens is None:
+        cv_tokens = tokenize(cv_text)
+    rows = [score_job(cv_text, j, cv_tokens) for j in jobs]
     df = pd.DataFrame(rows)
     if not df.empty:
         df = df.sort_values("match_score", ascending=False).reset_index(drop=True)
     return df
+
+def match_document(doc: CVDocument, jobs: List[Job]) -> pd.DataFrame:
+    """Match using the tokens stored on a parsed CVDocument (no re-tokenising)."""
+    return match_jobs(doc.text, jobs, cv_tokens=set(doc.tokens))
@@ -0,0 +1,141 @@
+import os
+import json
+import sqlite3
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from app.core.sqlite_migrations import migrate
+from app.core.sqlite_pool import SQLitePool
+
+logger = logging.getLogger("makwande-auto-apply")
+
+# Paystack payments (billing routes). Schema is set up once per process, at startup or
+# on the first connection; each write below is a single statement on a pooled connection.
+DB_PATH = os.getenv("SQLITE_DB_PATH", "data/app.db")
+
+UNKNOWN_EMAIL = "unknown@example.com"
+
+
+def _utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# Schema changes after the base table (see app.core.sqlite_migrations).
+# Raw Paystack payloads go to payment_events, written after the response, so the
+# payments row stays small and its upsert is the only write on the request path.
+MIGRATIONS = [
+    (1, "payment events", [
+        """
+        CREATE TABLE IF NOT EXISTS payment_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            reference TEXT NOT NULL,
+            source TEXT NOT NULL,
+            event TEXT,
+            raw_json TEXT NOT NULL,
+            received_at TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_payment_events_ref ON payment_events(reference, received_at)",
+    ]),
+]
+
+
+def _init_schema(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS payments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        reference TEXT UNIQUE NOT NULL,
+        email TEXT NOT NULL,
+        amount_kobo INTEGER NOT NULL,
+        currency TEXT NOT NULL DEFAULT 'ZAR',
+        status TEXT NOT NULL DEFAULT 'initialized',
+        channel TEXT,
+        paid_at TEXT,
+        plan_code TEXT,
+        metadata_json TEXT,
+        raw_json TEXT,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    );
+    """)
+    if conn.in_transaction:
+        conn.commit()
+    migrate(conn, MIGRATIONS)
+
+
+_pool = SQLitePool(DB_PATH, init=_init_schema)
+
+
+def init_db() -> None:
+    """Create/migrate the schema now (startup) instead of on the first payment."""
+    with _pool.connection():
+        pass
+
+
+# Empty email / zero amount mean "not in this payload": keep what's stored. A row created
+# without an email (webhook before init) gets a placeholder that a later event can fill.
+_UPSERT_SQL = """
+INSERT INTO payments (reference, email, amount_kobo, currency, status, channel, paid_at, plan_code,
+                      metadata_json, created_at, updated_at)
+VALUES (:reference, COALESCE(NULLIF(:email, ''), :unknown_email), :amount_kobo, :currency, :status,
+        :channel, :paid_at, :plan_code, :metadata_json, :now, :now)
+ON CONFLICT(reference) DO UPDATE SET
+    email=COALESCE(NULLIF(:email, ''), payments.email),
+    amount_kobo=CASE WHEN :amount_kobo > 0 THEN :amount_kobo ELSE payments.amount_kobo END,
+    currency=excluded.currency,
+    status=excluded.status,
+    channel=COALESCE(excluded.channel, payments.channel),
+    paid_at=COALESCE(excluded.paid_at, payments.paid_at),
+    plan_code=COALESCE(excluded.plan_code, payments.plan_code),
+    metadata_json=excluded.metadata_json,
+    updated_at=excluded.updated_at
+"""
+
+
+def upsert_payment(
+    reference: str,
+    email: str = "",
+    amount_kobo: int = 0,
+    currency: str = "ZAR",
+    status: str = "initialized",
+    plan_code: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    channel: Optional[str] = None,
+    paid_at: Optional[str] = None,
+) -> None:
+    """Insert or update a payment in one statement (no read first)."""
+    params = {
+        "reference": reference,
+        "email": email or "",
+        "unknown_email": UNKNOWN_EMAIL,
+        "amount_kobo": int(amount_kobo or 0),
+        "currency": currency or "ZAR",
+        "status": status,
+        "channel": channel,
+        "paid_at": paid_at,
+        "plan_code": plan_code,
+        "metadata_json": json.dumps(metadata or {}, ensure_ascii=False),
+        "now": _utc_now_iso(),
+    }
+    with _pool.connection() as conn:
+        conn.execute(_UPSERT_SQL, params)
+
+
+def get_payment(reference: str) -> Optional[Dict[str, Any]]:
+    with _pool.connection() as conn:
+        row = conn.execute("SELECT * FROM payments WHERE reference = ?", (reference,)).fetchone()
+        return dict(row) if row else None
+
+
+def record_event(reference: str, source: str, event: Optional[str], raw: Any) -> None:
+    """Keep a raw Paystack payload for auditing. Meant to run after the response is sent."""
+    raw_json = raw if isinstance(raw, str) else json.dumps(raw or {}, ensure_ascii=False)
+    try:
+        with _pool.connection() as conn:
+            conn.execute(
+                "INSERT INTO payment_events (reference, source, event, raw_json, received_at) VALUES (?, ?, ?, ?, ?)",
+                (reference, source, event, raw_json, _utc_now_iso()),
+            )
+    except Exception as e:
+        logger.warning(f"⚠️ Payment event not recorded for {reference}: {e}")
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import os
+import re
+from bisect import bisect_right
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.utils import tokenize
+from app.services.cv_document import CVSpan, segment_sections
+from app.services.cv_parse import PAGE_BREAK
+
+# Optional: exact token counts when tiktoken is installed; otherwise a local estimate.
+try:
+    import tiktoken  # type: ignore
+    _ENC = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _ENC = None
+
+# Token budgets per prompt input
+CV_TOKEN_BUDGET = int(os.getenv("PROMPT_CV_TOKEN_BUDGET", "2500"))
+REVAMP_CV_TOKEN_BUDGET = int(os.getenv("PROMPT_REVAMP_CV_TOKEN_BUDGET", "5000"))
+JD_TOKEN_BUDGET = int(os.getenv("PROMPT_JD_TOKEN_BUDGET", "1200"))
+
+_BOILERPLATE = [re.compile(p, re.I) for p in [
+    r"^page\s+\d+(\s+of\s+\d+)?$",
+    r"^(curriculum vitae|resume|résumé|cv)$",
+    r"^references?\s+(are\s+)?available\s+(up)?on\s+request\.?$",
+    r"^confidential$",
+    r".*\b(equal opportunit(y|ies) employer|eeo statement)\b.*",
+    r"^(click here to )?apply (now|here|today)\.?$",
+    r".*\bwe use cookies\b.*",
+    r"^(share|save) (this )?job$",
+]]
+
+# Running headers/footers sit within this many lines of a page's top or bottom
+_PAGE_EDGE_LINES = 2
+_PAGE_NUMBER = re.compile(r"^(page\s+)?\d{1,3}(\s+of\s+\d{1,3})?$", re.I)
+
+# How useful a section kind usually is for cover letters / revamps, before relevance.
+_KIND_PRIOR = {
+    "header": 3.0, "summary": 2.5, "experience": 2.5, "skills": 2.0, "achievements": 1.5,
+    "projects": 1.2, "education": 1.2, "certifications": 1.0, "languages": 0.4,
+    "contact": 0.2, "interests": 0.1, "references": 0.0,
+}
+
+
+# -----------------------------
+# Token counting
+# -----------------------------
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _ENC is not None:
+        return len(_ENC.encode(text, disallowed_special=()))
+    # ~4 chars/token for English prose; word-heavy text skews higher
+    words = len(re.findall(r"\w+|[^\w\s]", text))
+    return max(len(text) // 4, (words * 3) // 4)
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    if budget <= 0:
+        return ""
+    if count_tokens(text) <= budget:
+        return text
+    if _ENC is not None:
+        return _ENC.decode(_ENC.encode(text, disallowed_special=())[:budget]).rstrip()
+    # Keep whole lines while they fit, then cut the last one at a word boundary
+    out: List[str] = []
+    used = 0
+    for line in text.splitlines():
+        cost = count_tokens(line) + 1
+        if used + cost > budget:
+            room = max(0, (budget - used) * 4)
+            if room > 20:
+                out.append(line[:room].rsplit(" ", 1)[0])
+            break
+        out.append(line)
+        used += cost
+    return "\n".join(out).rstrip()
+
+
+# -----------------------------
+# Cleanup
+# -----------------------------
+def _clean_line(raw: str) -> str:
+    return re.sub(r"[ \t\u00a0]+", " ", raw).strip()
+
+
+def _page_furniture(pages: List[List[str]]) -> Set[str]:
+    """Lines found at the top or bottom of at least two pages: running headers/footers."""
+    if len(pages) < 2:
+        return set()
+    counts: Dict[str, int] = {}
+    for lines in pages:
+        content = [line for line in lines if line]
+        edges = content[:_PAGE_EDGE_LINES] + content[-_PAGE_EDGE_LINES:]
+        for key in {line.lower() for line in edges}:
+            counts[key] = counts.get(key, 0) + 1
+    return {key for key, n in counts.items() if n >= 2}
+
+
+def _pages(text: str) -> List[List[Tuple[int, str]]]:
+    """(offset, cleaned line) per page; offsets point into `text`."""
+    pages: List[List[Tuple[int, str]]] = [[]]
+    offset = 0
+    for raw in (text or "").splitlines(keepends=True):
+        content = raw.rstrip("\r\n")
+        if content.endswith(PAGE_BREAK):
+            content = content[:-len(PAGE_BREAK)]
+            if content.strip():
+                pages[-1].append((offset, _clean_line(content)))
+            pages.append([])
+        else:
+            pages[-1].append((offset, _clean_line(content)))
+        offset += len(raw)
+    return pages
+
+
+def _normalized_lines(text: str) -> List[Tuple[int, str]]:
+    """normalize_text() as (offset in `text`, line) pairs; blank separators are ""."""
+    pages = _pages(text)
+    furniture = _page_furniture([[line for _, line in lines] for lines in pages])
+    multi_page = len(pages) > 1
+
+    seen: Set[str] = set()
+    out: List[Tuple[int, str]] = []
+    blank = False
+    for lines in pages:
+        content = [i for i, (_, line) in enumerate(lines) if line]
+        edges = set(content[:_PAGE_EDGE_LINES] + content[-_PAGE_EDGE_LINES:])
+        for i, (offset, line) in enumerate(lines):
+            if not line:
+                if out and not blank:
+                    out.append((offset, ""))
+                blank = True
+                continue
+            if any(p.match(line) for p in _BOILERPLATE):
+                continue
+            key = line.lower()
+            if i in edges and multi_page:
+                if _PAGE_NUMBER.match(line):
+                    continue
+                # Keep the first copy (often the candidate's name), drop the repeats
+                if key in furniture and key in seen:
+                    continue
+            seen.add(key)
+            out.append((offset, line))
+            blank = False
+    return out
+
+
+def normalize_text(text: str) -> str:
+    """
+    Collapse whitespace and drop boilerplate. With page breaks (PDF text), page numbers and
+    repeats of a running header/footer at page edges go too; body lines are never deduped.
+    """
+    return "\n".join(line for _, line in _normalized_lines(text)).strip()
+
+
+# -----------------------------
+# Compaction
+# -----------------------------
+def _rank(blocks: List[Tuple[CVSpan, str]], target_tokens: set) -> List[Tuple[float, int]]:
+    ranked = []
+    for i, (span, body) in enumerate(blocks):
+        words = tokenize(body)
+        overlap = len(words & target_tokens) / max(len(target_tokens), 1) if target_tokens else 0.0
+        ranked.append((_KIND_PRIOR.get(span.kind, 1.0) + 4.0 * overlap, i))
+    ranked.sort(key=lambda r: (-r[0], r[1]))
+    return ranked
+
+
+def _section_blocks(lines: List[Tuple[int, str]], sections: List[CVSpan]) -> List[Tuple[CVSpan, str]]:
+    """Cleaned body of each section, from spans computed on the raw text (CVDocument.sections)."""
+    starts = [span.start for span in sections]
+    bodies: List[List[str]] = [[] for _ in sections]
+    for offset, line in lines:
+        i = bisect_right(starts, offset) - 1
+        # Heading lines sit between spans; the heading is re-added from span.heading
+        if i >= 0 and offset < sections[i].end:
+            bodies[i].append(line)
+    return [(span, "\n".join(body).strip()) for span, body in zip(sections, bodies)]
+
+
+def compact_cv(
+    cv_text: str, target: str = "", budget: Optional[int] = None, sections: Optional[List[CVSpan]] = None
+) -> str:
+    """
+    Fit CV text into a token budget: clean it, rank sections by relevance to `target`
+    (role, company, job description) and keep the best ones in their original order.
+    The lowest-ranked section that only partly fits is truncated; the rest are dropped.
+    Pass `sections` (a cached CVDocument's, for this exact text) to skip re-segmenting.
+    """
+    budget = CV_TOKEN_BUDGET if budget is None else budget
+    lines = _normalized_lines(cv_text)
+    text = "\n".join(line for _, line in lines).strip()
+    if count_tokens(text) <= budget:
+        return text
+
+    if sections is not None:
+        blocks = [b for b in _section_blocks(lines, sections) if b[1]]
+    else:
+        blocks = [(span, text[span.start:span.end].strip()) for span in segment_sections(text)]
+    if len(blocks) <= 1:
+        return truncate_to_tokens(text, budget)
+
+    chosen = {}
+    used = 0
+    for _, i in _rank(blocks, tokenize(target)):
+        span, body = blocks[i]
+        block = f"{span.heading}\n{body}" if span.heading else body
+        cost = count_tokens(block) + 1
+        if used + cost <= budget:
+            chosen[i] = block
+            used += cost
+        elif budget - used > 50:
+            chosen[i] = truncate_to_tokens(block, budget - used - 1)
+            used = budget
+        if used >= budget:
+            break
+
+    return "\n\n".join(chosen[i] for i in sorted(chosen)).strip()
+
+
+def compact_text(text: str, budget: Optional[int] = None) -> str:
+    """Clean and fit free text (e.g. a job description) into a token budget."""
+    budget = JD_TOKEN_BUDGET if budget is None else budget
+    return truncate_to_tokens(normalize_text(text), budget)
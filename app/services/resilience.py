@@ -0,0 +1,217 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator, Optional, TypeVar
+
+logger = logging.getLogger("makwande-auto-apply")
+
+T = TypeVar("T")
+
+# End-to-end budget per HTTP request; streaming/batch endpoints get the longer one.
+REQUEST_DEADLINE_S = float(os.getenv("REQUEST_DEADLINE_S", "90"))
+STREAM_DEADLINE_S = float(os.getenv("STREAM_DEADLINE_S", "600"))
+# Retry policy for upstream calls (OpenAI, Paystack)
+RETRY_ATTEMPTS = int(os.getenv("UPSTREAM_RETRY_ATTEMPTS", "3"))
+RETRY_BASE_S = float(os.getenv("UPSTREAM_RETRY_BASE_S", "0.5"))
+RETRY_CAP_S = float(os.getenv("UPSTREAM_RETRY_CAP_S", "8"))
+# Don't start an attempt with less time than this left; it would only time out.
+MIN_ATTEMPT_S = float(os.getenv("UPSTREAM_MIN_ATTEMPT_S", "2"))
+
+_RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+_RETRYABLE_TYPES = {
+    # openai / httpx
+    "APIConnectionError", "APITimeoutError", "ConnectError", "ConnectTimeout", "ReadTimeout",
+    "RemoteProtocolError", "PoolTimeout",
+    # requests
+    "ConnectionError", "Timeout", "ReadTimeoutError",
+}
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+# -----------------------------
+# Deadlines
+# -----------------------------
+def remaining() -> Optional[float]:
+    """Seconds left in the current deadline, or None when no deadline is set."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline() -> None:
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+@contextmanager
+def deadline_scope(seconds: float) -> Iterator[None]:
+    """Set a deadline `seconds` from now; an existing tighter deadline still wins."""
+    new = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(new if current is None else min(current, new))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def no_deadline() -> Iterator[None]:
+    """Clear the deadline, for work several requests share (each still waits under its own)."""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+async def within_deadline(aw: Awaitable[T]) -> T:
+    """Await `aw`, raising DeadlineExceeded once the current deadline has passed."""
+    left = remaining()
+    if left is None:
+        return await aw
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    try:
+        return await asyncio.wait_for(aw, timeout=left)
+    except asyncio.TimeoutError as e:
+        if (remaining() or 1.0) <= 0:
+            raise DeadlineExceeded("Request deadline exceeded") from e
+        raise
+
+
+def attempt_timeout(per_try_s: float) -> float:
+    """Timeout for one upstream attempt: per_try_s, capped by the time left."""
+    left = remaining()
+    if left is None:
+        return per_try_s
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return max(0.1, min(per_try_s, left))
+
+
+# -----------------------------
+# Retries
+# -----------------------------
+def is_retryable(err: BaseException) -> bool:
+    if isinstance(err, DeadlineExceeded):
+        return False
+    status = getattr(err, "status_code", None)
+    if status is None:
+        status = getattr(getattr(err, "response", None), "status_code", None)
+    if status is not None:
+        return status in _RETRYABLE_STATUS
+    return type(err).__name__ in _RETRYABLE_TYPES or isinstance(err, (asyncio.TimeoutError, TimeoutError))
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_S, cap: float = RETRY_CAP_S) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt))."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _next_delay(err: BaseException, attempt: int, attempts: int, what: str) -> Optional[float]:
+    """Delay before the next attempt, or None when we should give up and raise."""
+    if attempt + 1 >= attempts or not is_retryable(err):
+        return None
+    delay = backoff_delay(attempt)
+    left = remaining()
+    if left is not None and left - delay < MIN_ATTEMPT_S:
+        return None
+    logger.warning(f"⚠️ {what} failed ({type(err).__name__}: {err}); retry {attempt + 1} in {delay:.2f}s")
+    return delay
+
+
+async def retry_async(
+    fn: Callable[[float], Awaitable[T]],
+    per_try_s: float,
+    what: str = "upstream call",
+    attempts: int = RETRY_ATTEMPTS,
+    retry_if: Optional[Callable[[BaseException], bool]] = None,
+) -> T:
+    """
+    Await fn(timeout) with jittered exponential backoff on transient errors, within the
+    current deadline: each attempt is capped by the time left, and no retry starts
+    unless MIN_ATTEMPT_S would remain after its backoff. Raises DeadlineExceeded when
+    the deadline runs out mid-attempt. `retry_if(err)` returning False stops retrying
+    an error that would otherwise be transient (e.g. one an inner layer already retried).
+    """
+    attempt = 0
+    while True:
+        timeout = attempt_timeout(per_try_s)
+        try:
+            left = remaining()
+            if left is None:
+                return await fn(timeout)
+            return await asyncio.wait_for(fn(timeout), timeout=left)
+        except asyncio.TimeoutError as e:
+            if (remaining() or 1.0) <= 0:
+                raise DeadlineExceeded("Request deadline exceeded") from e
+            err: BaseException = e
+        except Exception as e:
+            err = e
+        delay = None if retry_if is not None and not retry_if(err) else _next_delay(err, attempt, attempts, what)
+        if delay is None:
+            raise err
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+def retry_call(
+    fn: Callable[[float], T],
+    per_try_s: float,
+    what: str = "upstream call",
+    attempts: int = RETRY_ATTEMPTS,
+    retry_if: Optional[Callable[[BaseException], bool]] = None,
+) -> T:
+    """Sync retry_async(): fn(timeout) is expected to honour the timeout it is given."""
+    attempt = 0
+    while True:
+        timeout = attempt_timeout(per_try_s)
+        try:
+            return fn(timeout)
+        except Exception as e:
+            delay = None if retry_if is not None and not retry_if(e) else _next_delay(e, attempt, attempts, what)
+            if delay is None:
+                raise
+        time.sleep(delay)
+        attempt += 1
+
+
+# -----------------------------
+# ASGI middleware
+# -----------------------------
+class DeadlineMiddleware:
+    """
+    Give every HTTP request one end-to-end deadline. Streaming/batch paths get
+    STREAM_DEADLINE_S; clients may ask for less with X-Request-Timeout (seconds).
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope.get("type") != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope.get("path") or ""
+        budget = STREAM_DEADLINE_S if path.endswith(("/stream", "/batch")) else REQUEST_DEADLINE_S
+        for name, value in scope.get("headers") or []:
+            if name == b"x-request-timeout":
+                try:
+                    budget = max(1.0, min(budget, float(value.decode("latin-1"))))
+                except ValueError:
+                    pass
+                break
+
+        with deadline_scope(budget):
+            await self.app(scope, receive, send)
@@ -1,5 +1,10 @@
 import json
-from app.services.ai_client import chat_json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.services.ai_client import AIUnavailable, chat_json_async, stream_chat_json
+from app.services.cv_document import CVSpan
+from app.services.json_repair import loads_lenient
+from app.services.prompt_compact import REVAMP_CV_TOKEN_BUDGET, compact_cv
 
 SYSTEM = """You are an expert ATS resume writer.
 Return STRICT JSON with:
@@ -16,19 +21,50 @@ Return STRICT JSON with:
 No extra keys.
 """
 
-def revamp_cv(cv_text: str, target_role: str = "", country: str = "South Africa"):
+def _user_prompt(cv_text: str, target_role: str, country: str, cv_sections: Optional[List[CVSpan]] = None) -> str:
     user = {
         "country": country,
         "target_role": target_role,
-        "cv_text": cv_text[:20000]
+        "cv_text": compact_cv(cv_text, target=target_role, budget=REVAMP_CV_TOKEN_BUDGET, sections=cv_sections)
     }
-    res = chat_json(SYSTEM, json.dumps(user, ensure_ascii=False))
-    if not res["ok"]:
-        return res
+    return json.dumps(user, ensure_ascii=False)
 
+def _parse(raw: str) -> Dict[str, Any]:
     # parse JSON string safely
     try:
-        data = json.loads(res["data"])
+        data = loads_lenient(raw)
         return {"ok": True, "result": data}
     except Exception:
         return {"ok": False, "error": "AI returned invalid JSON"}
+
+async def revamp_cv(
+    cv_text: str, target_role: str = "", country: str = "South Africa", use_cache: bool = True,
+    cv_sections: Optional[List[CVSpan]] = None,
+):
+    """cv_sections: the stored CV's cached sections, so compaction doesn't re-segment the text."""
+    user = _user_prompt(cv_text, target_role, country, cv_sections)
+    res = await chat_json_async(SYSTEM, user, route="cv.revamp", use_cache=use_cache)
+    if not res["ok"]:
+        return res
+    return _parse(res["data"])
+
+async def stream_revamp_cv(
+    cv_text: str, target_role: str = "", country: str = "South Africa", use_cache: bool = True,
+    cv_sections: Optional[List[CVSpan]] = None,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """Yields ("token", {"text": ...}) while generating, then ("result", data) or ("error", {...})."""
+    user = _user_prompt(cv_text, target_role, country, cv_sections)
+    parts = []
+    try:
+        async for delta in stream_chat_json(SYSTEM, user, route="cv.revamp", use_cache=use_cache):
+            parts.append(delta)
+            yield "token", {"text": delta}
+    except AIUnavailable as e:
+        yield "error", {"error": str(e)}
+        return
+
+    res = _parse("".join(parts))
+    if res["ok"]:
+        yield "result", res["result"]
+    else:
+        yield "error", {"error": res["error"]}
@@ -0,0 +1,131 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _Broadcast:
+    """One producer task's chunks, kept for replay; `future` gets the joined text."""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._cond = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, produce: Callable[[], AsyncIterator[str]]) -> None:
+        self._task = asyncio.ensure_future(self._run(produce))
+
+    async def _run(self, produce: Callable[[], AsyncIterator[str]]) -> None:
+        try:
+            async for chunk in produce():
+                async with self._cond:
+                    self.chunks.append(chunk)
+                    self._cond.notify_all()
+            self.future.set_result("".join(self.chunks))
+        except asyncio.CancelledError:
+            if not self.future.done():
+                self.future.set_exception(RuntimeError("In-flight AI stream was cancelled"))
+            raise
+        except Exception as e:
+            if not self.future.done():
+                self.future.set_exception(e)
+        finally:
+            async with self._cond:
+                self._cond.notify_all()
+
+    async def follow(self) -> AsyncIterator[str]:
+        i = 0
+        while True:
+            while i < len(self.chunks):
+                yield self.chunks[i]
+                i += 1
+            if self.future.done():
+                if i >= len(self.chunks):
+                    self.future.result()  # re-raise the producer's error, if any
+                    return
+                continue
+            async with self._cond:
+                await self._cond.wait_for(lambda: i < len(self.chunks) or self.future.done())
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent async calls: the first caller for a key runs `fn`,
+    everyone arriving while it is in flight awaits the same result (or exception).
+    Nothing is remembered once the call finishes; that is the LLM cache's job.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._streams: Dict[str, "_Broadcast"] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _forget(self, key: str, fut: asyncio.Future) -> None:
+        if self._calls.get(key) is fut:
+            del self._calls[key]
+        # Mark the exception retrieved even if every waiter went away
+        if not fut.cancelled():
+            fut.exception()
+
+    def in_flight(self, key: str) -> Optional[asyncio.Future]:
+        fut = self._calls.get(key)
+        if fut is not None and not fut.done():
+            return fut
+        return None
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        fut = self.in_flight(key)
+        if fut is not None:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            fut = asyncio.ensure_future(fn())
+            self._calls[key] = fut
+            fut.add_done_callback(lambda f: self._forget(key, f))
+        # shield: one caller disconnecting must not cancel the call the others wait on
+        return await asyncio.shield(fut)
+
+    def stream(
+        self, key: str, produce: Callable[[], AsyncIterator[str]]
+    ) -> Tuple[bool, AsyncIterator[str]]:
+        """
+        Streaming do(): returns (joined, chunks). The first caller starts `produce` in its
+        own task; every caller (leader included) replays its chunks from the start, so a
+        subscriber that disconnects never ends the stream for the others. The key's future
+        resolves to the joined text, so complete() callers can join a stream too. Joining
+        a non-streaming call yields its text as one chunk when it finishes.
+        """
+        running = self.in_flight(key)
+        if running is not None:
+            self.coalesced += 1
+            broadcast = self._streams.get(key)
+            if broadcast is not None and broadcast.future is running:
+                return True, broadcast.follow()
+            return True, self._whole(running)
+
+        self.leaders += 1
+        broadcast = _Broadcast()
+        self._calls[key] = broadcast.future
+        self._streams[key] = broadcast
+
+        def forget(f: asyncio.Future) -> None:
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
+            self._forget(key, f)
+
+        broadcast.future.add_done_callback(forget)
+        broadcast.start(produce)
+        return False, broadcast.follow()
+
+    @staticmethod
+    async def _whole(fut: asyncio.Future) -> AsyncIterator[str]:
+        yield await asyncio.shield(fut)
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._calls), "leaders": self.leaders, "coalesced": self.coalesced}
+
+
+# Process-wide group for LLM calls, keyed by llm_cache.make_key()
+ai_flight = SingleFlight()
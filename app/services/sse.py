@@ -0,0 +1,36 @@
+import json
+import logging
+from typing import Any, AsyncIterator, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger("makwande-auto-apply")
+
+
+def sse_event(data: Any, event: Optional[str] = None) -> str:
+    """One server-sent event. `data` is JSON-encoded so newlines in tokens are safe."""
+    out = f"event: {event}\n" if event else ""
+    return out + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _encode(events: AsyncIterator[Tuple[str, Any]]) -> AsyncIterator[str]:
+    # Comment line first: flushes headers so the client sees the stream open immediately
+    yield ": stream-open\n\n"
+    try:
+        async for event, data in events:
+            yield sse_event(data, event)
+    except Exception as e:
+        logger.error("SSE stream failed: %s", e)
+        yield sse_event({"error": "AI processing failed"}, "error")
+
+
+def sse_response(events: AsyncIterator[Tuple[str, Any]]) -> StreamingResponse:
+    """
+    Stream (event, data) pairs as text/event-stream.
+    Convention: "token" events carry {"text": delta}; the last event is "result" or "error".
+    """
+    return StreamingResponse(
+        _encode(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
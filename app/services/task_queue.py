@@ -0,0 +1,406 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.sqlite_pool import SQLitePool
+from app.services import llm_metrics
+from app.services.ai_scheduler import BATCH, INTERACTIVE, priority
+from app.services.resilience import backoff_delay, deadline_scope
+
+logger = logging.getLogger("makwande-auto-apply")
+
+TASK_QUEUE_PATH = os.getenv("TASK_QUEUE_PATH", os.path.join("data", "tasks.db"))
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", "4"))
+# A running task whose lease isn't renewed within this window is handed to another worker
+TASK_LEASE_S = float(os.getenv("TASK_LEASE_S", "60"))
+TASK_TIMEOUT_S = float(os.getenv("TASK_TIMEOUT_S", "300"))
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "3"))
+TASK_POLL_S = float(os.getenv("TASK_POLL_S", "1.0"))
+TASK_KEEP_S = int(os.getenv("TASK_KEEP_S", str(7 * 24 * 3600)))
+
+# Task priorities: lower runs first; BATCH and above also run at batch AI priority
+PRIORITY_INTERACTIVE = INTERACTIVE
+PRIORITY_BATCH = BATCH
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+_handlers: Dict[str, Handler] = {}
+_pool: Optional[SQLitePool] = None
+
+
+class TaskFailed(Exception):
+    """Raised by handlers; retry=False fails the task without using its remaining attempts."""
+
+    def __init__(self, message: str, retry: bool = True):
+        super().__init__(message)
+        self.retry = retry
+
+
+def register(kind: str) -> Callable[[Handler], Handler]:
+    def deco(fn: Handler) -> Handler:
+        _handlers[kind] = fn
+        return fn
+    return deco
+
+
+def kinds() -> List[str]:
+    return sorted(_handlers)
+
+
+# -----------------------------
+# Storage
+# -----------------------------
+def _init_schema(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS tasks (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        user_email TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        priority INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        run_after REAL NOT NULL,
+        lease_until REAL,
+        worker TEXT,
+        idempotency_key TEXT,
+        result TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_ready ON tasks(status, priority, run_after)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_lease ON tasks(status, lease_until)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_user ON tasks(user_email, created_at)")
+    conn.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_idempotency
+    ON tasks(user_email, idempotency_key) WHERE idempotency_key IS NOT NULL
+    """)
+
+
+def _connect() -> sqlite3.Connection:
+    """A pooled autocommit connection (explicit BEGIN IMMEDIATE for claims); close() returns it."""
+    global _pool
+    if _pool is None:
+        _pool = SQLitePool(TASK_QUEUE_PATH, isolation_level=None, init=_init_schema)
+    return _pool.acquire()
+
+
+def _row(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+    if row is None:
+        return None
+    task = dict(row)
+    task["payload"] = json.loads(task["payload"])
+    task["result"] = json.loads(task["result"]) if task["result"] else None
+    return task
+
+
+def public_view(task: Dict[str, Any]) -> Dict[str, Any]:
+    """What an API client sees: no payload (it holds the CV), no worker internals."""
+    out = {
+        "task_id": task["id"],
+        "kind": task["kind"],
+        "status": task["status"],
+        "priority": task["priority"],
+        "attempts": task["attempts"],
+        "max_attempts": task["max_attempts"],
+        "created_at": task["created_at"],
+        "updated_at": task["updated_at"],
+    }
+    if task["status"] == DONE:
+        out["result"] = task["result"]
+    if task["error"]:
+        out["error"] = task["error"]
+    return out
+
+
+def submit(
+    kind: str,
+    payload: Dict[str, Any],
+    user_email: str,
+    priority: int = PRIORITY_INTERACTIVE,
+    idempotency_key: Optional[str] = None,
+    max_attempts: int = TASK_MAX_ATTEMPTS,
+    requeue_failed: bool = False,
+) -> Dict[str, Any]:
+    """
+    Queue a task. With an idempotency_key, resubmitting (double click, client retry)
+    returns the existing task for that user instead of creating a second one; with
+    requeue_failed, an existing task that ended FAILED is queued again (fresh attempts).
+    """
+    if kind not in _handlers:
+        raise ValueError(f"Unknown task kind: {kind}")
+    now = time.time()
+    task_id = uuid.uuid4().hex
+    payload_json = json.dumps(payload, ensure_ascii=False)
+    conn = _connect()
+    try:
+        try:
+            conn.execute("""
+            INSERT INTO tasks (id, kind, user_email, payload, priority, status, attempts, max_attempts,
+                               run_after, idempotency_key, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?)
+            """, (task_id, kind, user_email, payload_json, priority, QUEUED,
+                  max(1, max_attempts), now, idempotency_key, now, now))
+        except sqlite3.IntegrityError:
+            requeued = requeue_failed and conn.execute("""
+            UPDATE tasks SET status = ?, payload = ?, attempts = 0, run_after = ?, lease_until = NULL,
+                             worker = NULL, result = NULL, error = NULL, updated_at = ?
+            WHERE user_email = ? AND idempotency_key = ? AND status = ?
+            """, (QUEUED, payload_json, now, now, user_email, idempotency_key, FAILED)).rowcount > 0
+            row = conn.execute(
+                "SELECT * FROM tasks WHERE user_email = ? AND idempotency_key = ?", (user_email, idempotency_key)
+            ).fetchone()
+            if requeued:
+                workers.wake()
+            return _row(row)
+        row = conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+    finally:
+        conn.close()
+    workers.wake()
+    return _row(row)
+
+
+def get(task_id: str) -> Optional[Dict[str, Any]]:
+    conn = _connect()
+    try:
+        return _row(conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone())
+    finally:
+        conn.close()
+
+
+def list_for_user(user_email: str, limit: int = 50) -> List[Dict[str, Any]]:
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM tasks WHERE user_email = ? ORDER BY created_at DESC LIMIT ?", (user_email, limit)
+        ).fetchall()
+        return [_row(r) for r in rows]
+    finally:
+        conn.close()
+
+
+def cancel(task_id: str, user_email: str) -> bool:
+    """Cancel a task that hasn't started. Running tasks finish (their result is kept)."""
+    conn = _connect()
+    try:
+        cur = conn.execute(
+            "UPDATE tasks SET status = ?, updated_at = ? WHERE id = ? AND user_email = ? AND status = ?",
+            (CANCELLED, time.time(), task_id, user_email, QUEUED),
+        )
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+
+def claim(worker_id: str, lease_s: float = TASK_LEASE_S) -> Optional[Dict[str, Any]]:
+    """
+    Atomically take the best ready task: queued and due, or running with an expired lease
+    (its worker died). Tasks whose lease expired on the last attempt are failed instead.
+    """
+    conn = _connect()
+    try:
+        while True:
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("""
+                SELECT * FROM tasks
+                WHERE (status = ? AND run_after <= ?) OR (status = ? AND lease_until < ?)
+                ORDER BY priority, created_at
+                LIMIT 1
+                """, (QUEUED, now, RUNNING, now)).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                if row["status"] == RUNNING and row["attempts"] >= row["max_attempts"]:
+                    conn.execute(
+                        "UPDATE tasks SET status = ?, error = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                        (FAILED, "Worker lost (lease expired)", now, row["id"]),
+                    )
+                    conn.execute("COMMIT")
+                    continue
+                conn.execute("""
+                UPDATE tasks SET status = ?, attempts = attempts + 1, lease_until = ?, worker = ?, updated_at = ?
+                WHERE id = ?
+                """, (RUNNING, now + lease_s, worker_id, now, row["id"]))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return _row(conn.execute("SELECT * FROM tasks WHERE id = ?", (row["id"],)).fetchone())
+    finally:
+        conn.close()
+
+
+def _update_owned(task_id: str, worker_id: str, sql: str, params: tuple) -> bool:
+    """Apply an update only while this worker still holds the lease."""
+    conn = _connect()
+    try:
+        cur = conn.execute(
+            f"UPDATE tasks SET {sql}, updated_at = ? WHERE id = ? AND worker = ? AND status = ?",
+            (*params, time.time(), task_id, worker_id, RUNNING),
+        )
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+
+def heartbeat(task_id: str, worker_id: str, lease_s: float = TASK_LEASE_S) -> bool:
+    return _update_owned(task_id, worker_id, "lease_until = ?", (time.time() + lease_s,))
+
+
+def complete(task_id: str, worker_id: str, result: Any) -> bool:
+    return _update_owned(
+        task_id, worker_id, "status = ?, result = ?, error = NULL, lease_until = NULL",
+        (DONE, json.dumps(result, ensure_ascii=False)),
+    )
+
+
+def fail(task_id: str, worker_id: str, error: str, attempts: int, max_attempts: int, retry: bool = True) -> bool:
+    if retry and attempts < max_attempts:
+        return _update_owned(
+            task_id, worker_id, "status = ?, error = ?, lease_until = NULL, run_after = ?",
+            (QUEUED, error, time.time() + backoff_delay(attempts, base=2.0, cap=60.0)),
+        )
+    return _update_owned(task_id, worker_id, "status = ?, error = ?, lease_until = NULL", (FAILED, error))
+
+
+def release(task_id: str, worker_id: str) -> bool:
+    """Hand a task back untouched (shutdown): it doesn't count as an attempt."""
+    return _update_owned(
+        task_id, worker_id, "status = ?, attempts = MAX(attempts - 1, 0), lease_until = NULL", (QUEUED,)
+    )
+
+
+def purge(older_than_s: int = TASK_KEEP_S) -> int:
+    conn = _connect()
+    try:
+        cur = conn.execute(
+            "DELETE FROM tasks WHERE status IN (?, ?, ?) AND updated_at < ?",
+            (DONE, FAILED, CANCELLED, time.time() - older_than_s),
+        )
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+def stats() -> Dict[str, int]:
+    conn = _connect()
+    try:
+        rows = conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        return {r[0]: r[1] for r in rows}
+    finally:
+        conn.close()
+
+
+# -----------------------------
+# Worker pool
+# -----------------------------
+class TaskWorkers:
+    """
+    N asyncio workers in this process. Several processes (uvicorn --workers) can share
+    one queue: claims are atomic and leases hand work from a dead worker to a live one.
+    """
+
+    def __init__(self, count: int = TASK_WORKERS):
+        self.count = count
+        self.worker_prefix = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+
+    def start(self) -> None:
+        if self._tasks or self.count <= 0:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._run(f"{self.worker_prefix}-{i}")) for i in range(self.count)]
+        logger.info(f"✅ Task workers started ({self.count})")
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self) -> None:
+        """Called on submit so an idle worker picks the task up without waiting for the poll."""
+        if self._loop is None or self._wake is None:
+            return
+        try:
+            if asyncio.get_running_loop() is self._loop:
+                self._wake.set()
+                return
+        except RuntimeError:
+            pass
+        self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self, worker_id: str) -> None:
+        purge_every = 0
+        while not self._stopping:
+            try:
+                task = await asyncio.to_thread(claim, worker_id)
+            except Exception as e:
+                logger.warning(f"⚠️ Task claim failed: {e}")
+                task = None
+            if task is None:
+                purge_every += 1
+                if purge_every % 600 == 0:
+                    await asyncio.to_thread(purge)
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=TASK_POLL_S)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._execute(task, worker_id)
+
+    async def _heartbeat(self, task_id: str, worker_id: str) -> None:
+        while True:
+            await asyncio.sleep(TASK_LEASE_S / 3)
+            if not await asyncio.to_thread(heartbeat, task_id, worker_id):
+                return
+
+    async def _execute(self, task: Dict[str, Any], worker_id: str) -> None:
+        task_id = task["id"]
+        handler = _handlers.get(task["kind"])
+        if handler is None:
+            await asyncio.to_thread(fail, task_id, worker_id, f"Unknown task kind: {task['kind']}", 1, 1, False)
+            return
+
+        beat = asyncio.create_task(self._heartbeat(task_id, worker_id))
+        try:
+            llm_metrics.set_user(task["user_email"])
+            async with priority(BATCH if task["priority"] >= PRIORITY_BATCH else INTERACTIVE):
+                with deadline_scope(TASK_TIMEOUT_S):
+                    result = await asyncio.wait_for(handler(task["payload"]), timeout=TASK_TIMEOUT_S)
+        except asyncio.CancelledError:
+            # Shutdown: give the task back so the next process starts it fresh
+            await asyncio.shield(asyncio.to_thread(release, task_id, worker_id))
+            raise
+        except TaskFailed as e:
+            await asyncio.to_thread(fail, task_id, worker_id, str(e), task["attempts"], task["max_attempts"], e.retry)
+        except Exception as e:
+            logger.warning(f"⚠️ Task {task_id} ({task['kind']}) failed: {type(e).__name__}: {e}")
+            await asyncio.to_thread(
+                fail, task_id, worker_id, f"{type(e).__name__}: {e}", task["attempts"], task["max_attempts"]
+            )
+        else:
+            await asyncio.to_thread(complete, task_id, worker_id, result)
+        finally:
+            beat.cancel()
+
+
+workers = TaskWorkers()
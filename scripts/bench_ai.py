@@ -0,0 +1,289 @@
+"""
+AI-path load benchmark (/api/ai/cv/revamp, /api/ai/cover-letter, /cv/revamp, /cv/cover-letter).
+
+Runs the FastAPI app in-process (httpx ASGI transport) against the local
+mock LLM server, sends concurrent load to each endpoint and reports
+throughput, latency percentiles, worker thread-pool saturation and
+event-loop lag. No real tokens are spent.
+
+Run from the project root:
+
+    python -m scripts.bench_ai
+    python -m scripts.bench_ai --concurrency 64 --requests 500 --latency-ms 1500
+    python -m scripts.bench_ai --base-url http://127.0.0.1:8900/v1   # already-running mock
+    python -m scripts.bench_ai --endpoints cv.cover_letter --json
+
+Auth is replaced by a fixed bench user (still resolved in the thread pool,
+like the real dependency). The LLM response cache is off unless --cache,
+and every request carries distinct inputs so nothing is coalesced.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+SAMPLE_CV = ROOT / "data" / "sample_cv.txt"
+
+BENCH_USER = {"email": "bench@example.com", "full_name": "Bench User"}
+
+
+def _payloads(cv_text: str) -> Dict[str, tuple]:
+    """endpoint name -> (path, payload factory taking the request index)."""
+    return {
+        "ai.revamp": ("/api/ai/cv/revamp", lambda i: {
+            "full_name": "Bench User",
+            "email": BENCH_USER["email"],
+            "current_cv": cv_text,
+            "target_role": f"Process Engineer {i}",
+            "years_experience": 5,
+        }),
+        "ai.cover_letter": ("/api/ai/cover-letter", lambda i: {
+            "full_name": "Bench User",
+            "email": BENCH_USER["email"],
+            "job_title": f"Process Engineer {i}",
+            "company": f"Company {i}",
+            "job_description": "Optimise plant processes, lead HAZOP studies and report KPIs.",
+            "experience_summary": cv_text[:800],
+        }),
+        "cv.revamp": ("/cv/revamp", lambda i: {
+            "cv_text": cv_text,
+            "target_role": f"Process Engineer {i}",
+        }),
+        "cv.cover_letter": ("/cv/cover-letter", lambda i: {
+            "cv_text": cv_text,
+            "job_title": f"Process Engineer {i}",
+            "company": f"Company {i}",
+            "job_description": "Optimise plant processes, lead HAZOP studies and report KPIs.",
+        }),
+    }
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))
+    return values[idx]
+
+
+class Monitor:
+    """Samples event-loop lag and AnyIO worker-thread usage while a load phase runs."""
+
+    def __init__(self, interval_s: float = 0.005):
+        self.interval_s = interval_s
+        self.lag_ms: List[float] = []
+        self.threads_busy: List[int] = []
+        self.threads_total = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        from anyio import to_thread
+
+        limiter = to_thread.current_default_thread_limiter()
+        self.threads_total = int(limiter.total_tokens)
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval_s)
+            self.lag_ms.append(max(0.0, (loop.time() - start - self.interval_s) * 1000.0))
+            self.threads_busy.append(int(limiter.borrowed_tokens))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def report(self) -> Dict[str, Any]:
+        busy = self.threads_busy or [0]
+        saturated = sum(1 for b in busy if b >= self.threads_total) if self.threads_total else 0
+        return {
+            "loop_lag_p50_ms": round(_pct(self.lag_ms, 0.50), 2),
+            "loop_lag_p99_ms": round(_pct(self.lag_ms, 0.99), 2),
+            "loop_lag_max_ms": round(max(self.lag_ms or [0.0]), 2),
+            "threads_total": self.threads_total,
+            "threads_busy_max": max(busy),
+            "threads_busy_avg": round(statistics.fmean(busy), 1),
+            "threadpool_saturated_pct": round(100.0 * saturated / len(busy), 1),
+        }
+
+
+async def _phase(client, path: str, make: Callable[[int], Dict[str, Any]], n: int, concurrency: int) -> Dict[str, Any]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def one(i: int) -> None:
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                resp = await client.post(path, json=make(i))
+                code = resp.status_code
+            except Exception:
+                code = 0
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            statuses[code] = statuses.get(code, 0) + 1
+
+    monitor = Monitor()
+    monitor.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    elapsed = time.perf_counter() - started
+    await monitor.stop()
+
+    ok = statuses.get(200, 0)
+    return {
+        "path": path,
+        "requests": n,
+        "concurrency": concurrency,
+        "ok": ok,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(_pct(latencies, 0.50), 1),
+        "p99_ms": round(_pct(latencies, 0.99), 1),
+        "max_ms": round(max(latencies or [0.0]), 1),
+        **monitor.report(),
+    }
+
+
+def _spawn_mock(args: argparse.Namespace) -> subprocess.Popen:
+    import httpx
+
+    cmd = [
+        sys.executable, "-m", "scripts.mock_llm_server",
+        "--port", str(args.mock_port),
+        "--latency-ms", str(args.latency_ms),
+        "--ttft-ms", str(args.ttft_ms),
+        "--error-rate", str(args.error_rate),
+        "--seed", "7",
+    ]
+    proc = subprocess.Popen(cmd, cwd=str(ROOT))
+    url = f"http://127.0.0.1:{args.mock_port}/v1/models"
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=0.5).status_code == 200:
+                return proc
+        except Exception:
+            time.sleep(0.1)
+    proc.terminate()
+    raise SystemExit("mock LLM server did not start")
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+
+    # Import after the environment is prepared: these modules read it at import time
+    from app.main import app
+    from app.core.auth_utils import get_current_user
+    from app.services import llm_metrics
+
+    def bench_user() -> Dict[str, Any]:
+        return BENCH_USER
+
+    app.dependency_overrides[get_current_user] = bench_user
+    cv_text = SAMPLE_CV.read_text(encoding="utf-8")
+    payloads = _payloads(cv_text)
+
+    await app.router.startup()
+    results: Dict[str, Any] = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            for name in args.endpoints:
+                path, make = payloads[name]
+                if args.warmup:
+                    await _phase(client, path, make, args.warmup, min(args.warmup, args.concurrency))
+                results[name] = await _phase(client, path, make, args.requests, args.concurrency)
+    finally:
+        await app.router.shutdown()
+        app.dependency_overrides.pop(get_current_user, None)
+
+    return {"endpoints": results, "llm": llm_metrics.snapshot()["total"]}
+
+
+def _print(report: Dict[str, Any]) -> None:
+    cols = [
+        ("endpoint", 16), ("ok", 6), ("rps", 8), ("p50_ms", 9), ("p99_ms", 9),
+        ("lag_p99", 8), ("lag_max", 8), ("thr_max", 8), ("sat_%", 6),
+    ]
+    print(" ".join(name.ljust(w) for name, w in cols))
+    for name, r in report["endpoints"].items():
+        row = [
+            name, f"{r['ok']}/{r['requests']}", r["throughput_rps"], r["p50_ms"], r["p99_ms"],
+            r["loop_lag_p99_ms"], r["loop_lag_max_ms"], f"{r['threads_busy_max']}/{r['threads_total']}",
+            r["threadpool_saturated_pct"],
+        ]
+        print(" ".join(str(v).ljust(w) for v, (_, w) in zip(row, cols)))
+    llm = report["llm"]
+    print(
+        f"\nLLM calls: {llm['calls']} (errors {llm['errors']}, cache hits {llm['cache_hits']}, "
+        f"shared {llm['shared']}), tokens {llm['prompt_tokens']}+{llm['completion_tokens']}, "
+        f"est. cost ${llm['cost_usd']:.4f}"
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--endpoints", default="ai.revamp,ai.cover_letter,cv.revamp,cv.cover_letter",
+                    help="comma-separated subset of: ai.revamp, ai.cover_letter, cv.revamp, cv.cover_letter")
+    ap.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--warmup", type=int, default=4)
+    ap.add_argument("--base-url", default="", help="use a running mock (e.g. http://127.0.0.1:8900/v1)")
+    ap.add_argument("--mock-port", type=int, default=8917)
+    ap.add_argument("--latency-ms", type=float, default=600.0)
+    ap.add_argument("--ttft-ms", type=float, default=250.0)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="mock 429 rate")
+    ap.add_argument("--cache", action="store_true", help="leave the LLM response cache on")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args()
+    args.endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+
+    proc = None
+    if not args.base_url:
+        proc = _spawn_mock(args)
+        args.base_url = f"http://127.0.0.1:{args.mock_port}/v1"
+
+    tmp = tempfile.mkdtemp(prefix="bench_ai_")
+    os.environ["OPENAI_BASE_URL"] = args.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+    os.environ["LLM_CACHE_ENABLED"] = "1" if args.cache else "0"
+    os.environ["LLM_CACHE_PATH"] = os.path.join(tmp, "llm_cache.db")
+    os.environ["CV_DIGEST_DIR"] = os.path.join(tmp, "cv_digests")
+    # Digest tasks and payments rows go to throwaway databases, never data/*.db
+    os.environ["TASK_QUEUE_PATH"] = os.path.join(tmp, "tasks.db")
+    os.environ["SQLITE_DB_PATH"] = os.path.join(tmp, "app.db")
+    sys.path.insert(0, str(ROOT))
+
+    try:
+        report = asyncio.run(_run(args))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Login throughput benchmark (POST /api/auth/login under a spike).
+
+For each bcrypt cost (--rounds) and hash pool size (--workers) a child
+process runs the FastAPI app in-process (httpx ASGI transport), seeds a
+temporary user store, then sends concurrent logins while a second client
+keeps polling GET /health. The report shows what the spike costs the
+login path (logins/s, p50/p99, 503s shed by the hash queue) and what it
+costs everything else (/health p99, event-loop lag, thread-pool use).
+
+Workers=0 is the pre-pool baseline: a sync handler hashing in the shared
+thread pool, as /api/auth/login did before hashing moved to its own pool.
+
+Run from the project root:
+
+    python -m scripts.bench_login
+    python -m scripts.bench_login --rounds 10,12 --workers 0,1,2,4 --logins 200
+    python -m scripts.bench_login --concurrency 128 --max-pending 32 --json
+
+Each bcrypt round doubles the hash cost, so at a fixed pool size logins/s
+roughly halves per round; more workers help only up to the number of idle
+CPU cores.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scripts.bench_ai import Monitor, _pct  # noqa: E402
+
+PASSWORD = "Bench-Pass-123!"
+BASELINE_PATH = "/bench/login-threadpool"
+
+
+async def _logins(client, path: str, users: List[str], n: int, concurrency: int) -> Dict[str, Any]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def one(i: int) -> None:
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                resp = await client.post(path, data={"username": users[i % len(users)], "password": PASSWORD})
+                code = resp.status_code
+            except Exception:
+                code = 0
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            statuses[code] = statuses.get(code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    elapsed = time.perf_counter() - started
+    ok = statuses.get(200, 0)
+    return {
+        "ok": ok,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "logins_per_s": round(ok / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(_pct(latencies, 0.50), 1),
+        "p99_ms": round(_pct(latencies, 0.99), 1),
+    }
+
+
+async def _probe(client, stop: asyncio.Event, concurrency: int) -> List[float]:
+    """Keep GET /health busy (a sync route: it needs a thread-pool slot) until stopped."""
+    latencies: List[float] = []
+
+    async def loop() -> None:
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            await client.get("/health")
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    await asyncio.gather(*(loop() for _ in range(concurrency)))
+    return latencies
+
+
+async def _child(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+    from fastapi import Depends
+    from fastapi.security import OAuth2PasswordRequestForm
+
+    # Import after the environment is prepared: these modules read it at import time
+    from app.main import app
+    from app.core import auth_utils, passwords
+
+    tmp = tempfile.mkdtemp(prefix="bench_login_")
+    auth_utils.USERS_FILE = os.path.join(tmp, "users.json")
+    auth_utils.LOCK_FILE = auth_utils.USERS_FILE + ".lock"
+    auth_utils.USERS_LOG = os.path.join(tmp, "users.log.jsonl")
+
+    path = "/api/auth/login"
+    if args.workers == 0:
+        # Old behaviour: a sync handler, so the hash runs in (and holds) a shared thread-pool slot
+        @app.post(BASELINE_PATH)
+        def login_threadpool(form_data: OAuth2PasswordRequestForm = Depends()):
+            user = auth_utils.authenticate_user(form_data.username, form_data.password)
+            if not user:
+                return {"detail": "Invalid credentials"}
+            return {"access_token": auth_utils.create_access_token({"sub": user["email"]})}
+        path = BASELINE_PATH
+
+    users = [f"bench{i}@example.com" for i in range(args.users)]
+    await app.router.startup()
+    try:
+        await asyncio.gather(*(auth_utils.create_user_async(u, PASSWORD) for u in users))
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            if args.warmup:
+                await _logins(client, path, users, args.warmup, min(args.warmup, args.concurrency))
+
+            stop = asyncio.Event()
+            probe = asyncio.create_task(_probe(client, stop, args.probe_concurrency))
+            monitor = Monitor()
+            monitor.start()
+            login = await _logins(client, path, users, args.logins, args.concurrency)
+            await monitor.stop()
+            stop.set()
+            health = await probe
+    finally:
+        await app.router.shutdown()
+
+    return {
+        "rounds": args.rounds,
+        "workers": args.workers,
+        "login": login,
+        "health_p50_ms": round(_pct(health, 0.50), 1),
+        "health_p99_ms": round(_pct(health, 0.99), 1),
+        **monitor.report(),
+        "hash_pool": passwords.stats(),
+    }
+
+
+def _run_config(args: argparse.Namespace, rounds: int, workers: int) -> Dict[str, Any]:
+    env = dict(
+        os.environ,
+        PASSWORD_HASH_ROUNDS=str(rounds),
+        PASSWORD_HASH_WORKERS=str(workers),
+        PASSWORD_HASH_MAX_PENDING=str(args.max_pending),
+    )
+    cmd = [
+        sys.executable, "-m", "scripts.bench_login", "--child",
+        "--rounds", str(rounds), "--workers", str(workers),
+        "--users", str(args.users), "--logins", str(args.logins),
+        "--concurrency", str(args.concurrency), "--probe-concurrency", str(args.probe_concurrency),
+        "--warmup", str(args.warmup), "--max-pending", str(args.max_pending),
+    ]
+    out = subprocess.run(cmd, cwd=str(ROOT), env=env, check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _print(results: List[Dict[str, Any]]) -> None:
+    cols = [
+        ("rounds", 7), ("workers", 8), ("ok", 10), ("503", 5), ("login/s", 8), ("p50_ms", 9),
+        ("p99_ms", 9), ("hash_ms", 8), ("wait_p99", 9), ("health_p99", 11), ("lag_p99", 8), ("thr_max", 8),
+    ]
+    print(" ".join(name.ljust(w) for name, w in cols))
+    for r in results:
+        login, pool = r["login"], r["hash_pool"]
+        row = [
+            r["rounds"], r["workers"] or "thread", f"{login['ok']}/{sum(login['statuses'].values())}",
+            login["statuses"].get("503", 0), login["logins_per_s"], login["p50_ms"], login["p99_ms"],
+            pool["hash_ms"]["avg"], pool["queue_wait_ms"]["p99"], r["health_p99_ms"],
+            r["loop_lag_p99_ms"], f"{r['threads_busy_max']}/{r['threads_total']}",
+        ]
+        print(" ".join(str(v).ljust(w) for v, (_, w) in zip(row, cols)))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rounds", default="10,12", help="comma-separated bcrypt costs")
+    ap.add_argument("--workers", default="0,1,2,4", help="comma-separated pool sizes (0 = thread-pool baseline)")
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--logins", type=int, default=100, help="logins per configuration")
+    ap.add_argument("--concurrency", type=int, default=64, help="concurrent logins")
+    ap.add_argument("--probe-concurrency", type=int, default=4, help="concurrent /health pollers")
+    ap.add_argument("--warmup", type=int, default=4)
+    ap.add_argument("--max-pending", type=int, default=64, help="PASSWORD_HASH_MAX_PENDING")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        args.rounds, args.workers = int(args.rounds), int(args.workers)
+        print(json.dumps(asyncio.run(_child(args))))
+        return
+
+    results = [
+        _run_config(args, int(r), int(w))
+        for r in args.rounds.split(",") if r.strip()
+        for w in args.workers.split(",") if w.strip()
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        _print(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Matching benchmark (tokenize + score_job + match_jobs).
+
+Builds seeded synthetic job corpora and CVs of realistic sizes from
+data/sample_cv.txt, then reports latency, throughput and peak memory.
+Results are compared against a stored baseline and the script exits
+with status 1 when a metric regresses past the tolerance, or when there
+is no baseline to compare against (pass --no-baseline to only report).
+
+Run from the project root:
+
+    python -m scripts.bench_matching
+    python -m scripts.bench_matching --sizes 1000,10000,100000,1000000
+    python -m scripts.bench_matching --matcher mypkg.fast:match_jobs
+    python -m scripts.bench_matching --update-baseline
+    python -m scripts.bench_matching --no-baseline
+
+Timings are machine dependent: record the baseline on the same machine
+(or CI runner class) that runs the comparison.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import importlib
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.core.utils import tokenize
+from app.services.job_sources import Job
+from app.services.matching import match_jobs, score_job
+
+ROOT = Path(__file__).resolve().parent.parent
+SAMPLE_CV = ROOT / "data" / "sample_cv.txt"
+DEFAULT_BASELINE = ROOT / "scripts" / "baselines" / "matching.json"
+
+# Target CV sizes in characters (1 page ~ 3k chars of plain text)
+CV_SIZES = {"short": 1_500, "typical": 6_000, "long": 30_000}
+
+TITLES = [
+    "Chemical Engineer", "Process Engineer", "Data Analyst", "HR Officer",
+    "Operations Manager", "Project Manager", "Quality Controller", "HSE Officer",
+    "Software Developer", "Financial Accountant", "Payroll Administrator",
+    "Plant Supervisor", "Maintenance Technician", "Sales Representative",
+    "Business Analyst", "Supply Chain Coordinator", "Laboratory Analyst",
+]
+SENIORITY = ["Junior", "Senior", "Lead", "Graduate", "Principal", "Trainee", ""]
+COMPANIES = [
+    "Sasol", "Anglo American", "Eskom", "Transnet", "Discovery", "Shoprite",
+    "Vodacom", "MTN", "Standard Bank", "Naspers", "Mondi", "Sappi", "Tiger Brands",
+    "Bidvest", "Makwande Careers", "Clicks Group", "Pick n Pay", "Absa",
+]
+LOCATIONS = [
+    "Johannesburg", "Cape Town", "Durban", "Pretoria", "Secunda", "Sasolburg",
+    "Port Elizabeth", "Bloemfontein", "Maseru, Lesotho", "Gaborone, Botswana",
+    "Remote", "Polokwane", "East London", "Richards Bay",
+]
+SKILLS = [
+    "process design", "mass balance", "quality control", "leadership", "teamwork",
+    "python", "excel", "data analysis", "sql", "power bi", "sap", "six sigma",
+    "lean", "iso 9001", "hazop", "autocad", "labour relations", "payroll",
+    "budgeting", "stakeholder management", "c++", "c#", "project management",
+    "risk assessment", "root cause analysis", "scada", "plc", "reporting",
+]
+FILLER = [
+    "Responsible for", "Delivered", "Improved", "Coordinated", "Managed",
+    "Implemented", "Reduced", "Supported", "Analysed", "Designed",
+]
+
+
+# -----------------------------
+# Synthetic data
+# -----------------------------
+def make_jobs(n: int, seed: int) -> List[Job]:
+    rnd = random.Random(seed)
+    jobs: List[Job] = []
+    for i in range(n):
+        title = f"{rnd.choice(SENIORITY)} {rnd.choice(TITLES)}".strip()
+        skills = ", ".join(rnd.sample(SKILLS, 4))
+        jobs.append(
+            Job(
+                title=title,
+                company=rnd.choice(COMPANIES),
+                location=rnd.choice(LOCATIONS),
+                url=f"https://jobs.example.com/{seed}/{i}",
+                source="synthetic",
+                description=f"{title} role requiring {skills}.",
+            )
+        )
+    return jobs
+
+
+def make_cv(target_chars: int, seed: int) -> str:
+    """
+    Grow data/sample_cv.txt into a CV of roughly `target_chars` characters,
+    using experience bullets built from the same vocabulary.
+    """
+    rnd = random.Random(seed)
+    base = SAMPLE_CV.read_text(encoding="utf-8", errors="ignore").strip()
+    parts = [base, "", "EXPERIENCE"]
+    size = len(base)
+    while size < target_chars:
+        line = (
+            f"- {rnd.choice(FILLER)} {rnd.choice(SKILLS)} and {rnd.choice(SKILLS)} "
+            f"at {rnd.choice(COMPANIES)} ({rnd.choice(LOCATIONS)}) as {rnd.choice(TITLES)}, "
+            f"{rnd.randint(5, 40)}% improvement in {rnd.choice(SKILLS)}."
+        )
+        parts.append(line)
+        size += len(line) + 1
+    return "\n".join(parts)[:target_chars]
+
+
+# -----------------------------
+# Measurement helpers
+# -----------------------------
+def _timed(fn: Callable[[], Any], repeat: int) -> List[float]:
+    out = []
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def _peak_mem(fn: Callable[[], Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def _load_matcher(spec: str) -> Tuple[str, Callable[[str, List[Job]], Any]]:
+    """'module:function' -> (spec, callable)"""
+    mod_name, _, attr = spec.partition(":")
+    if not attr:
+        raise SystemExit(f"--matcher must look like module:function (got {spec!r})")
+    fn = getattr(importlib.import_module(mod_name), attr)
+    return spec, fn
+
+
+def _result(metric: str, times: List[float], units: int, peak: int) -> Dict[str, Any]:
+    median = statistics.median(times)
+    return {
+        "metric": metric,
+        "median_s": median,
+        "p95_s": sorted(times)[max(0, math.ceil(0.95 * len(times)) - 1)],  # nearest rank
+        "throughput_per_s": (units / median) if median > 0 else 0.0,
+        "peak_bytes": peak,
+    }
+
+
+# -----------------------------
+# Benchmarks
+# -----------------------------
+def bench_tokenize(cvs: Dict[str, str], repeat: int) -> List[Dict[str, Any]]:
+    out = []
+    for name, cv in cvs.items():
+        times = _timed(lambda: tokenize(cv), repeat)
+        out.append(_result(f"tokenize[cv={name}]", times, len(cv), _peak_mem(lambda: tokenize(cv))))
+    return out
+
+
+def bench_score_job(cvs: Dict[str, str], jobs: List[Job], repeat: int) -> List[Dict[str, Any]]:
+    sample = jobs[:1000]
+    out = []
+    for name, cv in cvs.items():
+        run = lambda: [score_job(cv, j) for j in sample]  # noqa: E731
+        out.append(_result(f"score_job[cv={name}]", _timed(run, repeat), len(sample), _peak_mem(run)))
+    return out
+
+
+def bench_matchers(
+    matchers: List[Tuple[str, Callable[[str, List[Job]], Any]]],
+    cvs: Dict[str, str],
+    corpora: Dict[int, List[Job]],
+    repeat: int,
+) -> List[Dict[str, Any]]:
+    out = []
+    for label, fn in matchers:
+        for n, jobs in corpora.items():
+            # Big corpora dominate runtime; fewer repeats keeps the suite usable.
+            reps = repeat if n <= 100_000 else max(1, repeat // 3)
+            for name, cv in cvs.items():
+                run = lambda: fn(cv, jobs)  # noqa: E731
+                metric = f"match[{label}][n={n}][cv={name}]"
+                out.append(_result(metric, _timed(run, reps), n, _peak_mem(run)))
+    return out
+
+
+# -----------------------------
+# Baseline comparison
+# -----------------------------
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    base = {r["metric"]: r for r in baseline.get("results", [])}
+    for r in results:
+        b = base.get(r["metric"])
+        if not b:
+            continue
+        if r["median_s"] > b["median_s"] * (1 + tolerance):
+            regressions.append(
+                f"{r['metric']}: latency {b['median_s'] * 1000:.2f}ms -> {r['median_s'] * 1000:.2f}ms"
+            )
+        if b.get("peak_bytes") and r["peak_bytes"] > b["peak_bytes"] * (1 + tolerance):
+            regressions.append(
+                f"{r['metric']}: peak memory {b['peak_bytes'] / 1e6:.1f}MB -> {r['peak_bytes'] / 1e6:.1f}MB"
+            )
+    return regressions
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    print(f"{'metric':<58} {'median':>11} {'p95':>11} {'throughput/s':>14} {'peak':>10}")
+    for r in results:
+        print(
+            f"{r['metric']:<58} {r['median_s'] * 1000:>9.2f}ms {r['p95_s'] * 1000:>9.2f}ms "
+            f"{r['throughput_per_s']:>14,.0f} {r['peak_bytes'] / 1e6:>8.1f}MB"
+        )
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Makwande Auto Apply - matching benchmark")
+    p.add_argument("--sizes", default="1000,10000,100000", help="Job corpus sizes (comma separated)")
+    p.add_argument("--cv-sizes", default=",".join(CV_SIZES), help=f"Subset of {list(CV_SIZES)}")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--matcher", action="append", default=[], help="Extra matcher as module:function")
+    p.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    p.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown / growth (0.25 = 25%%)")
+    p.add_argument("--update-baseline", action="store_true")
+    p.add_argument("--no-baseline", action="store_true", help="Report only, don't compare against a baseline")
+    p.add_argument("--json", dest="json_out", default="", help="Also write results to this file")
+    args = p.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    cvs = {name: make_cv(CV_SIZES[name], args.seed) for name in args.cv_sizes.split(",") if name in CV_SIZES}
+    corpora = {n: make_jobs(n, args.seed) for n in sizes}
+    matchers = [("baseline", match_jobs)] + [_load_matcher(m) for m in args.matcher]
+
+    results: List[Dict[str, Any]] = []
+    results += bench_tokenize(cvs, args.repeat * 20)
+    results += bench_score_job(cvs, corpora[min(sizes)], args.repeat)
+    results += bench_matchers(matchers, cvs, corpora, args.repeat)
+
+    print_table(results)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": args.seed,
+        "results": results,
+    }
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\n✅ Baseline written: {baseline_path}")
+        return 0
+
+    if args.no_baseline:
+        return 0
+    if not baseline_path.exists():
+        # A missing baseline must not pass as "no regressions" in CI
+        print(f"\n❌ No baseline at {baseline_path} (run with --update-baseline, or pass --no-baseline)")
+        return 1
+
+    regressions = compare(results, json.loads(baseline_path.read_text(encoding="utf-8")), args.tolerance)
+    if regressions:
+        print("\n❌ Regressions:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+
+    print("\n✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
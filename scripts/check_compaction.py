@@ -0,0 +1,95 @@
+"""
+Regression check for CV text cleanup (app/services/prompt_compact.normalize_text).
+
+Runs a multi-role, multi-page CV through normalize_text() and asserts that
+running headers/footers and page numbers are removed while body lines that
+legitimately repeat (per-role headings such as "Key achievements", bare
+numbers in the text) survive. Exits with status 1 on any failure, so it can
+run in CI next to scripts/check_query_plans.py.
+
+Run from the project root:
+
+    python -m scripts.check_compaction
+    python -m scripts.check_compaction -v
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.cv_parse import PAGE_BREAK  # noqa: E402
+from app.services.prompt_compact import normalize_text  # noqa: E402
+
+HEADER = "Jane Doe | Senior Data Engineer"
+FOOTER = "jane.doe@example.com | +27 82 000 0000"
+
+PAGES = [
+    f"""{HEADER}
+Summary
+Data engineer with 9 years building pipelines.
+Experience
+Senior Data Engineer - Acme (2021 - present)
+Key achievements
+- Cut nightly batch time by 60%
+Responsibilities
+- Own the ingestion platform
+{FOOTER}
+1""",
+    f"""{HEADER}
+Data Engineer - Globex (2017 - 2021)
+Key achievements
+- Migrated 40 pipelines to Spark
+Responsibilities
+- Own the ingestion platform
+Team size
+12
+{FOOTER}
+Page 2 of 3""",
+    f"""{HEADER}
+Junior Developer - Initech (2015 - 2017)
+Key achievements
+- Built the reporting API
+Responsibilities
+- Maintained ETL jobs
+{FOOTER}
+3""",
+]
+
+
+def _checks(text: str) -> List[Tuple[str, bool]]:
+    lines = text.splitlines()
+    return [
+        ("header kept once", lines.count(HEADER) == 1),
+        ("footer kept once", lines.count(FOOTER) == 1),
+        ("page numbers dropped", not any(line in ("1", "3", "Page 2 of 3") for line in lines)),
+        ("per-role 'Key achievements' kept", lines.count("Key achievements") == 3),
+        ("per-role 'Responsibilities' kept", lines.count("Responsibilities") == 3),
+        ("repeated bullet kept", lines.count("- Own the ingestion platform") == 2),
+        ("number in body kept", "12" in lines),
+        ("no page breaks left", PAGE_BREAK not in text),
+    ]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-v", "--verbose", action="store_true", help="print the normalized text")
+    args = ap.parse_args()
+
+    text = normalize_text(f"\n{PAGE_BREAK}\n".join(PAGES))
+    if args.verbose:
+        print(text, end="\n\n")
+
+    failures = 0
+    for name, ok in _checks(text):
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Query-plan regression check for the history tables in app/db.py.
+
+Builds a scratch database with init_db() (base tables + migrations),
+seeds it, runs ANALYZE, then asserts via EXPLAIN QUERY PLAN that each
+hot query seeks the expected index and needs neither a full table scan
+nor a temporary B-tree for its ORDER BY. Exits with status 1 on any
+regression, so it can run in CI next to the benchmarks.
+
+Run from the project root:
+
+    python -m scripts.check_query_plans
+    python -m scripts.check_query_plans --rows 50000 -v
+
+Add a query here whenever a new history endpoint is added.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Any, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# (name, sql, params, index that must be used)
+HOT_QUERIES: List[Tuple[str, str, tuple, str]] = [
+    (
+        "list_documents",
+        "SELECT * FROM documents WHERE user_email=? ORDER BY created_at DESC",
+        ("user1@example.com",),
+        "idx_documents_user_created",
+    ),
+    (
+        "list_saved_jobs",
+        "SELECT * FROM saved_jobs WHERE user_email=? ORDER BY created_at DESC",
+        ("user1@example.com",),
+        "idx_saved_jobs_user_created",
+    ),
+    (
+        "list_runs",
+        "SELECT * FROM autoapply_runs WHERE user_email=? ORDER BY started_at DESC LIMIT 50",
+        ("user1@example.com",),
+        "idx_autoapply_runs_user_started",
+    ),
+    (
+        "get_run.items",
+        "SELECT * FROM autoapply_run_items WHERE run_id=? AND user_email=? ORDER BY created_at DESC",
+        ("run-1", "user1@example.com"),
+        "idx_autoapply_run_items_run_created",
+    ),
+]
+
+
+def _load_db_module(db_path: str) -> Any:
+    # app/db.py sits next to the app/db/ package (which wins `import app.db`), so load it by path.
+    # DB_PATH is read at import time.
+    os.environ["DB_PATH"] = db_path
+    sys.path.insert(0, str(ROOT))
+    spec = importlib.util.spec_from_file_location("app_db_history", ROOT / "app" / "db.py")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def _seed(db: Any, rows: int) -> None:
+    users = [f"user{i}@example.com" for i in range(max(1, rows // 100))]
+    ts = lambda i: f"2025-01-01T00:00:{i % 60:02d}.{i:06d}Z"  # noqa: E731
+    db.executemany(
+        "INSERT INTO documents (id, user_email, doc_type, created_at) VALUES (?, ?, 'cv', ?)",
+        [(uuid.uuid4().hex, users[i % len(users)], ts(i)) for i in range(rows)],
+    )
+    db.executemany(
+        "INSERT INTO saved_jobs (id, user_email, job_title, created_at) VALUES (?, ?, 'Engineer', ?)",
+        [(uuid.uuid4().hex, users[i % len(users)], ts(i)) for i in range(rows)],
+    )
+    db.executemany(
+        "INSERT INTO autoapply_runs (id, user_email, mode, status, started_at) VALUES (?, ?, 'manual', 'complete', ?)",
+        [(f"run-{i}", users[i % len(users)], ts(i)) for i in range(rows)],
+    )
+    db.executemany(
+        "INSERT INTO autoapply_run_items (id, run_id, user_email, result, created_at) VALUES (?, ?, ?, 'success', ?)",
+        [(uuid.uuid4().hex, f"run-{i % (rows // 10 or 1)}", users[i % len(users)], ts(i)) for i in range(rows)],
+    )
+    db.execute("ANALYZE")
+
+
+def _problems(plan: List[str], index: str) -> List[str]:
+    out = []
+    if not any(f"USING INDEX {index}" in step or f"USING COVERING INDEX {index}" in step for step in plan):
+        out.append(f"does not use {index}")
+    out += [f"full scan: {step}" for step in plan if step.startswith("SCAN ") and " USING " not in step]
+    out += [f"sorts: {step}" for step in plan if "TEMP B-TREE" in step]
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=5000, help="rows seeded per table")
+    ap.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="query_plans_")
+    mod = _load_db_module(os.path.join(tmp, "app.db"))
+    mod.init_db()
+
+    failures = 0
+    with mod.get_db() as db:
+        version = db.execute("PRAGMA user_version").fetchone()[0]
+        print(f"schema v{version} ({len(mod.MIGRATIONS)} migrations)")
+        _seed(db, args.rows)
+        db.commit()
+        for name, sql, params, index in HOT_QUERIES:
+            plan = [row[3] for row in db.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+            problems = _problems(plan, index)
+            failures += bool(problems)
+            print(f"{'FAIL' if problems else 'ok  '} {name}" + (f": {'; '.join(problems)}" if problems else ""))
+            if args.verbose or problems:
+                for step in plan:
+                    print(f"       {step}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
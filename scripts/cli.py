@@ -4,8 +4,8 @@ import argparse
 from pathlib import Path
 
 from app.services.job_sources import fetch_all
-from app.services.matching import match_jobs
-from app.services.cv_parse import parse_cv
+from app.services.matching import match_document
+from app.services.cv_document import build_cv_document
 
 def main():
     p = argparse.ArgumentParser(description="Makwande Auto Apply MVP - CLI (fetch + match + CSV export)")
@@ -16,16 +16,18 @@ def main():
     args = p.parse_args()
 
     cv_path = Path(args.cv)
-    cv_text, cv_type = parse_cv(cv_path)
+    cv_doc = build_cv_document(cv_path)
 
-    jobs = fetch_all(query=args.query, limit=args.limit)
-    df = match_jobs(cv_text, jobs)
+    jobs, errors = fetch_all(query=args.query, limit=args.limit)
+    for err in errors:
+        print(f"⚠️ {err}")
+    df = match_document(cv_doc, jobs)
 
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
     df.to_csv(out_path, index=False)
 
-    print(f"✅ CV type: {cv_type}")
+    print(f"✅ CV type: {cv_doc.format}" + (f" (partial: {cv_doc.partial_reason})" if cv_doc.partial else ""))
     print(f"✅ Jobs fetched: {len(df)}")
     print(f"✅ Saved: {out_path}")
 
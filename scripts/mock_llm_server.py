@@ -0,0 +1,250 @@
+"""
+Local OpenAI-compatible stand-in for load tests and offline development.
+
+Serves POST /v1/chat/completions (plain, streaming and JSON-mode) and
+GET /v1/models with configurable latency, output size and 429 injection,
+so the AI paths can be measured without spending real tokens.
+
+Run from the project root:
+
+    python -m scripts.mock_llm_server --port 8900 --latency-ms 800
+    python -m scripts.mock_llm_server --rpm-limit 120 --error-rate 0.02
+
+Point the app at it:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=mock uvicorn app.main:app
+
+JSON mode: json_schema requests get an object built from the schema;
+json_object requests get the keys listed as "- key" lines in the
+system prompt (the format our prompts use).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "experienced results driven engineer delivered process improvements across "
+    "operations teams stakeholders safety quality projects budget reporting data "
+    "analysis leadership customers growth systems plant production compliance"
+).split()
+
+_KEY_LINE = re.compile(r"^\s*-\s*([a-z_][a-z0-9_]*)\b(.*)$", re.I)
+
+
+@dataclass
+class MockConfig:
+    latency_ms: float = 600.0         # time to full response (non-streaming)
+    jitter_ms: float = 150.0
+    ttft_ms: float = 250.0            # time to first token when streaming
+    tokens_per_s: float = 80.0        # streaming speed
+    completion_tokens: int = 250      # default output size (capped by max_tokens)
+    error_rate: float = 0.0           # fraction of requests answered with 429
+    rpm_limit: int = 0                # enforce a requests/min limit with 429 + Retry-After (0 = off)
+    retry_after_s: float = 1.0
+    seed: Optional[int] = None
+
+
+class _Window:
+    """Sliding one-minute request counter for --rpm-limit."""
+
+    def __init__(self):
+        self.times: List[float] = []
+
+    def admit(self, limit: int) -> Optional[float]:
+        now = time.monotonic()
+        self.times = [t for t in self.times if now - t < 60.0]
+        if len(self.times) >= limit:
+            return 60.0 - (now - self.times[0])
+        self.times.append(now)
+        return None
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _words(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(max(1, n)))
+
+
+def _from_schema(schema: Dict[str, Any], rng: random.Random) -> Any:
+    kind = schema.get("type")
+    if kind == "object" or "properties" in schema:
+        return {k: _from_schema(v, rng) for k, v in (schema.get("properties") or {}).items()}
+    if kind == "array":
+        return [_from_schema(schema.get("items") or {"type": "string"}, rng) for _ in range(3)]
+    if kind in ("integer", "number"):
+        lo, hi = schema.get("minimum", 50), schema.get("maximum", 90)
+        return rng.randint(int(lo), int(hi)) if kind == "integer" else round(rng.uniform(lo, hi), 2)
+    if kind == "boolean":
+        return True
+    return _words(rng, 12).capitalize() + "."
+
+
+def _from_prompt_keys(system: str, rng: random.Random, n_words: int) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for line in system.splitlines():
+        m = _KEY_LINE.match(line)
+        if not m:
+            continue
+        key, rest = m.group(1), m.group(2).lower()
+        if "array" in rest:
+            out[key] = [_words(rng, 6) for _ in range(3)]
+        elif "number" in rest or "score" in key:
+            out[key] = rng.randint(50, 90)
+        else:
+            out[key] = _words(rng, n_words if not out else 10)
+    return out or {"result": _words(rng, n_words)}
+
+
+def _content(body: Dict[str, Any], cfg: MockConfig, rng: random.Random) -> str:
+    n_tokens = min(int(body.get("max_tokens") or cfg.completion_tokens), cfg.completion_tokens)
+    fmt = body.get("response_format") or {}
+    if fmt.get("type") == "json_schema":
+        return json.dumps(_from_schema((fmt.get("json_schema") or {}).get("schema") or {}, rng))
+    if fmt.get("type") == "json_object":
+        system = next((m.get("content") or "" for m in body.get("messages") or [] if m.get("role") == "system"), "")
+        return json.dumps(_from_prompt_keys(str(system), rng, n_tokens))
+    return _words(rng, n_tokens)
+
+
+def create_app(cfg: MockConfig) -> FastAPI:
+    app = FastAPI(title="Mock LLM")
+    rng = random.Random(cfg.seed)
+    window = _Window()
+    stats = {"requests": 0, "rate_limited": 0, "streams": 0}
+
+    def _delay(ms: float) -> float:
+        return max(0.0, (ms + rng.uniform(-cfg.jitter_ms, cfg.jitter_ms)) / 1000.0)
+
+    def _rate_limited(retry_after: float) -> JSONResponse:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after": f"{retry_after:.3f}", "retry-after-ms": str(int(retry_after * 1000))},
+            content={"error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}},
+        )
+
+    @app.get("/v1/models")
+    def models():
+        return {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model", "owned_by": "mock"}]}
+
+    @app.get("/stats")
+    def get_stats():
+        return stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+
+        if cfg.rpm_limit:
+            wait = window.admit(cfg.rpm_limit)
+            if wait is not None:
+                return _rate_limited(wait)
+        if cfg.error_rate and rng.random() < cfg.error_rate:
+            return _rate_limited(cfg.retry_after_s)
+
+        model = body.get("model") or "gpt-4o-mini"
+        prompt_tokens = sum(_approx_tokens(str(m.get("content") or "")) for m in body.get("messages") or [])
+        text = _content(body, cfg, rng)
+        completion_tokens = _approx_tokens(text)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        cid = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep(_delay(cfg.latency_ms))
+            return {
+                "id": cid,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        stats["streams"] += 1
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def _chunk(delta: Dict[str, Any], finish: Optional[str] = None, with_usage: bool = False) -> str:
+            payload: Dict[str, Any] = {
+                "id": cid,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [] if with_usage else [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            if with_usage:
+                payload["usage"] = usage
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events():
+            await asyncio.sleep(_delay(cfg.ttft_ms))
+            yield _chunk({"role": "assistant", "content": ""})
+            # ~4 chars per token, sent in token-sized pieces at tokens_per_s
+            pieces = [text[i:i + 4] for i in range(0, len(text), 4)]
+            per_piece = 1.0 / cfg.tokens_per_s if cfg.tokens_per_s > 0 else 0.0
+            for piece in pieces:
+                if per_piece:
+                    await asyncio.sleep(per_piece)
+                yield _chunk({"content": piece})
+            yield _chunk({}, finish="stop")
+            if include_usage:
+                yield _chunk({}, with_usage=True)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8900)
+    ap.add_argument("--latency-ms", type=float, default=MockConfig.latency_ms)
+    ap.add_argument("--jitter-ms", type=float, default=MockConfig.jitter_ms)
+    ap.add_argument("--ttft-ms", type=float, default=MockConfig.ttft_ms)
+    ap.add_argument("--tokens-per-s", type=float, default=MockConfig.tokens_per_s)
+    ap.add_argument("--completion-tokens", type=int, default=MockConfig.completion_tokens)
+    ap.add_argument("--error-rate", type=float, default=MockConfig.error_rate, help="fraction of requests answered 429")
+    ap.add_argument("--rpm-limit", type=int, default=MockConfig.rpm_limit, help="requests/min before 429 (0 = off)")
+    ap.add_argument("--retry-after-s", type=float, default=MockConfig.retry_after_s)
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args()
+
+    import uvicorn
+
+    cfg = MockConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        ttft_ms=args.ttft_ms,
+        tokens_per_s=args.tokens_per_s,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        rpm_limit=args.rpm_limit,
+        retry_after_s=args.retry_after_s,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(cfg), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()